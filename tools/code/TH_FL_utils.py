@@ -7,7 +7,6 @@ import geopandas as gpd
 import numpy as np
 import pandas as pd
 import rasterio
-from rasterstats import zonal_stats
 from pathlib import Path
 import folium
 from folium.plugins import MiniMap, Fullscreen
@@ -16,20 +15,12 @@ import matplotlib.colors as mcolors
 from IPython.display import display, clear_output, HTML
 import time
 import multiprocessing as mp
-from functools import partial
-import itertools as it
 
 import common
+import threshold_engine
 from input_utils import get_adm_data
 
 
-# Functions for parallel processing of zonal_stats
-def zonal_stats_partial(feats, raster, stats=[], affine=None, nodata=None, all_touched=True, raster_out=True):
-    """Partial zonal stats for parallel processing on a list of features"""
-    return zonal_stats(feats, raster, stats=stats, affine=affine, nodata=nodata,
-                      all_touched=all_touched, raster_out=raster_out)
-
-
 def get_flood_raster_paths(country, flood_type, period='2020', scenario='', return_periods=[10, 100, 500, 1000]):
     """
     Construct paths to flood hazard rasters based on input parameters.
@@ -68,45 +59,28 @@ def get_flood_raster_paths(country, flood_type, period='2020', scenario='', retu
     return raster_paths
 
 
-def calculate_mean_above_threshold(values, threshold=0):
-    """
-    Calculate mean of values greater than threshold.
-    Returns 0 if no values meet the condition.
+def flood_nodata(raster_path):
     """
-    if values is None or len(values) == 0:
-        return 0
-
-    filtered_values = [v for v in values if v is not None and v > threshold]
-
-    if len(filtered_values) == 0:
-        return 0
-
-    return np.mean(filtered_values)
-
-
-def calculate_hazard_score(value_threshold, area_threshold_pct, *rp_stats):
+    Nodata value to use for a flood raster: the one of its metadata, or the Fathom default (-32767)
+    if it is missing or 0 (dry land must stay a valid value).
     """
-    Calculate hazard score based on value and area thresholds.
-
-    Logic:
-    - For each return period, check if BOTH value threshold and area threshold are met
-    - Score = count of RPs meeting both thresholds (ranges from 0 to N, where N is the number of selected return periods)
-
-    Args:
-        value_threshold: Minimum mean value threshold
-        area_threshold_pct: Minimum area percentage threshold
-        *rp_stats: Tuples of (mean_value, area_pct) for each return period
-
-    Returns:
-        int: Hazard score (0 to N, where N = number of return periods)
-    """
-    score = 0
-
-    for mean_val, area_pct in rp_stats:
-        if mean_val >= value_threshold and area_pct >= area_threshold_pct:
-            score += 1
-
-    return score
+    with rasterio.open(raster_path) as src:
+        raster_nodata = src.nodata
+    if raster_nodata is None:
+        # If not set in metadata, use Fathom default
+        nodata_value = -32767
+        print(f"  Warning: No nodata value in raster metadata, using Fathom default: {nodata_value}")
+    elif raster_nodata == 0:
+        # CRITICAL: If raster nodata is 0, this is incorrect!
+        # 0 should be valid value (dry land), not nodata
+        # Use -32767 to preserve dry land pixels
+        nodata_value = -32767
+        print(f"  WARNING: Raster has nodata=0 (incorrect!). Using -32767 to preserve dry land pixels.")
+        print(f"  → Please reprocess this raster with merge_utils.py to fix the nodata value.")
+    else:
+        nodata_value = raster_nodata
+        print(f"  Using nodata value from raster: {nodata_value}")
+    return nodata_value
 
 
 def process_flood_hazard(country, adm_level, flood_types, value_threshold, area_threshold_pct,
@@ -116,6 +90,13 @@ def process_flood_hazard(country, adm_level, flood_types, value_threshold, area_
     """
     Main processing function for flood hazard threshold analysis.
 
+    Statistics come from threshold_engine.zonal_rp_stats: as with rasterstats and all_touched, every unit
+    counts each pixel it touches, so border pixels count for both neighbours and units smaller than a pixel
+    keep the pixels they touch. Remaining differences with the rasterstats implementation: pixels are
+    weighted by their area, so on geographic grids means and area percentages are area-weighted instead of
+    pixel counts (equal on projected grids), and sums accumulate in float64, so means can differ by float
+    rounding.
+
     Args:
         country: ISO3 country code
         adm_level: Administrative level (0, 1, 2)
@@ -151,155 +132,57 @@ def process_flood_hazard(country, adm_level, flood_types, value_threshold, area_
 
     print(f"Loaded {len(adm_units)} administrative units")
 
-    # Calculate unit areas in projected CRS
+    # Calculate unit areas in an equal-area CRS
     print("Calculating unit areas...")
     if adm_units.crs is None:
         # Assume WGS84 if no CRS is set
         adm_units = adm_units.set_crs("EPSG:4326")
 
-    if adm_units.crs.is_geographic:
-        adm_units_proj = adm_units.to_crs(adm_units.estimate_utm_crs())
-        adm_units['unit_area_m2'] = adm_units_proj.geometry.area
-    else:
-        adm_units['unit_area_m2'] = adm_units.geometry.area
+    adm_units['unit_area_m2'] = threshold_engine.unit_areas_m2(adm_units)
 
     results = {}
 
-    # Process each flood type
-    for flood_type in flood_types:
-        print(f"\n{'='*60}")
-        print(f"Processing {flood_type}")
-        print(f"{'='*60}")
-
-        # Create a copy for this flood type
-        adm_flood = adm_units.copy()
-
-        # Get raster paths
-        raster_paths = get_flood_raster_paths(country, flood_type, period, scenario, return_periods)
+    # Process each flood type, all of them with one pool of workers
+    with mp.Pool() as pool:
+        for flood_type in flood_types:
+            print(f"\n{'='*60}")
+            print(f"Processing {flood_type}")
+            print(f"{'='*60}")
 
-        if not raster_paths:
-            print(f"No rasters found for {flood_type}. Skipping...")
-            continue
+            # Get raster paths
+            raster_paths = get_flood_raster_paths(country, flood_type, period, scenario, return_periods)
 
-        # Process each return period
-        rp_stats = []
-        for rp in return_periods:
-            rp_name = f'RP{rp}'
-
-            if rp_name not in raster_paths:
-                print(f"Skipping {rp_name} - file not found")
+            if not raster_paths:
+                print(f"No rasters found for {flood_type}. Skipping...")
                 continue
 
-            rp_path = raster_paths[rp_name]
-            print(f"\nProcessing {rp_name}...")
-
-            # Read nodata value from raster
-            with rasterio.open(rp_path) as src:
-                raster_nodata = src.nodata
-                if raster_nodata is None:
-                    # If not set in metadata, use Fathom default
-                    nodata_value = -32767
-                    print(f"  Warning: No nodata value in raster metadata, using Fathom default: {nodata_value}")
-                elif raster_nodata == 0:
-                    # CRITICAL: If raster nodata is 0, this is incorrect!
-                    # 0 should be valid value (dry land), not nodata
-                    # Use -32767 to preserve dry land pixels
-                    nodata_value = -32767
-                    print(f"  WARNING: Raster has nodata=0 (incorrect!). Using -32767 to preserve dry land pixels.")
-                    print(f"  → Please reprocess this raster with merge_utils.py to fix the nodata value.")
-                else:
-                    nodata_value = raster_nodata
-                    print(f"  Using nodata value from raster: {nodata_value}")
-
-            # Calculate zonal statistics using parallel processing
-            cores = min(len(adm_flood), mp.cpu_count())
-
-            # Split geometries into chunks for parallel processing
-            geom_list = list(adm_flood.geometry)
-            chunk_size = len(geom_list) // cores + (1 if len(geom_list) % cores else 0)
-            geom_chunks = [geom_list[i:i + chunk_size] for i in range(0, len(geom_list), chunk_size)]
-
-            with mp.Pool(cores) as p:
-                func = partial(zonal_stats_partial, raster=rp_path, stats=[],
-                             all_touched=True, nodata=nodata_value, raster_out=True)
-                stats_parallel = p.map(func, geom_chunks)
-
-            stats_values = list(it.chain(*stats_parallel))
-
-            # Calculate mean of values > 0 and affected area percentage
-            means_above_zero = []
-            area_percentages = []
-
-            for idx, stat in enumerate(stats_values):
-                unit_area = adm_flood.iloc[idx]['unit_area_m2']
-
-                if stat is not None and 'mini_raster_array' in stat:
-                    values = stat['mini_raster_array'].compressed()
-
-                    if len(values) > 0:
-                        # Additional safety check: exclude ALL negative values
-                        # This removes any nodata values and keeps only valid flood depths (>= 0)
-                        values = values[values >= 0]
-
-                        if len(values) > 0:
-                            # Calculate mean of values > 0
-                            mean_val = calculate_mean_above_threshold(values, threshold=0)
-
-                            # Count pixels above value threshold
-                            affected_pixels = np.sum(values > value_threshold)
-                            total_pixels = len(values)
-
-                            # Calculate area percentage
-                            area_pct = (affected_pixels / total_pixels) * 100 if total_pixels > 0 else 0
-                        else:
-                            mean_val = 0
-                            area_pct = 0
-                    else:
-                        mean_val = 0
-                        area_pct = 0
-                else:
-                    mean_val = 0
-                    area_pct = 0
-
-                means_above_zero.append(mean_val)
-                area_percentages.append(area_pct)
-
-            # Add to dataframe
-            adm_flood[f'{rp_name}_mean'] = means_above_zero
-            adm_flood[f'{rp_name}_affected_pct'] = area_percentages
-
-            print(f"  Mean statistics: {min(means_above_zero):.2f} - {max(means_above_zero):.2f}")
-            print(f"  Affected area %: {min(area_percentages):.2f}% - {max(area_percentages):.2f}%")
-
-            rp_stats.append((means_above_zero, area_percentages))
-
-        # Calculate hazard scores
-        print("\nCalculating Hazard Scores...")
-        hazard_scores = []
-
-        for i in range(len(adm_flood)):
-            # Collect (mean, area_pct) pairs for this unit across all RPs
-            unit_stats = []
+            # Available return periods, all read in one pass by the threshold engine
+            paths = {}
+            nodata = {}
             for rp in return_periods:
                 rp_name = f'RP{rp}'
-                if f'{rp_name}_mean' in adm_flood.columns:
-                    mean_val = adm_flood.iloc[i][f'{rp_name}_mean']
-                    area_pct = adm_flood.iloc[i][f'{rp_name}_affected_pct']
-                    unit_stats.append((mean_val, area_pct))
 
-            score = calculate_hazard_score(value_threshold, area_threshold_pct, *unit_stats)
-            hazard_scores.append(score)
+                if rp_name not in raster_paths:
+                    print(f"Skipping {rp_name} - file not found")
+                    continue
+
+                print(f"\n{rp_name}:")
+                paths[rp_name] = raster_paths[rp_name]
+                nodata[rp_name] = flood_nodata(raster_paths[rp_name])
 
-        adm_flood['Hazard_score'] = hazard_scores
+            # Mean of values > 0 and percentage of the valid area (>= 0) above the value threshold per RP
+            config = {'name': flood_type, 'type': 'raster_flood', 'paths': paths, 'nodata': nodata, 'min_value': 0}
+            adm_flood = threshold_engine.run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct,
+                                                                pool=pool)
 
-        # Display score distribution
-        score_counts = adm_flood['Hazard_score'].value_counts().sort_index()
-        print("\nHazard Score Distribution:")
-        for score, count in score_counts.items():
-            percentage = (count / len(adm_flood)) * 100
-            print(f"  Score {score}: {count} units ({percentage:.1f}%)")
+            # Display score distribution
+            score_counts = adm_flood['Hazard_score'].value_counts().sort_index()
+            print("\nHazard Score Distribution:")
+            for score, count in score_counts.items():
+                percentage = (count / len(adm_flood)) * 100
+                print(f"  Score {score}: {count} units ({percentage:.1f}%)")
 
-        results[flood_type] = adm_flood
+            results[flood_type] = adm_flood
 
     return results
 
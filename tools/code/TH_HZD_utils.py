@@ -3,10 +3,8 @@
 # Provides functions for calculating hazard scores for various natural hazards
 
 import geopandas as gpd
-import numpy as np
 import pandas as pd
 import rasterio
-from rasterstats import zonal_stats
 from pathlib import Path
 import folium
 from folium.plugins import MiniMap, Fullscreen
@@ -15,10 +13,9 @@ import matplotlib.colors as mcolors
 from IPython.display import display, clear_output, HTML
 import time
 import multiprocessing as mp
-from functools import partial
-import itertools as it
 
 import common
+import threshold_engine
 from input_utils import get_adm_data
 
 
@@ -51,6 +48,7 @@ HAZARD_CONFIG = {
         'files': ['LS_CDRI_baseline.tif'],
         'rp_names': ['Index'],
         'type': 'raster_remap',
+        'prefix': 'LS',  # Column prefix of the index statistics
         'remap': {1: -1, 2: 0, 3: 1, 4: 2, 5: 3}  # Index 1 = not affected
     },
     'tsunami': {
@@ -63,6 +61,7 @@ HAZARD_CONFIG = {
         'rp_names': ['RP100', 'RP500', 'RP2500'],
         'type': 'raster_tsunami',  # Special type for tsunami (uses majority, different scoring)
         'not_affected': True,
+        'majority_step': 0.1,  # meters, width of the depth bins of the majority
         'rp_thresholds': {
             'RP100': 2.0,  # meters
             'RP500': 1.0,  # meters
@@ -143,218 +142,52 @@ HAZARD_CONFIG = {
 }
 
 
-# Functions for parallel processing of zonal_stats
-def zonal_stats_partial(feats, raster, stats=[], affine=None, nodata=None, all_touched=True, raster_out=True):
-    """Partial zonal stats for parallel processing on a list of features"""
-    return zonal_stats(feats, raster, stats=stats, affine=affine, nodata=nodata,
-                      all_touched=all_touched, raster_out=raster_out)
-
-
-def calculate_mean_above_threshold(values, threshold=0):
-    """
-    Calculate mean of values greater than threshold.
-    Returns 0 if no values meet the condition.
-    """
-    if values is None or len(values) == 0:
-        return 0
-
-    filtered_values = [v for v in values if v is not None and v > threshold]
-
-    if len(filtered_values) == 0:
-        return 0
-
-    return np.mean(filtered_values)
-
-
-def calculate_hazard_score_raster(value_threshold, area_threshold_pct, *rp_stats):
-    """
-    Calculate hazard score based on area threshold for raster data.
-
-    Logic:
-    - For each return period, check if area threshold is met
-    - Area is calculated as percentage of pixels with values > value_threshold
-    - Score = count of RPs meeting area threshold (0, 1, 2, or 3)
-
-    Args:
-        value_threshold: Value threshold (used to identify affected pixels)
-        area_threshold_pct: Minimum area percentage threshold
-        *rp_stats: Tuples of (mean_value, area_pct) for each return period
-                   Note: mean_value is kept for backwards compatibility but not used in scoring
-
-    Returns:
-        int: Hazard score (0-3)
-    """
-    score = 0
-
-    for mean_val, area_pct in rp_stats:
-        # Only check if area percentage meets threshold
-        # The area_pct already represents pixels with values > value_threshold
-        if area_pct >= area_threshold_pct:
-            score += 1
-
-    return score
+def print_score_distribution(adm_hazard, labels=None):
+    """Print the number and share of units of each hazard score, with optional labels by score."""
+    score_counts = adm_hazard['Hazard_score'].value_counts().sort_index()
+    print("\nHazard Score Distribution:")
+    for score, count in score_counts.items():
+        percentage = (count / len(adm_hazard)) * 100
+        label = (labels or {}).get(score)
+        score_name = f"Score {score} ({label})" if label else f"Score {score}"
+        print(f"  {score_name}: {count} units ({percentage:.1f}%)")
 
 
-def process_raster_mean_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct):
+def process_raster_mean_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, pool=None):
     """
-    Process hazard types that use raster area-based approach (earthquake, cyclone, wildfire).
+    Process hazard types that use raster area-based approach (e.g. wildfire).
 
     Logic:
     - For each RP scenario, calculate the area percentage with values > value_threshold
     - If area percentage >= area_threshold_pct, the RP contributes +1 to hazard score
     - Final score = sum of RPs meeting the area threshold (0-3)
-    - For cyclone: if no pixels exceed threshold in ANY RP, score = -1 (not affected)
-    - For wildfire: if area with FWI > 0 doesn't meet area_threshold_pct in ANY RP, score = -1 (not affected)
-      This means even if some pixels have FWI > 0, if the affected area is too small (< area_threshold_pct),
-      the unit is considered "not affected" by wildfire risk.
+    - With 'not_affected' (wildfire): if area with values > 0 doesn't meet area_threshold_pct in ANY RP,
+      score = -1 (not affected). This means even if some pixels have FWI > 0, if the affected area is too
+      small (< area_threshold_pct), the unit is considered "not affected" by wildfire risk.
 
     Args:
         adm_units: GeoDataFrame with administrative boundaries
         hazard_key: Key to HAZARD_CONFIG dictionary
         value_threshold: Minimum value threshold to identify affected pixels
         area_threshold_pct: Minimum area percentage threshold for scoring
+        pool: multiprocessing Pool shared with other analyses (optional)
 
     Returns:
-        GeoDataFrame with hazard scores and statistics (scores: -1, 0-3 for cyclone/wildfire; 0-3 for earthquake)
+        GeoDataFrame with hazard scores and statistics (scores: -1, 0-3)
     """
     config = HAZARD_CONFIG[hazard_key]
     print(f"\n{'='*60}")
     print(f"Processing {config['name']} Hazard")
     print(f"{'='*60}")
 
-    adm_hazard = adm_units.copy()
-
-    # Process each raster layer
-    rp_stats = []
-    for rp_name, filename in zip(config['rp_names'], config['files']):
-        raster_path = Path(common.DATA_DIR) / config['folder'] / filename
-
-        if not raster_path.exists():
-            print(f"Warning: Raster not found: {raster_path}")
-            continue
-
-        print(f"\nProcessing {rp_name}...")
-
-        # Calculate zonal statistics using parallel processing
-        cores = min(len(adm_hazard), mp.cpu_count())
-
-        # Split geometries into chunks for parallel processing
-        geom_list = list(adm_hazard.geometry)
-        chunk_size = len(geom_list) // cores + (1 if len(geom_list) % cores else 0)
-        geom_chunks = [geom_list[i:i + chunk_size] for i in range(0, len(geom_list), chunk_size)]
-
-        with mp.Pool(cores) as p:
-            func = partial(zonal_stats_partial, raster=str(raster_path), stats=[],
-                         all_touched=True, nodata=-9999, raster_out=True)
-            stats_parallel = p.map(func, geom_chunks)
-
-        stats_values = list(it.chain(*stats_parallel))
-
-        # Calculate mean of values > 0 and affected area percentage
-        means_above_zero = []
-        area_percentages = []
-        area_above_zero_pcts = []  # For wildfire: track % of area with FWI > 0
-
-        for idx, stat in enumerate(stats_values):
-            unit_area = adm_hazard.iloc[idx]['unit_area_m2']
-
-            if stat is not None and 'mini_raster_array' in stat:
-                values = stat['mini_raster_array'].compressed()
-
-                if len(values) > 0:
-                    # Calculate mean of values > 0
-                    mean_val = calculate_mean_above_threshold(values, threshold=0)
-
-                    # Count pixels above value threshold
-                    affected_pixels = np.sum(values > value_threshold)
-                    total_pixels = len(values)
-
-                    # Calculate area percentage (pixels > value_threshold)
-                    area_pct = (affected_pixels / total_pixels) * 100 if total_pixels > 0 else 0
-
-                    # For wildfire: also track percentage of pixels with any FWI > 0
-                    if hazard_key == 'wildfire':
-                        pixels_above_zero = np.sum(values > 0)
-                        area_pct_above_zero = (pixels_above_zero / total_pixels) * 100 if total_pixels > 0 else 0
-                        area_above_zero_pcts.append(area_pct_above_zero)
-                else:
-                    mean_val = 0
-                    area_pct = 0
-                    if hazard_key == 'wildfire':
-                        area_above_zero_pcts.append(0)
-            else:
-                mean_val = 0
-                area_pct = 0
-                if hazard_key == 'wildfire':
-                    area_above_zero_pcts.append(0)
-
-            means_above_zero.append(mean_val)
-            area_percentages.append(area_pct)
-
-        # Add to dataframe
-        adm_hazard[f'{rp_name}_mean'] = means_above_zero
-        adm_hazard[f'{rp_name}_affected_pct'] = area_percentages
-
-        # For wildfire: also store area > 0 percentage
-        if hazard_key == 'wildfire':
-            adm_hazard[f'{rp_name}_area_above_zero_pct'] = area_above_zero_pcts
-
-        print(f"  Mean statistics: {min(means_above_zero):.2f} - {max(means_above_zero):.2f}")
-        print(f"  Affected area %: {min(area_percentages):.2f}% - {max(area_percentages):.2f}%")
-
-        rp_stats.append((means_above_zero, area_percentages))
-
-    # Calculate hazard scores
-    print("\nCalculating Hazard Scores...")
-    hazard_scores = []
-
-    for i in range(len(adm_hazard)):
-        # Collect (mean, area_pct) pairs for this unit across all RPs
-        unit_stats = []
-        for rp_name in config['rp_names']:
-            if f'{rp_name}_mean' in adm_hazard.columns:
-                mean_val = adm_hazard.iloc[i][f'{rp_name}_mean']
-                area_pct = adm_hazard.iloc[i][f'{rp_name}_affected_pct']
-                unit_stats.append((mean_val, area_pct))
-
-        score = calculate_hazard_score_raster(value_threshold, area_threshold_pct, *unit_stats)
-
-        # For cyclone: if no pixels exceed threshold (area_pct = 0) in ALL RPs, mark as not affected (-1)
-        if hazard_key == 'cyclone':
-            all_zero = all(area_pct == 0 for _, area_pct in unit_stats)
-            if all_zero:
-                score = -1
-
-        # For wildfire: mark as not affected (-1) if area with FWI > 0 doesn't meet area threshold in ANY RP
-        if hazard_key == 'wildfire':
-            # Check if any RP has sufficient area with FWI > 0
-            has_sufficient_area = False
-            for rp_name in config['rp_names']:
-                if f'{rp_name}_area_above_zero_pct' in adm_hazard.columns:
-                    area_above_zero = adm_hazard.iloc[i][f'{rp_name}_area_above_zero_pct']
-                    if area_above_zero >= area_threshold_pct:
-                        has_sufficient_area = True
-                        break
-
-            # If no RP has sufficient area with FWI > 0, mark as not affected
-            if not has_sufficient_area:
-                score = -1
-
-        hazard_scores.append(score)
-
-    adm_hazard['Hazard_score'] = hazard_scores
-
-    # Display score distribution
-    score_counts = adm_hazard['Hazard_score'].value_counts().sort_index()
-    print("\nHazard Score Distribution:")
-    for score, count in score_counts.items():
-        percentage = (count / len(adm_hazard)) * 100
-        print(f"  Score {score}: {count} units ({percentage:.1f}%)")
+    adm_hazard = threshold_engine.run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct,
+                                                         pool=pool)
+    print_score_distribution(adm_hazard)
 
     return adm_hazard
 
 
-def process_landslide_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct):
+def process_landslide_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, pool=None):
     """
     Process landslide hazard with area-based index classification.
 
@@ -362,12 +195,14 @@ def process_landslide_hazard(adm_units, hazard_key, value_threshold, area_thresh
     - For each admin unit, calculate the total area covered by each landslide index class (1-5)
     - Check if the area of the highest index class exceeds the area threshold
     - Assign hazard score based on the highest index class that meets the area threshold
+    - Units are processed in country partitions across a process pool (see threshold_engine.zonal_class_areas)
 
     Args:
         adm_units: GeoDataFrame with administrative boundaries
         hazard_key: Key to HAZARD_CONFIG dictionary (should be 'landslide')
         value_threshold: Not used for landslide
         area_threshold_pct: Minimum area percentage threshold
+        pool: multiprocessing Pool shared with other analyses (optional)
 
     Returns:
         GeoDataFrame with hazard scores
@@ -378,180 +213,24 @@ def process_landslide_hazard(adm_units, hazard_key, value_threshold, area_thresh
     print(f"{'='*60}")
     print(f"Using area-based classification with {area_threshold_pct}% threshold")
 
-    adm_hazard = adm_units.copy()
-
-    raster_path = Path(common.DATA_DIR) / config['folder'] / config['files'][0]
-
-    if not raster_path.exists():
-        print(f"Error: Raster not found: {raster_path}")
+    adm_hazard = threshold_engine.run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct,
+                                                         pool=pool)
+    if 'Hazard_score' not in adm_hazard.columns:
         return adm_hazard
-
-    # Check if processing global dataset (large)
-    is_global = len(adm_hazard) > 1000  # If more than 1000 units, assume global
-
-    if is_global and 'ISO_A3' in adm_hazard.columns:
-        print(f"\nDetected large global dataset ({len(adm_hazard)} units)")
-        print(f"Processing sequentially by country to avoid memory issues...")
-        print(f"Note: This will be slower but memory-safe for large global rasters.")
-
-        # Get unique countries
-        countries = adm_hazard['ISO_A3'].unique()
-        print(f"Found {len(countries)} countries to process")
-
-        # Initialize results dictionary to maintain correct order
-        stats_dict = {}
-        from tqdm import tqdm
-
-        # Process each country sequentially (no multiprocessing to avoid memory issues)
-        country_list = list(countries)
-        for country in tqdm(country_list, desc="Processing countries"):
-            country_mask = adm_hazard['ISO_A3'] == country
-            country_indices = adm_hazard[country_mask].index.tolist()
-            country_geoms = list(adm_hazard[country_mask].geometry)
-
-            # Process this country sequentially
-            try:
-                country_stats = zonal_stats(country_geoms, str(raster_path), stats=[],
-                                          all_touched=True, nodata=-9999, raster_out=True)
-
-                # Verify we got the right number of results
-                if len(country_stats) != len(country_geoms):
-                    print(f"\nWarning: {country} returned {len(country_stats)} results for {len(country_geoms)} geometries")
-                    while len(country_stats) < len(country_geoms):
-                        country_stats.append(None)
-
-                # Store results in dictionary with original indices
-                for idx, stat in zip(country_indices, country_stats):
-                    stats_dict[idx] = stat
-
-            except Exception as e:
-                print(f"\nError processing {country}: {e}")
-                # Add None results for this country
-                for idx in country_indices:
-                    stats_dict[idx] = None
-
-        # Convert dictionary to list in correct order
-        stats_values = [stats_dict.get(idx, None) for idx in adm_hazard.index]
-
-        print(f"Completed processing all {len(countries)} countries")
-        print(f"Total results: {len(stats_values)}, expected: {len(adm_hazard)}")
-    else:
-        print(f"\nProcessing landslide index with area-based approach...")
-
-        # For smaller datasets, use parallel processing
-        cores = min(len(adm_hazard), mp.cpu_count())
-
-        # Split geometries into smaller chunks to avoid memory issues
-        geom_list = list(adm_hazard.geometry)
-        # Use smaller chunks - max 100 geometries per chunk
-        chunk_size = min(100, len(geom_list) // cores + (1 if len(geom_list) % cores else 0))
-        geom_chunks = [geom_list[i:i + chunk_size] for i in range(0, len(geom_list), chunk_size)]
-
-        print(f"Processing {len(geom_list)} units in {len(geom_chunks)} chunks with {cores} cores...")
-
-        # Get raster arrays for each unit
-        try:
-            with mp.Pool(cores) as p:
-                func = partial(zonal_stats_partial, raster=str(raster_path), stats=[],
-                             all_touched=True, nodata=-9999, raster_out=True)
-                stats_parallel = p.map(func, geom_chunks)
-
-            stats_values = list(it.chain(*stats_parallel))
-        except Exception as e:
-            print(f"Warning: Parallel processing failed ({e}), falling back to sequential processing...")
-            # Fallback to sequential processing
-            stats_values = zonal_stats(geom_list, str(raster_path), stats=[],
-                                      all_touched=True, nodata=-9999, raster_out=True)
-
-    # Process each unit's raster data
-    max_index_values = []
-    hazard_scores = []
-
-    # Store area percentages for each index class for reporting
-    index_area_stats = {1: [], 2: [], 3: [], 4: [], 5: []}
-
-    for idx, stat in enumerate(stats_values):
-        unit_area = adm_hazard.iloc[idx]['unit_area_m2']
-
-        if stat is not None and 'mini_raster_array' in stat:
-            # Use memory-efficient approach: count directly on masked array without decompression
-            arr = stat['mini_raster_array']
-
-            # Ensure data stays as original dtype (usually uint8 for landslide) to save memory
-            data = arr.data
-
-            # Count valid pixels and class occurrences directly on masked array
-            if arr.mask is np.ma.nomask:
-                # No mask, all pixels are valid
-                total_pixels = data.size
-            else:
-                # Count only non-masked pixels - use int32 instead of int64 for counting
-                total_pixels = int(np.sum(~arr.mask, dtype=np.int32))
-
-            if total_pixels > 0:
-                # Count pixels for each index class (1-5) directly without creating intermediate arrays
-                index_counts = {}
-                for index_class in [1, 2, 3, 4, 5]:
-                    if arr.mask is np.ma.nomask:
-                        # No mask - count all matching pixels, use int32 for memory efficiency
-                        pixel_count = int(np.count_nonzero(data == index_class))
-                    else:
-                        # With mask - count only non-masked matching pixels
-                        # Use bitwise operations to avoid creating large intermediate arrays
-                        pixel_count = int(np.count_nonzero((data == index_class) & (~arr.mask)))
-                    area_pct = (pixel_count / total_pixels) * 100
-                    index_counts[index_class] = area_pct
-                    index_area_stats[index_class].append(area_pct)
-
-                # Find the highest index class that meets the area threshold
-                # Check from highest (5) to lowest (1)
-                max_index = 1  # Default: index 1 (not affected)
-                for index_class in [5, 4, 3, 2, 1]:
-                    if index_counts[index_class] >= area_threshold_pct:
-                        max_index = index_class
-                        break
-
-                max_index_values.append(max_index)
-
-                # Remap to hazard score
-                score = config['remap'].get(max_index, 0)
-                hazard_scores.append(score)
-            else:
-                max_index_values.append(0)
-                hazard_scores.append(0)
-                for index_class in [1, 2, 3, 4, 5]:
-                    index_area_stats[index_class].append(0)
-        else:
-            max_index_values.append(0)
-            hazard_scores.append(0)
-            for index_class in [1, 2, 3, 4, 5]:
-                index_area_stats[index_class].append(0)
-
-    adm_hazard['LS_Index_max'] = max_index_values
-    adm_hazard['Hazard_score'] = hazard_scores
-
-    # Add area percentage columns for each index class
-    for index_class in [1, 2, 3, 4, 5]:
-        adm_hazard[f'LS_Index{index_class}_area_pct'] = index_area_stats[index_class]
-
-    # Display score distribution
-    score_counts = adm_hazard['Hazard_score'].value_counts().sort_index()
-    print("\nHazard Score Distribution:")
-    for score, count in score_counts.items():
-        percentage = (count / len(adm_hazard)) * 100
-        print(f"  Score {score}: {count} units ({percentage:.1f}%)")
+    print_score_distribution(adm_hazard)
 
     # Display index class statistics
     print("\nLandslide Index Class Statistics (max area %):")
     for index_class in [5, 4, 3, 2, 1]:
-        areas = [a for a in index_area_stats[index_class] if a > 0]
-        if areas:
-            print(f"  Index {index_class}: max={max(areas):.1f}%, mean={np.mean(areas):.1f}%")
+        areas = adm_hazard[f"{config['prefix']}_Index{index_class}_area_pct"].values
+        areas = areas[areas > 0]
+        if len(areas):
+            print(f"  Index {index_class}: max={areas.max():.1f}%, mean={areas.mean():.1f}%")
 
     return adm_hazard
 
 
-def process_volcano_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct):
+def process_volcano_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, pool=None):
     """
     Process volcano hazard with VEI intersection and remapping.
 
@@ -565,6 +244,7 @@ def process_volcano_hazard(adm_units, hazard_key, value_threshold, area_threshol
         hazard_key: Key to HAZARD_CONFIG dictionary (should be 'volcano')
         value_threshold: Not used for volcano
         area_threshold_pct: Minimum area percentage threshold for intersection
+        pool: Not used for volcano, accepted for a uniform signature
 
     Returns:
         GeoDataFrame with hazard scores (scores: -1, 0-3)
@@ -574,94 +254,17 @@ def process_volcano_hazard(adm_units, hazard_key, value_threshold, area_threshol
     print(f"Processing {config['name']} Hazard")
     print(f"{'='*60}")
 
-    adm_hazard = adm_units.copy()
-
-    volcano_path = Path(common.DATA_DIR) / config['folder'] / config['files'][0]
-
-    if not volcano_path.exists():
-        print(f"Error: Vector file not found: {volcano_path}")
+    adm_hazard = threshold_engine.run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct,
+                                                         pool=pool)
+    if 'Hazard_score' not in adm_hazard.columns:
         return adm_hazard
-
-    print(f"\nLoading volcano exposure data...")
-    volcano_gdf = gpd.read_file(volcano_path)
-
-    # Ensure same CRS
-    if volcano_gdf.crs != adm_hazard.crs:
-        volcano_gdf = volcano_gdf.to_crs(adm_hazard.crs)
-
-    print(f"Processing VEI intersections...")
-
-    vei_values = []
-    hazard_scores = []
-
-    for idx, adm_row in adm_hazard.iterrows():
-        adm_geom = adm_row.geometry
-        adm_area = adm_row['unit_area_m2']
-
-        # Find intersecting volcano polygons
-        intersecting = volcano_gdf[volcano_gdf.intersects(adm_geom)]
-
-        if len(intersecting) == 0:
-            # No intersection with any volcano buffer = not affected
-            vei_values.append(0)
-            hazard_scores.append(-1)
-            continue
-
-        # Calculate intersection areas and find max VEI that meets area threshold
-        max_vei = 0
-        for _, volcano_row in intersecting.iterrows():
-            intersection = adm_geom.intersection(volcano_row.geometry)
-
-            # Calculate intersection area in projected CRS
-            if adm_hazard.crs.is_geographic:
-                # Project to UTM for area calculation
-                adm_geom_proj = gpd.GeoSeries([intersection], crs=adm_hazard.crs).to_crs(
-                    adm_hazard.estimate_utm_crs()
-                )
-                intersection_area = adm_geom_proj.geometry.area.iloc[0]
-            else:
-                intersection_area = intersection.area
-
-            # Check if intersection meets area threshold
-            area_pct = (intersection_area / adm_area) * 100
-
-            if area_pct >= area_threshold_pct:
-                vei = volcano_row[config['field']]
-                if vei > max_vei:
-                    max_vei = vei
-
-        vei_values.append(max_vei)
-
-        # If max_vei is 0, no VEI met the area threshold = not affected
-        if max_vei == 0:
-            hazard_scores.append(-1)
-        else:
-            # Remap VEI to hazard score
-            score = 0
-            for min_val, max_val, hazard_score in config['remap']['ranges']:
-                if min_val <= max_vei < max_val:
-                    if hazard_score == -1:  # No hazard
-                        score = 0
-                    else:
-                        score = hazard_score
-                    break
-
-            hazard_scores.append(score)
-
-    adm_hazard['VEI_max'] = vei_values
-    adm_hazard['Hazard_score'] = hazard_scores
-
-    # Display score distribution
-    score_counts = adm_hazard['Hazard_score'].value_counts().sort_index()
-    print("\nHazard Score Distribution:")
-    for score, count in score_counts.items():
-        percentage = (count / len(adm_hazard)) * 100
-        print(f"  Score {score}: {count} units ({percentage:.1f}%)")
+    print_score_distribution(adm_hazard)
 
     return adm_hazard
 
 
-def process_extreme_heat_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds=None):
+def process_extreme_heat_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds=None,
+                                pool=None):
     """
     Process extreme heat hazard with RP-specific temperature thresholds.
 
@@ -677,6 +280,7 @@ def process_extreme_heat_hazard(adm_units, hazard_key, value_threshold, area_thr
         value_threshold: Not used - RP-specific thresholds passed separately
         area_threshold_pct: Minimum area percentage threshold
         rp_thresholds: Dict with 'RP5', 'RP20', 'RP100' temperature thresholds (optional, uses config defaults if None)
+        pool: multiprocessing Pool shared with other analyses (optional)
 
     Returns:
         GeoDataFrame with hazard scores
@@ -696,113 +300,15 @@ def process_extreme_heat_hazard(adm_units, hazard_key, value_threshold, area_thr
     print(f"  RP100 >{rp_thresholds['RP100']}°C = Low")
     print(f"Area threshold: {area_threshold_pct}%")
 
-    adm_hazard = adm_units.copy()
-
-    # Process each return period with its specific threshold
-    rp_results = {}
-
-    for rp_name, filename in zip(config['rp_names'], config['files']):
-        raster_path = Path(common.DATA_DIR) / config['folder'] / filename
-
-        if not raster_path.exists():
-            print(f"Warning: Raster not found: {raster_path}")
-            continue
-
-        # Get the temperature threshold for this RP
-        temp_threshold = rp_thresholds[rp_name]
-        print(f"\nProcessing {rp_name} (threshold: {temp_threshold}°C)...")
-
-        # Calculate zonal statistics using parallel processing
-        cores = min(len(adm_hazard), mp.cpu_count())
-
-        # Split geometries into chunks for parallel processing
-        geom_list = list(adm_hazard.geometry)
-        chunk_size = len(geom_list) // cores + (1 if len(geom_list) % cores else 0)
-        geom_chunks = [geom_list[i:i + chunk_size] for i in range(0, len(geom_list), chunk_size)]
-
-        with mp.Pool(cores) as p:
-            func = partial(zonal_stats_partial, raster=str(raster_path), stats=[],
-                         all_touched=True, nodata=-9999, raster_out=True)
-            stats_parallel = p.map(func, geom_chunks)
-
-        stats_values = list(it.chain(*stats_parallel))
-
-        # Calculate mean and area percentage for each unit
-        means = []
-        area_percentages = []
-
-        for idx, stat in enumerate(stats_values):
-            if stat is not None and 'mini_raster_array' in stat:
-                values = stat['mini_raster_array'].compressed()
-
-                if len(values) > 0:
-                    # Calculate mean temperature
-                    mean_val = np.mean(values)
-
-                    # Count pixels above temperature threshold
-                    affected_pixels = np.sum(values > temp_threshold)
-                    total_pixels = len(values)
-
-                    # Calculate area percentage
-                    area_pct = (affected_pixels / total_pixels) * 100 if total_pixels > 0 else 0
-                else:
-                    mean_val = 0
-                    area_pct = 0
-            else:
-                mean_val = 0
-                area_pct = 0
-
-            means.append(mean_val)
-            area_percentages.append(area_pct)
-
-        # Store results for this RP
-        adm_hazard[f'{rp_name}_mean'] = means
-        adm_hazard[f'{rp_name}_area_pct'] = area_percentages
-        rp_results[rp_name] = {'means': means, 'area_pcts': area_percentages}
-
-        print(f"  Mean temp: {min(means):.1f}°C - {max(means):.1f}°C")
-        print(f"  Area >{temp_threshold}°C: {min(area_percentages):.1f}% - {max(area_percentages):.1f}%")
-
-    # Calculate hazard scores based on RP-specific logic
-    print("\nCalculating Hazard Scores...")
-    hazard_scores = []
-
-    for i in range(len(adm_hazard)):
-        score = 0
-
-        # Check RP5 (High): >threshold with area >= area_threshold_pct
-        if 'RP5' in rp_results:
-            if rp_results['RP5']['area_pcts'][i] > 0 and rp_results['RP5']['area_pcts'][i] >= area_threshold_pct:
-                score = 3  # High
-
-        # Check RP20 (Medium): >threshold with area >= area_threshold_pct
-        if 'RP20' in rp_results and score < 2:
-            if rp_results['RP20']['area_pcts'][i] > 0 and rp_results['RP20']['area_pcts'][i] >= area_threshold_pct:
-                score = 2  # Medium
-
-        # Check RP100 (Low): >threshold with area >= area_threshold_pct
-        if 'RP100' in rp_results and score < 1:
-            if rp_results['RP100']['area_pcts'][i] > 0 and rp_results['RP100']['area_pcts'][i] >= area_threshold_pct:
-                score = 1  # Low
-
-        # If no RP exceeded thresholds, score remains 0 (no hazard)
-
-        hazard_scores.append(score)
-
-    adm_hazard['Hazard_score'] = hazard_scores
-
-    # Display score distribution
-    score_counts = adm_hazard['Hazard_score'].value_counts().sort_index()
-    print("\nHazard Score Distribution:")
-    for score, count in score_counts.items():
-        percentage = (count / len(adm_hazard)) * 100
-        score_label = {0: 'None', 1: 'Low', 2: 'Medium', 3: 'High'}.get(score, str(score))
-        print(f"  Score {score} ({score_label}): {count} units ({percentage:.1f}%)")
+    adm_hazard = threshold_engine.run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct,
+                                                         rp_thresholds, pool=pool)
+    print_score_distribution(adm_hazard, {0: 'None', 1: 'Low', 2: 'Medium', 3: 'High'})
 
     return adm_hazard
 
 
-def process_rp_threshold_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds=None):
+def process_rp_threshold_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds=None,
+                                pool=None):
     """
     Process hazards with RP-specific thresholds (earthquake, cyclone).
 
@@ -819,6 +325,7 @@ def process_rp_threshold_hazard(adm_units, hazard_key, value_threshold, area_thr
         value_threshold: Not used - RP-specific thresholds apply
         area_threshold_pct: Minimum area percentage threshold
         rp_thresholds: Dict with RP-specific thresholds (optional, uses config defaults if None)
+        pool: multiprocessing Pool shared with other analyses (optional)
 
     Returns:
         GeoDataFrame with hazard scores and statistics (scores: -1, 1-4)
@@ -837,111 +344,15 @@ def process_rp_threshold_hazard(adm_units, hazard_key, value_threshold, area_thr
         print(f"  {rp_name} >{rp_thresholds[rp_name]} {config['unit']}")
     print(f"Area threshold: {area_threshold_pct}%")
 
-    adm_hazard = adm_units.copy()
-
-    # Process each return period with its specific threshold
-    rp_results = {}
-
-    for rp_name, filename in zip(config['rp_names'], config['files']):
-        raster_path = Path(common.DATA_DIR) / config['folder'] / filename
-
-        if not raster_path.exists():
-            print(f"Warning: Raster not found: {raster_path}")
-            continue
-
-        # Get the threshold for this RP
-        rp_threshold = rp_thresholds[rp_name]
-        print(f"\nProcessing {rp_name} (threshold: {rp_threshold} {config['unit']})...")
-
-        # Calculate zonal statistics using parallel processing
-        cores = min(len(adm_hazard), mp.cpu_count())
-
-        # Split geometries into chunks for parallel processing
-        geom_list = list(adm_hazard.geometry)
-        chunk_size = len(geom_list) // cores + (1 if len(geom_list) % cores else 0)
-        geom_chunks = [geom_list[i:i + chunk_size] for i in range(0, len(geom_list), chunk_size)]
-
-        with mp.Pool(cores) as p:
-            func = partial(zonal_stats_partial, raster=str(raster_path), stats=[],
-                         all_touched=True, nodata=-9999, raster_out=True)
-            stats_parallel = p.map(func, geom_chunks)
-
-        stats_values = list(it.chain(*stats_parallel))
-
-        # Calculate mean and area percentage for each unit
-        means = []
-        area_percentages = []
-
-        for idx, stat in enumerate(stats_values):
-            if stat is not None and 'mini_raster_array' in stat:
-                values = stat['mini_raster_array'].compressed()
-
-                if len(values) > 0:
-                    # Calculate mean
-                    mean_val = np.mean(values)
-
-                    # Count pixels above RP-specific threshold
-                    affected_pixels = np.sum(values > rp_threshold)
-                    total_pixels = len(values)
-
-                    # Calculate area percentage
-                    area_pct = (affected_pixels / total_pixels) * 100 if total_pixels > 0 else 0
-                else:
-                    mean_val = 0
-                    area_pct = 0
-            else:
-                mean_val = 0
-                area_pct = 0
-
-            means.append(mean_val)
-            area_percentages.append(area_pct)
-
-        # Store results for this RP
-        adm_hazard[f'{rp_name}_mean'] = means
-        adm_hazard[f'{rp_name}_area_pct'] = area_percentages
-        rp_results[rp_name] = {'means': means, 'area_pcts': area_percentages}
-
-        print(f"  Mean: {min(means):.1f} - {max(means):.1f} {config['unit']}")
-        print(f"  Area >{rp_threshold}: {min(area_percentages):.1f}% - {max(area_percentages):.1f}%")
-
-    # Calculate hazard scores - count RPs meeting threshold
-    print("\nCalculating Hazard Scores...")
-    hazard_scores = []
-
-    for i in range(len(adm_hazard)):
-        rp_count = 0
-
-        # Count how many RPs meet the area threshold
-        for rp_name in config['rp_names']:
-            if rp_name in rp_results:
-                area_pct = rp_results[rp_name]['area_pcts'][i]
-                if area_pct >= area_threshold_pct:
-                    rp_count += 1
-
-        # Convert RP count to score: 0 RPs = -1, 1 RP = 0, 2 RPs = 1, 3 RPs = 2, 4 RPs = 3
-        if rp_count == 0:
-            score = -1
-        else:
-            score = rp_count - 1
-
-        hazard_scores.append(score)
-
-    adm_hazard['Hazard_score'] = hazard_scores
-
-    # Display score distribution
-    score_counts = adm_hazard['Hazard_score'].value_counts().sort_index()
-    print("\nHazard Score Distribution:")
-    for score, count in score_counts.items():
-        percentage = (count / len(adm_hazard)) * 100
-        if score == -1:
-            print(f"  Score {score} (Not Affected): {count} units ({percentage:.1f}%)")
-        else:
-            print(f"  Score {score}: {count} units ({percentage:.1f}%)")
+    adm_hazard = threshold_engine.run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct,
+                                                         rp_thresholds, pool=pool)
+    print_score_distribution(adm_hazard, {-1: 'Not Affected'})
 
     return adm_hazard
 
 
-def process_tsunami_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds=None):
+def process_tsunami_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds=None,
+                           pool=None):
     """
     Process tsunami hazard with RP-specific thresholds using MAJORITY values.
 
@@ -957,6 +368,7 @@ def process_tsunami_hazard(adm_units, hazard_key, value_threshold, area_threshol
         value_threshold: Not used - RP-specific thresholds apply
         area_threshold_pct: Minimum area percentage threshold (usually 0 for tsunami)
         rp_thresholds: Dict with RP-specific thresholds (optional, uses config defaults if None)
+        pool: multiprocessing Pool shared with other analyses (optional)
 
     Returns:
         GeoDataFrame with hazard scores and statistics (scores: -1, 0, 1, 2, 3)
@@ -975,137 +387,29 @@ def process_tsunami_hazard(adm_units, hazard_key, value_threshold, area_threshol
         print(f"  {rp_name} >{rp_thresholds[rp_name]} {config['unit']}")
     print(f"Area threshold: {area_threshold_pct}%")
 
-    adm_hazard = adm_units.copy()
-
-    # Process each return period with its specific threshold
-    rp_results = {}
-
-    for rp_name, filename in zip(config['rp_names'], config['files']):
-        raster_path = Path(common.DATA_DIR) / config['folder'] / filename
-
-        if not raster_path.exists():
-            print(f"Warning: Raster not found: {raster_path}")
-            continue
-
-        # Get the threshold for this RP
-        rp_threshold = rp_thresholds[rp_name]
-        print(f"\nProcessing {rp_name} (threshold: {rp_threshold} {config['unit']})...")
-
-        # Calculate zonal statistics using parallel processing
-        cores = min(len(adm_hazard), mp.cpu_count())
-
-        # Split geometries into chunks for parallel processing
-        geom_list = list(adm_hazard.geometry)
-        chunk_size = len(geom_list) // cores + (1 if len(geom_list) % cores else 0)
-        geom_chunks = [geom_list[i:i + chunk_size] for i in range(0, len(geom_list), chunk_size)]
-
-        with mp.Pool(cores) as p:
-            func = partial(zonal_stats_partial, raster=str(raster_path), stats=[],
-                         all_touched=True, nodata=-9999, raster_out=True)
-            stats_parallel = p.map(func, geom_chunks)
-
-        stats_values = list(it.chain(*stats_parallel))
-
-        # Calculate MAX and area percentage for each unit
-        max_values = []
-        area_percentages = []
-
-        for idx, stat in enumerate(stats_values):
-            if stat is not None and 'mini_raster_array' in stat:
-                values = stat['mini_raster_array'].compressed()
-
-                if len(values) > 0:
-                    # Calculate MAJORITY (most common) inundation depth, ignoring zero and nodata
-                    positive_values = values[values > 0]
-                    if len(positive_values) > 0:
-                        unique_vals, counts = np.unique(positive_values, return_counts=True)
-                        majority_val = unique_vals[np.argmax(counts)]
-                    else:
-                        majority_val = 0
-
-                    # Count pixels above RP-specific threshold
-                    affected_pixels = np.sum(values > rp_threshold)
-                    total_pixels = len(values)
-
-                    # Calculate area percentage
-                    area_pct = (affected_pixels / total_pixels) * 100 if total_pixels > 0 else 0
-                else:
-                    majority_val = 0
-                    area_pct = 0
-            else:
-                majority_val = 0
-                area_pct = 0
-
-            max_values.append(majority_val)
-            area_percentages.append(area_pct)
-
-        # Store results for this RP
-        adm_hazard[f'{rp_name}_majority'] = max_values
-        adm_hazard[f'{rp_name}_area_pct'] = area_percentages
-        rp_results[rp_name] = {'majority_values': max_values, 'area_pcts': area_percentages}
-
-        print(f"  Majority: {min(max_values):.1f} - {max(max_values):.1f} {config['unit']}")
-        print(f"  Area >{rp_threshold}: {min(area_percentages):.1f}% - {max(area_percentages):.1f}%")
-
-    # Calculate hazard scores - different logic than earthquake/cyclone
-    print("\nCalculating Hazard Scores...")
-    hazard_scores = []
-
-    for i in range(len(adm_hazard)):
-        # Check if unit has ANY tsunami data (any RP has majority > 0)
-        has_data = False
-        for rp_name in config['rp_names']:
-            if rp_name in rp_results:
-                if rp_results[rp_name]['majority_values'][i] > 0:
-                    has_data = True
-                    break
-
-        if not has_data:
-            # Score -1: No inundation data at all
-            score = -1
-        else:
-            # Count how many RPs meet the threshold
-            rp_count = 0
-            for rp_name in config['rp_names']:
-                if rp_name in rp_results:
-                    majority_val = rp_results[rp_name]['majority_values'][i]
-                    rp_threshold = rp_thresholds[rp_name]
-                    area_pct = rp_results[rp_name]['area_pcts'][i]
-                    # RP meets threshold if majority value exceeds threshold AND area percentage meets minimum
-                    if majority_val >= rp_threshold and area_pct >= area_threshold_pct:
-                        rp_count += 1
-
-            # Score = number of RPs meeting threshold (0, 1, 2, or 3)
-            score = rp_count
-
-        hazard_scores.append(score)
-
-    adm_hazard['Hazard_score'] = hazard_scores
-
-    # Display score distribution
-    score_counts = adm_hazard['Hazard_score'].value_counts().sort_index()
-    print("\nHazard Score Distribution:")
-    for score, count in score_counts.items():
-        percentage = (count / len(adm_hazard)) * 100
-        if score == -1:
-            print(f"  Score {score} (No Data - Not Affected): {count} units ({percentage:.1f}%)")
-        elif score == 0:
-            print(f"  Score {score} (Below Threshold): {count} units ({percentage:.1f}%)")
-        else:
-            print(f"  Score {score} ({score} RP{'s' if score > 1 else ''} meet threshold): {count} units ({percentage:.1f}%)")
+    adm_hazard = threshold_engine.run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct,
+                                                         rp_thresholds, pool=pool)
+    labels = {-1: 'No Data - Not Affected', 0: 'Below Threshold'}
+    labels.update({score: f"{score} RP{'s' if score > 1 else ''} meet threshold" for score in range(1, 4)})
+    print_score_distribution(adm_hazard, labels)
 
     return adm_hazard
 
 
-def process_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct):
+def process_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
     """
     Main processing function that routes to specific hazard processors.
 
+    Hazard types without a specific processor are scored by the reducer registered for their type
+    in threshold_engine, if any.
+
     Args:
         adm_units: GeoDataFrame with administrative boundaries
         hazard_key: Key to HAZARD_CONFIG dictionary
         value_threshold: Minimum value threshold
         area_threshold_pct: Minimum area percentage threshold
+        rp_thresholds: Dict with RP-specific thresholds (optional, uses config defaults if None)
+        pool: multiprocessing Pool shared with other analyses (optional)
 
     Returns:
         GeoDataFrame with hazard scores and statistics
@@ -1119,20 +423,117 @@ def process_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct):
 
     # Route to appropriate processor
     if config['type'] == 'raster_mean':
-        return process_raster_mean_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct)
+        return process_raster_mean_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, pool=pool)
     elif config['type'] == 'raster_remap':
-        return process_landslide_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct)
+        return process_landslide_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, pool=pool)
     elif config['type'] == 'vector_intersect':
-        return process_volcano_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct)
+        return process_volcano_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, pool=pool)
     elif config['type'] == 'raster_heat':
-        return process_extreme_heat_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct)
+        return process_extreme_heat_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds,
+                                           pool=pool)
     elif config['type'] == 'raster_rp_thresholds':
-        return process_rp_threshold_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct)
+        return process_rp_threshold_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds,
+                                           pool=pool)
+    elif config['type'] == 'raster_tsunami':
+        return process_tsunami_hazard(adm_units, hazard_key, value_threshold, area_threshold_pct, rp_thresholds,
+                                      pool=pool)
+    elif config['type'] in threshold_engine.REDUCERS:
+        print(f"\n{'='*60}")
+        print(f"Processing {config['name']} Hazard")
+        print(f"{'='*60}")
+        adm_hazard = threshold_engine.run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct,
+                                                             rp_thresholds, pool=pool)
+        if 'Hazard_score' in adm_hazard.columns:
+            print_score_distribution(adm_hazard)
+        return adm_hazard
     else:
         print(f"Unknown hazard type: {config['type']}")
         return None
 
 
+def prepare_units(adm_units):
+    """
+    Prepare administrative units for the hazard analysis: fix invalid geometries, set a missing CRS to WGS84
+    and add the unit areas in m² ('unit_area_m2').
+
+    Done once per boundary set, before scoring one or several hazards.
+
+    Args:
+        adm_units: GeoDataFrame with administrative boundaries
+
+    Returns:
+        GeoDataFrame: Prepared copy of adm_units
+    """
+    adm_units = adm_units.copy()
+
+    # Fix invalid geometries
+    print("Validating geometries...")
+    invalid_count = (~adm_units.geometry.is_valid).sum()
+    if invalid_count > 0:
+        print(f"  Found {invalid_count} invalid geometries, fixing...")
+        adm_units['geometry'] = adm_units.geometry.buffer(0)
+
+    # Calculate unit areas in an equal-area CRS
+    print("Calculating unit areas...")
+    if adm_units.crs is None:
+        adm_units = adm_units.set_crs("EPSG:4326")
+
+    import warnings
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='invalid value encountered in area')
+        adm_units['unit_area_m2'] = threshold_engine.unit_areas_m2(adm_units)
+
+    return adm_units
+
+
+def process_multi_hazard(adm_units, hazard_keys=None, value_thresholds=None, area_thresholds=None,
+                         rp_thresholds=None, cores=None):
+    """
+    Score several hazards for one boundary set in a single job, e.g. for multi-hazard profiles.
+
+    The units are prepared once (see prepare_units) and all hazards share one pool of workers. Label rasters
+    are cached per grid (see zonal_utils.get_zone_labels), so hazards with rasters of the same resolution
+    and extent rasterize the units only once.
+
+    Args:
+        adm_units: GeoDataFrame with administrative boundaries
+        hazard_keys: List of keys to HAZARD_CONFIG (optional, defaults to all implemented hazards)
+        value_thresholds: Dict of value thresholds by hazard key (optional, defaults to 'default_threshold')
+        area_thresholds: Dict of area percentage thresholds by hazard key (optional, defaults to 'default_area_threshold')
+        rp_thresholds: Dict of RP-specific thresholds by hazard key (optional, defaults to the config ones)
+        cores: Number of worker processes (optional, defaults to the number of CPUs)
+
+    Returns:
+        GeoDataFrame: Prepared units with one '{hazard_key}_Hazard_score' column per scored hazard
+    """
+    if hazard_keys is None:
+        hazard_keys = [key for key, config in HAZARD_CONFIG.items() if config['type'] != 'wip']
+    value_thresholds = value_thresholds or {}
+    area_thresholds = area_thresholds or {}
+    rp_thresholds = rp_thresholds or {}
+
+    adm_units = prepare_units(adm_units)
+    result_gdf = adm_units.copy()
+
+    start_time = time.perf_counter()
+    with mp.Pool(cores) as pool:
+        for hazard_key in hazard_keys:
+            config = HAZARD_CONFIG[hazard_key]
+            adm_hazard = process_hazard(
+                adm_units, hazard_key,
+                value_thresholds.get(hazard_key, config['default_threshold']),
+                area_thresholds.get(hazard_key, config.get('default_area_threshold', 0)),
+                rp_thresholds.get(hazard_key), pool=pool
+            )
+            if adm_hazard is None or 'Hazard_score' not in adm_hazard.columns:
+                print(f"Skipping {config['name']}: no hazard scores")
+                continue
+            result_gdf[f'{hazard_key}_Hazard_score'] = adm_hazard['Hazard_score'].values
+
+    print(f"\nMulti-hazard analysis completed in {time.perf_counter() - start_time:.2f} seconds")
+    return result_gdf
+
+
 def load_adm2_global(country_filter=None, use_cache=True):
     """
     Load global ADM2 boundaries from WorldBank REST API with caching.
@@ -1150,20 +551,19 @@ def load_adm2_global(country_filter=None, use_cache=True):
     import os
     import hashlib
 
+    # Selected countries are read from the local boundary store (one layer per country, see input_utils)
+    if country_filter:
+        if isinstance(country_filter, str):
+            country_filter = [country_filter]
+        return load_adm2_countries(country_filter, refresh=not use_cache)
+
     # Create cache directory
     cache_dir = Path(common.DATA_DIR) / 'ADM'
     cache_dir.mkdir(parents=True, exist_ok=True)
 
-    # Generate cache filename based on filter and service type
+    # Generate cache filename based on service type
     service_suffix = "NEW" if common.USE_NEW_SERVICE else "VIEW"
-    if country_filter:
-        if isinstance(country_filter, str):
-            country_filter = [country_filter]
-        # Sort for consistent cache key
-        filter_key = '_'.join(sorted(country_filter))
-        cache_file = cache_dir / f"ADM2_cached_{filter_key}_{service_suffix}.gpkg"
-    else:
-        cache_file = cache_dir / f"ADM2_cached_GLOBAL_{service_suffix}.gpkg"
+    cache_file = cache_dir / f"ADM2_cached_GLOBAL_{service_suffix}.gpkg"
 
     # Check if cache exists
     if use_cache and cache_file.exists():
@@ -1180,16 +580,10 @@ def load_adm2_global(country_filter=None, use_cache=True):
     query_url = f"{common.rest_api_url}/{layer_id}/query"
 
     # Build where clause
-    if country_filter:
-        where_clause = "ISO_A3 IN ('" + "','".join(country_filter) + "')"
-    else:
-        where_clause = "1=1"  # Get all records
+    where_clause = "1=1"  # Get all records
 
     print(f"Fetching ADM2 boundaries from WorldBank REST API...")
-    if country_filter:
-        print(f"Filter: {len(country_filter)} countries - {', '.join(country_filter[:5])}{' ...' if len(country_filter) > 5 else ''}")
-    else:
-        print(f"Filter: Global (all countries)")
+    print(f"Filter: Global (all countries)")
 
     # First, get the count
     count_params = {
@@ -1267,6 +661,47 @@ def load_adm2_global(country_filter=None, use_cache=True):
     return gdf
 
 
+def load_adm2_countries(countries, refresh=False):
+    """
+    Load the ADM2 boundaries of the given countries from the local boundary store.
+
+    Countries missing from the store are fetched once from the REST service and added to it.
+    Countries without ADM2 units are skipped with a warning.
+
+    Args:
+        countries: List of ISO3 country codes
+        refresh: Fetch the boundaries again from the REST service (default: False)
+
+    Returns:
+        GeoDataFrame with ADM2 boundaries
+    """
+    gdfs = []
+    for country in countries:
+        try:
+            gdf = get_adm_data(country, 2, refresh=refresh)
+        except Exception as e:
+            print(f"Warning: No ADM2 boundaries loaded for {country} ({e})")
+            continue
+        if gdf is not None:
+            gdfs.append(gdf)
+
+    if not gdfs:
+        raise Exception("No ADM2 units found for the specified filter.")
+
+    gdf = gpd.GeoDataFrame(pd.concat(gdfs, ignore_index=True), crs="EPSG:4326")
+    print(f"Successfully loaded {len(gdf)} ADM2 units for {len(gdfs)} countries")
+
+    # Standardize column names using field mapping from common.py
+    adm2_code_field = common.adm_field_mapping[2]['code']
+    adm2_name_field = common.adm_field_mapping[2]['name']
+
+    if adm2_code_field in gdf.columns and adm2_name_field in gdf.columns:
+        gdf['ADM_CODE'] = gdf[adm2_code_field]
+        gdf['ADM_NAME'] = gdf[adm2_name_field]
+
+    return gdf
+
+
 def load_boundaries(unit_level, custom_boundaries_file_path=None, country_filter=None):
     """
     Load administrative boundaries based on unit level selection.
@@ -1349,6 +784,41 @@ def save_results(result_gdf, hazard_key, unit_level, value_threshold, area_thres
     return str(gpkg_path), str(excel_path)
 
 
+def save_multi_hazard_results(result_gdf, unit_level, country_codes=None):
+    """
+    Save multi-hazard results (see process_multi_hazard) to GeoPackage and Excel files.
+
+    Args:
+        result_gdf: GeoDataFrame with one Hazard_score column per hazard
+        unit_level: Unit level (ADM2 or Urban)
+        country_codes: List of country ISO codes (optional)
+
+    Returns:
+        tuple: (gpkg_path, excel_path)
+    """
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    country_prefix = "_".join(country_codes) if country_codes else "GLB"
+    base_name = f"{country_prefix}_MultiHazard_{unit_level}_{timestamp}"
+
+    # Create TH subfolder if it doesn't exist
+    output_dir = Path(common.OUTPUT_DIR) / "TH"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    gpkg_path = output_dir / f"{base_name}.gpkg"
+    excel_path = output_dir / f"{base_name}.xlsx"
+
+    # Save to GeoPackage
+    print(f"\nSaving results to {gpkg_path}...")
+    result_gdf.to_file(gpkg_path, driver="GPKG")
+
+    # Save to Excel
+    print(f"Saving results to {excel_path}...")
+    df = pd.DataFrame(result_gdf.drop(columns='geometry'))
+    df.to_excel(excel_path, index=False)
+
+    return str(gpkg_path), str(excel_path)
+
+
 def plot_results(gdf, hazard_name):
     """
     Create a folium layer for the results.
@@ -1987,26 +1457,8 @@ def initialize_tool():
 
                 print(f"Loaded {len(adm_units)} administrative units")
 
-                # Fix invalid geometries
-                print("Validating geometries...")
-                invalid_count = (~adm_units.geometry.is_valid).sum()
-                if invalid_count > 0:
-                    print(f"  Found {invalid_count} invalid geometries, fixing...")
-                    adm_units['geometry'] = adm_units.geometry.buffer(0)
-
-                # Calculate unit areas in projected CRS
-                print("Calculating unit areas...")
-                if adm_units.crs is None:
-                    adm_units = adm_units.set_crs("EPSG:4326")
-
-                import warnings
-                with warnings.catch_warnings():
-                    warnings.filterwarnings('ignore', message='invalid value encountered in area')
-                    if adm_units.crs.is_geographic:
-                        adm_units_proj = adm_units.to_crs(adm_units.estimate_utm_crs())
-                        adm_units['unit_area_m2'] = adm_units_proj.geometry.area
-                    else:
-                        adm_units['unit_area_m2'] = adm_units.geometry.area
+                # Fix invalid geometries and calculate unit areas
+                adm_units = prepare_units(adm_units)
 
                 # Process hazard (with special handling for RP-specific thresholds)
                 rp_thresholds = None
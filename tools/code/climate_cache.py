@@ -0,0 +1,93 @@
+# On-disk cache of climate index results (zonal statistics) for the climate indices tools
+#
+# Re-running an analysis on the same boundaries with another standardization method, or just to export
+# or draw the maps again, needs the same zonal statistics as before. Results are therefore stored as one
+# cube per boundary set (see zonal_utils.boundary_hash): a (layer, zone) array where each layer is one
+# combination of index, scenario, time period, quantity and statistic. Cubes are NetCDF files read and
+# written with xarray. Only the layers missing from a cube are computed, then added to it.
+import os
+import tempfile
+import numpy as np
+import xarray as xr
+
+import common
+import zonal_utils
+
+CLIMATE_CACHE_DIR = os.path.join(common.CACHE_DIR, "climate_indices")
+
+
+def layer_key(index, scenario, period, quantity, stat='mean'):
+    """Key of a layer of the results cube, e.g. 'tas|ssp245|2040-2059|change_epsilon|mean'."""
+    return f"{index}|{scenario}|{period}|{quantity}|{stat}"
+
+
+def cube_path(geometries, cache_dir=None):
+    """Path of the results cube of a boundary set (sequence of geometries, e.g. GeoDataFrame.geometry)."""
+    cache_dir = CLIMATE_CACHE_DIR if cache_dir is None else cache_dir
+    return os.path.join(cache_dir, f"results_{zonal_utils.boundary_hash(geometries)}.nc")
+
+
+def read_layers(geometries, keys, cache_dir=None):
+    """Return a dict mapping each of the keys found in the results cube of a boundary set to its zonal values."""
+    path = cube_path(geometries, cache_dir)
+    if not os.path.exists(path):
+        return {}
+    with xr.open_dataset(path) as ds:
+        cached = set(ds['layer'].values.tolist())
+        found = [key for key in keys if key in cached]
+        if not found:
+            return {}
+        values = ds['value'].sel(layer=found).values
+    return dict(zip(found, values))
+
+
+def write_layers(geometries, layers, cache_dir=None):
+    """
+    Add layers (dict mapping keys to arrays of zonal values, one per geometry) to the results cube of a boundary
+    set, replacing layers with the same keys.
+    """
+    path = cube_path(geometries, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    keys = list(layers)
+    values = np.stack([np.asarray(layers[key], dtype='float64') for key in keys])
+    cube = xr.Dataset({'value': (('layer', 'zone'), values)}, coords={'layer': keys})
+
+    if os.path.exists(path):
+        with xr.open_dataset(path) as ds:
+            previous = ds.load()
+        previous = previous.sel(layer=[key for key in previous['layer'].values.tolist() if key not in layers])
+        cube = xr.concat([previous, cube], dim='layer')
+
+    # Write to a temporary file first, so that concurrent runs never read a partial cube
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.nc', delete=False) as tmp:
+        tmp_path = tmp.name
+    try:
+        cube.to_netcdf(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_layers(geometries, keys, compute, cache_dir=None):
+    """
+    Return the zonal values of each key (list of arrays, in the order of keys), computing only the missing ones.
+
+    Parameters
+    ----------
+    geometries : sequence of geometries of the boundary set (e.g. GeoDataFrame.geometry)
+    keys : keys of the layers (see layer_key)
+    compute : function called with the list of missing keys, returning a dict mapping each of them to its
+        zonal values; it is not called if every layer is cached
+    cache_dir : folder of the cache, defaults to CACHE_DIR/climate_indices
+    """
+    layers = read_layers(geometries, keys, cache_dir)
+    missing = [key for key in keys if key not in layers]
+    if missing:
+        computed = compute(missing)
+        write_layers(geometries, computed, cache_dir)
+        layers.update(computed)
+    else:
+        print(f"Zonal statistics served from the cache ({len(keys)} layers)")
+    return [layers[key] for key in keys]
@@ -8,6 +8,9 @@ DATA_DIR = config["DATA_DIR"]
 OUTPUT_DIR = config["OUTPUT_DIR"]
 CACHE_DIR = config["CACHE_DIR"]
 
+# Offline mode: only use data already available locally (e.g. boundaries in the local boundary store)
+OFFLINE = str(config.get("OFFLINE") or '').lower() in ('1', 'true', 'yes')
+
 # Ensure output and cache dirs exist
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(CACHE_DIR,  exist_ok=True)
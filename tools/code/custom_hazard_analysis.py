@@ -4,7 +4,7 @@ import numpy as np
 import pandas as pd
 import geopandas as gpd
 import rasterio
-from rasterio.warp import Resampling, calculate_default_transform, reproject
+from rasterio.enums import Resampling
 from rasterstats import zonal_stats
 from functools import partial
 import multiprocess as mp
@@ -13,6 +13,8 @@ import tempfile
 # Importing internal libraries
 import common
 import input_utils
+import zonal_utils
+import hazard_cache
 from runAnalysis import (
     calc_EAEI, result_df_reorder_columns
 )
@@ -20,9 +22,6 @@ from runAnalysis import (
 DATA_DIR = common.DATA_DIR
 OUTPUT_DIR = common.OUTPUT_DIR
 
-# Cache for reprojected rasters to avoid redundant calculations
-RASTER_CACHE = {}
-
 
 def run_analysis_with_custom_hazard(
     country, haz_type, haz_cat, period, scenario,
@@ -74,10 +73,6 @@ def run_analysis_with_custom_hazard(
         # Define folder for exposure data
         exp_folder = f"{DATA_DIR}/EXP"
 
-        # Clear raster cache at the beginning
-        global RASTER_CACHE
-        RASTER_CACHE = {}
-
         # Validating Classes analysis parameters
         if analysis_type == "Classes":
             if not class_edges:
@@ -149,6 +144,10 @@ def run_analysis_with_custom_hazard(
         exp_memmap[:] = exp_data_array[:]
         exp_memmap.flush()
 
+        # Rasterize the admin areas once onto the exposure grid (cached on disk) for per-class reductions
+        zones_path = zonal_utils.get_zone_labels(adm_data.geometry, exp_transform, exp_data_array.shape)
+        n_zones = len(adm_data)
+
         # Calculate total exposure per admin area once
         print(f"Calculating total {exp_cat} exposure using {zonal_stats_type}...")
         zones_geojson = [feature['geometry'] for feature in adm_data.__geo_interface__['features']]
@@ -237,6 +236,8 @@ def run_analysis_with_custom_hazard(
             "exp_memmap_path": exp_memmap_path,
             "exp_metadata": exp_metadata,
             "zones_geojson": zones_geojson,
+            "zones_path": zones_path,
+            "n_zones": n_zones,
             "user_nodata": user_nodata
         }
 
@@ -271,17 +272,7 @@ def run_analysis_with_custom_hazard(
             # Calculate EAI/EAE if multiple return periods
             if n_valid_RPs_gt_1:
                 result_df = calc_EAEI(
-                    result_df, return_periods, prob_RPs_df, 'LB', 
-                    analysis_type, exp_cat, adm_level, num_bins, n_valid_RPs_gt_1
-                )
-
-                result_df = calc_EAEI(
-                    result_df, return_periods, prob_RPs_df, 'UB', 
-                    analysis_type, exp_cat, adm_level, num_bins, n_valid_RPs_gt_1
-                )
-
-                result_df = calc_EAEI(
-                    result_df, return_periods, prob_RPs_df, 'Mean', 
+                    result_df, return_periods, prob_RPs_df, ['LB', 'UB', 'Mean'],
                     analysis_type, exp_cat, adm_level, num_bins, n_valid_RPs_gt_1
                 )
 
@@ -305,73 +296,24 @@ def run_analysis_with_custom_hazard(
         traceback.print_exc()
         return None
     finally:
-        # Clear raster cache
-        RASTER_CACHE.clear()
+        # Keep the hazard cache within its size limit
+        hazard_cache.prune_hazard_cache()
         # Run garbage collection
         gc.collect()
 
 
-def preprocess_hazard_raster(hazard_file, exp_metadata, memmap_dir=None):
+def preprocess_hazard_raster(hazard_file, exp_metadata):
     """
     Preprocess hazard raster to match exposure grid - returns a path to the reprojected raster
 
-    IMPROVEMENT #1: This function reprojests hazard data once and caches it
+    IMPROVEMENT #1: The hazard is reprojected (bilinear) once per source file and exposure grid, and kept
+    in the on-disk hazard cache (see hazard_cache.get_aligned_hazard) for later runs
     """
-    # Check if we already processed this file
-    global RASTER_CACHE
-    if hazard_file in RASTER_CACHE:
-        return RASTER_CACHE[hazard_file]
-
-    # Create a temporary directory if not provided
-    if memmap_dir is None:
-        memmap_dir = tempfile.mkdtemp()
-
-    output_path = os.path.join(memmap_dir, f"reprojected_{os.path.basename(hazard_file)}")
-
-    # If already processed, return the path
-    if os.path.exists(output_path):
-        RASTER_CACHE[hazard_file] = output_path
-        return output_path
-
     try:
-        # Read source hazard raster
-        with rasterio.open(hazard_file) as src:
-            # Calculate reprojection parameters
-            _, _, _ = calculate_default_transform(
-                src.crs, exp_metadata['crs'],
-                src.width, src.height, 
-                *src.bounds,
-                dst_width=exp_metadata['shape'][1],
-                dst_height=exp_metadata['shape'][0]
-            )
-
-            # Update metadata for output
-            output_meta = src.meta.copy()
-            output_meta.update({
-                'crs': exp_metadata['crs'],
-                'transform': exp_metadata['transform'],
-                'width': exp_metadata['shape'][1],
-                'height': exp_metadata['shape'][0],
-                'nodata': src.nodata
-            })
-
-            # Create output raster
-            with rasterio.open(output_path, 'w', **output_meta) as dst:
-                # Reproject and save
-                reproject(
-                    source=rasterio.band(src, 1),
-                    destination=rasterio.band(dst, 1),
-                    src_transform=src.transform,
-                    src_crs=src.crs,
-                    dst_transform=exp_metadata['transform'],
-                    dst_crs=exp_metadata['crs'],
-                    resampling=Resampling.bilinear
-                )
-
-        # Cache the path
-        RASTER_CACHE[hazard_file] = output_path
-        return output_path
-
+        return hazard_cache.get_aligned_hazard(
+            hazard_file, exp_metadata['crs'], exp_metadata['transform'], exp_metadata['shape'],
+            resampling=Resampling.bilinear
+        )
     except Exception as e:
         print(f"Error preprocessing hazard raster: {str(e)}")
         raise
@@ -403,6 +345,8 @@ def process_return_period_optimized(rp_file_tuple, **kwargs):
         exp_memmap_path = kwargs.get('exp_memmap_path')
         exp_metadata = kwargs.get('exp_metadata')
         zones_geojson = kwargs.get('zones_geojson')
+        zones_path = kwargs.get('zones_path')
+        n_zones = kwargs.get('n_zones')
 
         # Load exposure data from memmap
         exp_shape = exp_metadata['shape']
@@ -412,7 +356,7 @@ def process_return_period_optimized(rp_file_tuple, **kwargs):
         process_temp_dir = tempfile.mkdtemp()
 
         # IMPROVEMENT #1: Preprocess hazard raster to match exposure grid
-        reprojected_hazard = preprocess_hazard_raster(hazard_file, exp_metadata, process_temp_dir)
+        reprojected_hazard = preprocess_hazard_raster(hazard_file, exp_metadata)
 
         # Load hazard data once
         with rasterio.open(reprojected_hazard) as src:
@@ -461,59 +405,17 @@ def process_return_period_optimized(rp_file_tuple, **kwargs):
         # Process differently based on analysis approach
         if analysis_type == "Classes":
             # For classes approach
-            # Create a classified array
-            bin_idx = np.zeros_like(haz_array)
-            for i, threshold in enumerate(bin_seq):
-                # Digitize into bins
-                if i < len(bin_seq) - 1:
-                    bin_mask = (haz_array >= threshold) & (haz_array < bin_seq[i+1]) & valid_mask
-                else:
-                    bin_mask = (haz_array >= threshold) & valid_mask
-                bin_idx[bin_mask] = i
-
-            # For each class, calculate exposure
+            # Digitize into bins: bin i holds [bin_seq[i], bin_seq[i+1]), values below the first edge fall in bin 0
+            bin_idx = np.maximum(np.digitize(haz_array, bin_seq) - 1, 0)
+
+            # Exposure statistic per admin area and class in a single pass over the zone labels
+            zone_labels = np.load(zones_path, mmap_mode='r')
+            class_exp = zonal_utils.zonal_reduce(zone_labels, affected_exp, n_zones, stat=zonal_stats_type,
+                                                 classes=bin_idx, n_classes=num_bins)
+            # Calculate cumulative exposure for classes, from the highest class down
+            class_exp = np.cumsum(class_exp[:, ::-1], axis=1)[:, ::-1]
             for bin_x in reversed(range(num_bins)):
-                # Create a mask for this class
-                class_mask = (bin_idx == bin_x)
-
-                # Apply the mask to the affected exposure
-                class_exp = np.copy(affected_exp)
-                class_exp[~class_mask] = np.nan
-
-                # Calculate zonal statistics for this class
-                class_path = os.path.join(process_temp_dir, f"class_{bin_x}.tif")
-                with rasterio.open(
-                    class_path, 'w', driver='GTiff', height=exp_shape[0], width=exp_shape[1],
-                    count=1, dtype='float32', crs=exp_metadata['crs'],
-                    transform=exp_metadata['transform'], nodata=np.nan
-                ) as dst:
-                    dst.write(class_exp, 1)
-
-                # IMPROVEMENT #7: Optimized zonal_stats
-                zonal_result = zonal_stats(
-                    zones_geojson, 
-                    class_path,
-                    stats=zonal_stats_type,
-                    all_touched=False,
-                    geojson_out=False,
-                    nodata=np.nan,
-                    categorical=False,
-                    boundary_only=False,
-                    boundless=True
-                )
-
-                # Add the results to the dataframe
-                result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] = [x.get(zonal_stats_type, 0) for x in zonal_result]
-
-                # Delete temporary class file
-                os.remove(class_path)
-
-            # Calculate cumulative exposure for classes
-            for bin_x in reversed(range(num_bins-1)):
-                result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] = (
-                    result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] + 
-                    result_df[f"RP{rp}_{exp_cat}_C{bin_x+1}_exp"]
-                )
+                result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] = class_exp[:, bin_x]
 
         else:  # Function approach
             # Calculate affected exposure per admin area
@@ -0,0 +1,161 @@
+# Shared download manager for exposure and climate data (WSF tiles, WorldPop, CCKP NetCDF)
+#
+# Downloads go through one pooled HTTP session and can run concurrently. Each file is streamed to
+# a ".part" file next to its destination: an interrupted download is resumed from where it stopped
+# (HTTP Range request), and the file is only renamed to its final name once complete and verified
+# (expected size and/or checksum), so a partial file is never mistaken for a complete one.
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tqdm import tqdm
+
+# Number of concurrent downloads
+MAX_WORKERS = 8
+
+# Size of the chunks streamed to disk
+CHUNK_SIZE = 1024 * 1024
+
+# Number of attempts for a single file, each one resuming the partial download
+MAX_ATTEMPTS = 5
+
+# One session per thread, sharing the connection pool settings
+SESSION = threading.local()
+
+
+def get_session():
+    """Return the HTTP session of the current thread, with pooled connections and retries on server errors."""
+    if not hasattr(SESSION, 'session'):
+        session = requests.Session()
+        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=['GET', 'HEAD'])
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        SESSION.session = session
+    return SESSION.session
+
+
+def file_checksum(file_name, algorithm='sha256'):
+    """Return the hex digest of a file, read in chunks."""
+    h = hashlib.new(algorithm)
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_checksum(checksum):
+    """
+    Return (algorithm, hex digest) of a checksum given as 'algorithm:hexdigest' (e.g. 'sha256:ab12...')
+    or as a SHA-256 multihash (STAC 'file:checksum', hex starting with '1220'), or None if not supported.
+    """
+    if not checksum:
+        return None
+    if ':' in checksum:
+        algorithm, digest = checksum.split(':', 1)
+        return algorithm.lower(), digest.lower()
+    if checksum.startswith('1220') and len(checksum) == 68:
+        return 'sha256', checksum[4:].lower()
+    return None
+
+
+def verify_file(file_name, size=None, checksum=None):
+    """Check a downloaded file against its expected size and checksum (both optional)."""
+    if size is not None and os.path.getsize(file_name) != int(size):
+        return False
+    parsed = parse_checksum(checksum)
+    if parsed is not None and file_checksum(file_name, parsed[0]) != parsed[1]:
+        return False
+    return True
+
+
+def download(url, dest_path, size=None, checksum=None, params=None, pbar=None):
+    """
+    Download url to dest_path, resuming a previous partial download if any, and return dest_path.
+
+    The file is written to dest_path + '.part' and renamed to dest_path once complete and verified.
+    An existing dest_path is not downloaded again.
+
+    Parameters
+    ----------
+    url : URL of the file
+    dest_path : local path of the file
+    size : expected size in bytes (optional), defaults to the size announced by the server
+    checksum : expected checksum (optional), as 'algorithm:hexdigest' or SHA-256 multihash
+    params : query parameters of the request (optional)
+    pbar : tqdm progress bar to update with the downloaded bytes (optional)
+    """
+    if os.path.exists(dest_path):
+        return dest_path
+
+    dest_dir = os.path.dirname(dest_path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    part_path = f"{dest_path}.part"
+    session = get_session()
+
+    for attempt in range(MAX_ATTEMPTS):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        try:
+            with session.get(url, params=params, headers=headers, stream=True, timeout=(10, 60)) as r:
+                if r.status_code == 416:
+                    # Nothing left to download: the partial file is already complete
+                    pass
+                else:
+                    r.raise_for_status()
+                    # The server may ignore the Range request and send the whole file again
+                    if r.status_code != 206:
+                        offset = 0
+                    if size is None and 'Content-Length' in r.headers and 'Content-Encoding' not in r.headers:
+                        size = offset + int(r.headers['Content-Length'])
+                    with open(part_path, 'ab' if offset else 'wb') as f:
+                        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+                            if pbar is not None:
+                                pbar.update(len(chunk))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            print(f"Download of {url} interrupted ({e}), resuming...")
+            continue
+
+        if verify_file(part_path, size, checksum):
+            os.replace(part_path, dest_path)
+            return dest_path
+
+        # A corrupted partial file cannot be resumed: start again from zero
+        os.remove(part_path)
+        if attempt == MAX_ATTEMPTS - 1:
+            raise IOError(f"Downloaded file does not match the expected size or checksum: {url}")
+        print(f"Downloaded file does not match the expected size or checksum, downloading {url} again...")
+
+    return dest_path
+
+
+def download_many(jobs, max_workers=MAX_WORKERS, desc="Downloading", postprocess=None):
+    """
+    Download several files concurrently and return their local paths, in the order of the jobs.
+
+    Parameters
+    ----------
+    jobs : list of dicts with the arguments of download (url, dest_path and optionally size, checksum, params)
+    max_workers : number of concurrent downloads
+    desc : description of the progress bar
+    postprocess : function applied to each file as soon as it is downloaded, in the same worker (optional);
+        its result is returned instead of the local path
+    """
+    total = sum(int(job['size']) for job in jobs if job.get('size') is not None)
+    with tqdm(total=total or None, desc=desc, unit='B', unit_scale=True) as pbar, \
+            ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        def run(job):
+            path = download(pbar=pbar, **job)
+            return postprocess(path) if postprocess is not None else path
+
+        futures = [executor.submit(run, job) for job in jobs]
+        return [future.result() for future in futures]
@@ -10,6 +10,7 @@ import ipywidgets as widgets
 from IPython.display import display, clear_output, HTML
 import tkinter as tk
 import warnings
+from functools import lru_cache
 import common
 
 # Suppress specific warnings
@@ -416,15 +417,65 @@ def calculate_weighted_rwi(gdf, pop_field, rwi_field):
 
     return result_gdf
 
-# Function to create quantile classifications
-# Here's a fixed version of the classify_data function:
+# Functions to create quantile classifications
+def quantile_classes(values, num_quantiles, label):
+    """
+    Assign quantile classes (0 to num_quantiles-1) to values.
+
+    Classes come from pd.qcut(labels=False, duplicates='drop'). If the top class is not reached (many equal
+    values), breaks at the interior percentiles (np.percentile of np.linspace(0, 100)) are used instead,
+    closed on the left (np.digitize). If pd.qcut fails, values are mapped linearly from their minimum to their
+    maximum, or all get the middle class if they are equal. NaN values get class 0; they are left out of the
+    percentile breaks.
+
+    Parameters:
+    -----------
+    values : numpy.ndarray
+        Values to classify (float)
+    num_quantiles : int
+        Number of quantiles
+    label : str
+        Name of the values, for messages
+
+    Returns:
+    --------
+    classes : numpy.ndarray
+        Class of each value (int)
+    """
+    values = np.asarray(values, dtype='float64')
+    missing = np.isnan(values)
+    try:
+        classes = pd.Series(pd.qcut(values, q=num_quantiles, labels=False, duplicates='drop'))
+
+        # Check if we got the full range of quantiles
+        if classes.max() < num_quantiles - 1:
+            print(f"Warning: {label.capitalize()} quantiles only range from 0 to {classes.max()}")
+            print(f"Using manual {label} quantile calculation...")
+            breaks = np.percentile(values[~missing], np.linspace(0, 100, num_quantiles + 1)[1:-1])
+            classes = pd.Series(np.clip(np.digitize(values, breaks), 0, num_quantiles - 1))
+    except Exception as e:
+        print(f"Error in {label} quantile calculation: {str(e)}")
+        print("Falling back to linear mapping...")
+        min_val, max_val = values.min(), values.max()
+        range_val = max_val - min_val
+        if range_val > 0:
+            classes = pd.Series(np.clip(((values - min_val) / range_val * (num_quantiles - 1)).astype(int),
+                                        0, num_quantiles - 1))
+        else:
+            # If all values are the same, assign to middle quantile
+            classes = pd.Series(np.full(len(values), (num_quantiles - 1) // 2))
+
+    classes[missing] = 0
+    return classes.fillna(0).to_numpy(dtype=int)
 
 
-# Here's a completely revised approach to fix the quantile mapping problem:
 def classify_data(gdf, wealth_field, hazard_field, num_quantiles, wealth_field_for_classification=None):
     """
     Classify data into quantiles for bivariate mapping.
 
+    Both fields are classified into quantiles with pd.qcut (see quantile_classes). Pre-binned wealth data (up to 10
+    integer values) is mapped linearly onto the classes instead.
+
     Parameters:
     -----------
     gdf : GeoDataFrame
@@ -451,128 +502,36 @@ def classify_data(gdf, wealth_field, hazard_field, num_quantiles, wealth_field_f
     if wealth_field_for_classification is None:
         wealth_field_for_classification = wealth_field
 
-    # Get wealth values and check for pre-binned data
-    wealth_values = sorted(result_gdf[wealth_field_for_classification].unique())
-    unique_wealth_values = len(wealth_values)
+    wealth_values = result_gdf[wealth_field_for_classification].to_numpy(dtype='float64')
+    hazard_values = result_gdf[hazard_field].to_numpy(dtype='float64')
 
-    print(f"Unique wealth values: {unique_wealth_values}")
-
-    # Flag for whether to use pre-binned direct mapping approach
-    use_direct_mapping = False
-
-    # Check if data appears to be pre-binned (small number of discrete values)
-    if unique_wealth_values <= 10:  # Reasonable limit for pre-binned data
-        # Check if values are all integers or integer-like floats
-        if all(isinstance(v, (int, np.integer)) or 
-               (isinstance(v, float) and v.is_integer()) for v in wealth_values):
-            use_direct_mapping = True
-            print("Detected pre-binned integer-like wealth data. Using direct mapping approach.")
+    # Check if wealth data appears to be pre-binned (small number of discrete integer-like values)
+    has_nan = np.isnan(wealth_values).any()
+    unique_wealth = np.unique(wealth_values[~np.isnan(wealth_values)])
+    print(f"Unique wealth values: {len(unique_wealth) + int(has_nan)}")
+    use_direct_mapping = (not has_nan and len(unique_wealth) <= 10
+                          and bool(np.all(unique_wealth == np.floor(unique_wealth))))
 
     # Process wealth quantiles
     if use_direct_mapping:
-        # Direct mapping approach for pre-binned data
-        min_val = min(wealth_values)
-        max_val = max(wealth_values)
+        print("Detected pre-binned integer-like wealth data. Using direct mapping approach.")
+        min_val, max_val = unique_wealth[0], unique_wealth[-1]
         range_val = max_val - min_val
 
-        # Create mapping dictionary from original values to quantiles
-        wealth_mapping = {}
-        for val in wealth_values:
-            # Calculate relative position in range (0 to 1)
-            rel_pos = (val - min_val) / range_val if range_val > 0 else 0
-            # Map to quantile (0 to num_quantiles-1) using floor to ensure full range
-            quantile = min(int(rel_pos * num_quantiles), num_quantiles - 1)
-            wealth_mapping[val] = quantile
-
-        print(f"Wealth value mapping: {wealth_mapping}")
+        # Calculate relative position in range (0 to 1) of each distinct value
+        rel_pos = (unique_wealth - min_val) / range_val if range_val > 0 else np.zeros_like(unique_wealth)
+        # Map to quantile (0 to num_quantiles-1) using floor to ensure full range
+        unique_quantiles = np.minimum((rel_pos * num_quantiles).astype(int), num_quantiles - 1)
+        print(f"Wealth value mapping: {dict(zip(unique_wealth.tolist(), unique_quantiles.tolist()))}")
 
         # Apply mapping to create wealth quantiles
-        result_gdf['wealth_quantile'] = result_gdf[wealth_field_for_classification].map(wealth_mapping)
+        result_gdf['wealth_quantile'] = unique_quantiles[np.searchsorted(unique_wealth, wealth_values)]
     else:
         # Standard quantile approach for continuous data
-        try:
-            result_gdf['wealth_quantile'] = pd.qcut(
-                result_gdf[wealth_field_for_classification],
-                q=num_quantiles,
-                labels=False,
-                duplicates='drop'
-            )
-
-            # Check if we got the full range of quantiles
-            if result_gdf['wealth_quantile'].max() < (num_quantiles - 1):
-                print(f"Warning: Wealth quantiles only range from 0 to {result_gdf['wealth_quantile'].max()}")
-                print("Using manual quantile calculation...")
-
-                # Try manual quantile calculation as fallback
-                wealth_values = result_gdf[wealth_field_for_classification].values
-                percentiles = np.linspace(0, 100, num_quantiles+1)[1:-1]
-                breaks = np.percentile(wealth_values, percentiles)
-                result_gdf['wealth_quantile'] = np.digitize(wealth_values, breaks)
-
-                # Ensure proper range from 0 to num_quantiles-1
-                result_gdf['wealth_quantile'] = result_gdf['wealth_quantile'].clip(0, num_quantiles-1)
-        except Exception as e:
-            print(f"Error in wealth quantile calculation: {str(e)}")
-            print("Falling back to linear mapping...")
-
-            # Linear mapping from min to max as emergency fallback
-            vals = result_gdf[wealth_field_for_classification].values
-            min_val, max_val = vals.min(), vals.max()
-            range_val = max_val - min_val
-
-            if range_val > 0:
-                # Create normalized values and map to quantiles
-                norm_vals = (vals - min_val) / range_val
-                result_gdf['wealth_quantile'] = (norm_vals * (num_quantiles - 1)).astype(int)
-                result_gdf['wealth_quantile'] = result_gdf['wealth_quantile'].clip(0, num_quantiles - 1)
-            else:
-                # If all values are the same, assign to middle quantile
-                result_gdf['wealth_quantile'] = (num_quantiles - 1) // 2
+        result_gdf['wealth_quantile'] = quantile_classes(wealth_values, num_quantiles, 'wealth')
 
     # Process hazard quantiles
-    try:
-        # Calculate hazard quantiles
-        result_gdf['hazard_quantile'] = pd.qcut(
-            result_gdf[hazard_field],
-            q=num_quantiles,
-            labels=False,
-            duplicates='drop'
-        )
-
-        # Check if hazard quantiles are limited
-        if result_gdf['hazard_quantile'].max() < (num_quantiles - 1):
-            print(f"Warning: Hazard quantiles only range from 0 to {result_gdf['hazard_quantile'].max()}")
-            print("Using manual hazard quantile calculation...")
-
-            # Try manual quantile calculation as fallback
-            hazard_values = result_gdf[hazard_field].values
-            percentiles = np.linspace(0, 100, num_quantiles+1)[1:-1]
-            breaks = np.percentile(hazard_values, percentiles)
-            result_gdf['hazard_quantile'] = np.digitize(hazard_values, breaks)
-
-            # Ensure proper range from 0 to num_quantiles-1
-            result_gdf['hazard_quantile'] = result_gdf['hazard_quantile'].clip(0, num_quantiles-1)
-    except Exception as e:
-        print(f"Error in hazard quantile calculation: {str(e)}")
-        print("Falling back to linear hazard mapping...")
-
-        # Linear mapping from min to max as emergency fallback
-        vals = result_gdf[hazard_field].values
-        min_val, max_val = vals.min(), vals.max()
-        range_val = max_val - min_val
-
-        if range_val > 0:
-            # Create normalized values and map to quantiles
-            norm_vals = (vals - min_val) / range_val
-            result_gdf['hazard_quantile'] = (norm_vals * (num_quantiles - 1)).astype(int)
-            result_gdf['hazard_quantile'] = result_gdf['hazard_quantile'].clip(0, num_quantiles - 1)
-        else:
-            # If all values are the same, assign to middle quantile
-            result_gdf['hazard_quantile'] = (num_quantiles - 1) // 2
-
-    # Ensure quantile columns are integers and have no nulls
-    result_gdf['wealth_quantile'] = result_gdf['wealth_quantile'].fillna(0).astype(int)
-    result_gdf['hazard_quantile'] = result_gdf['hazard_quantile'].fillna(0).astype(int)
+    result_gdf['hazard_quantile'] = quantile_classes(hazard_values, num_quantiles, 'hazard')
 
     # Verify quantile ranges and print diagnostics
     wealth_range = (result_gdf['wealth_quantile'].min(), result_gdf['wealth_quantile'].max())
@@ -598,13 +557,128 @@ def classify_data(gdf, wealth_field, hazard_field, num_quantiles, wealth_field_f
     return result_gdf
 
 
+# Stevens 3×3 bivariate palettes, by (hazard class, poverty class)
+STEVENS_PALETTES = {
+    'blue_red': {  # Blue-Red palette
+        (0, 0): '#e8e8e8',  # Low hazard, Low poverty
+        (0, 1): '#e4cac8',  # Low hazard, Mid poverty
+        (0, 2): '#c85a5a',  # Low hazard, High poverty
+        (1, 0): '#b0d5df',  # Mid hazard, Low poverty
+        (1, 1): '#ad9ea5',  # Mid hazard, Mid poverty
+        (1, 2): '#985356',  # Mid hazard, High poverty
+        (2, 0): '#64acbe',  # High hazard, Low poverty
+        (2, 1): '#627f8c',  # High hazard, Mid poverty
+        (2, 2): '#574249',  # High hazard, High poverty
+    },
+    'purple_green': {  # Purple-Green palette
+        (0, 0): '#e8e8e8',  # Low hazard, Low poverty
+        (0, 1): '#d4cdd9',  # Low hazard, Mid poverty
+        (0, 2): '#be64ac',  # Low hazard, High poverty
+        (1, 0): '#b8d6be',  # Mid hazard, Low poverty
+        (1, 1): '#a9aead',  # Mid hazard, Mid poverty
+        (1, 2): '#9c6290',  # Mid hazard, High poverty
+        (2, 0): '#73ae80',  # High hazard, Low poverty
+        (2, 1): '#6c8b74',  # High hazard, Mid poverty
+        (2, 2): '#5e5e73',  # High hazard, High poverty
+    },
+    'pink_blue': {  # Pink-Blue palette
+        (0, 0): '#e8e8e8',  # Low hazard, Low poverty
+        (0, 1): '#ace4e4',  # Low hazard, Mid poverty
+        (0, 2): '#5ac8c8',  # Low hazard, High poverty
+        (1, 0): '#dfb0d6',  # Mid hazard, Low poverty
+        (1, 1): '#a5add3',  # Mid hazard, Mid poverty
+        (1, 2): '#5698b9',  # Mid hazard, High poverty
+        (2, 0): '#be64ac',  # High hazard, Low poverty
+        (2, 1): '#8c62aa',  # High hazard, Mid poverty
+        (2, 2): '#3b4994',  # High hazard, High poverty
+    },
+    'green_blue': {  # Green-Blue palette
+        (0, 0): '#e8e8e8',  # Low hazard, Low poverty
+        (0, 1): '#b5c0da',  # Low hazard, Mid poverty
+        (0, 2): '#6c83b5',  # Low hazard, High poverty
+        (1, 0): '#b8d6be',  # Mid hazard, Low poverty
+        (1, 1): '#90b2b3',  # Mid hazard, Mid poverty
+        (1, 2): '#567994',  # Mid hazard, High poverty
+        (2, 0): '#73ae80',  # High hazard, Low poverty
+        (2, 1): '#5a9178',  # High hazard, Mid poverty
+        (2, 2): '#2a5a5b',  # High hazard, High poverty
+    },
+    'purple_yellow': {  # Purple-Yellow palette
+        (0, 0): '#e8e8e8',  # Low hazard, Low poverty
+        (0, 1): '#e4d9ac',  # Low hazard, Mid poverty
+        (0, 2): '#c8b35a',  # Low hazard, High poverty
+        (1, 0): '#cbb8d7',  # Mid hazard, Low poverty
+        (1, 1): '#c8ada0',  # Mid hazard, Mid poverty
+        (1, 2): '#af8e53',  # Mid hazard, High poverty
+        (2, 0): '#9972af',  # High hazard, Low poverty
+        (2, 1): '#976b82',  # High hazard, Mid poverty
+        (2, 2): '#804d36',  # High hazard, High poverty
+    }
+}
+
+
+def hex_to_rgb(hex_color):
+    """Convert a hex color to RGB float values (0-1) plus alpha."""
+    hex_color = hex_color.lstrip('#')
+    return [int(hex_color[i:i+2], 16)/255 for i in (0, 2, 4)] + [1.0]  # R,G,B + Alpha
+
+
+@lru_cache(maxsize=None)
+def bivariate_palette(palette_key, num_quantiles):
+    """
+    Color matrix of a Stevens palette for num_quantiles × num_quantiles classes, memoized per (palette, size).
+
+    Larger grids are built by bilinear interpolation of the 3×3 palette, with colors rounded to 8 bits like hex
+    colors. The returned array is read-only, as it is shared by all callers.
+
+    Parameters:
+    -----------
+    palette_key : str
+        Key identifying which Stevens palette to use (e.g., 'blue_red'), defaults to 'blue_red' if unknown
+    num_quantiles : int
+        Number of quantiles for each variable (3, 4, or 5), defaults to 3 otherwise
+
+    Returns:
+    --------
+    bivariate_colors : numpy.ndarray
+        Array of RGBA colors of shape (num_quantiles, num_quantiles, 4)
+    """
+    if palette_key not in STEVENS_PALETTES:
+        palette_key = 'blue_red'
+    if num_quantiles not in (3, 4, 5):
+        num_quantiles = 3
+
+    palette = STEVENS_PALETTES[palette_key]
+    base_rgb = np.array([[hex_to_rgb(palette[(i, j)])[:3] for j in range(3)] for i in range(3)])
+
+    # Position of each class in the 3×3 grid, with the surrounding points and interpolation weights
+    pos = np.arange(num_quantiles) / (num_quantiles - 1) * 2
+    low = pos.astype(int)
+    high = np.minimum(low + 1, 2)
+    wx = (pos - low)[:, None, None]
+    wy = (pos - low)[None, :, None]
+
+    # Bilinear interpolation of RGB values, rounded to 8 bits
+    rgb = (
+        (1-wx)*(1-wy) * base_rgb[low][:, low] +
+        wx*(1-wy) * base_rgb[high][:, low] +
+        (1-wx)*wy * base_rgb[low][:, high] +
+        wx*wy * base_rgb[high][:, high]
+    )
+    rgb = np.round(rgb * 255) / 255
+
+    bivariate_colors = np.concatenate([rgb, np.ones((num_quantiles, num_quantiles, 1))], axis=-1)
+    bivariate_colors.flags.writeable = False
+    return bivariate_colors
+
+
 # Function to generate bivariate color scheme with maximum saturation
 def create_bivariate_colormap(palette_key, num_quantiles):
     """
     Create a bivariate colormap using the Stevens palette approach.
 
     This implementation uses predefined Stevens palettes and handles
-    interpolation for larger grid sizes.
+    interpolation for larger grid sizes (see bivariate_palette).
 
     Parameters:
     -----------
@@ -620,195 +694,10 @@ def create_bivariate_colormap(palette_key, num_quantiles):
     colors_list : list
         Flattened list of colors
     """
-
-    # Function to convert hex to RGB float values (0-1)
-    def hex_to_rgb(hex_color):
-        hex_color = hex_color.lstrip('#')
-        return [int(hex_color[i:i+2], 16)/255 for i in (0, 2, 4)] + [1.0]  # R,G,B + Alpha
-
-    # Define Stevens 3×3 palettes
-    stevens_palettes = {
-        'blue_red': {  # Blue-Red palette
-            (0, 0): '#e8e8e8',  # Low hazard, Low poverty
-            (0, 1): '#e4cac8',  # Low hazard, Mid poverty
-            (0, 2): '#c85a5a',  # Low hazard, High poverty
-            (1, 0): '#b0d5df',  # Mid hazard, Low poverty
-            (1, 1): '#ad9ea5',  # Mid hazard, Mid poverty
-            (1, 2): '#985356',  # Mid hazard, High poverty
-            (2, 0): '#64acbe',  # High hazard, Low poverty
-            (2, 1): '#627f8c',  # High hazard, Mid poverty
-            (2, 2): '#574249',  # High hazard, High poverty
-        },
-        'purple_green': {  # Purple-Green palette
-            (0, 0): '#e8e8e8',  # Low hazard, Low poverty
-            (0, 1): '#d4cdd9',  # Low hazard, Mid poverty
-            (0, 2): '#be64ac',  # Low hazard, High poverty
-            (1, 0): '#b8d6be',  # Mid hazard, Low poverty
-            (1, 1): '#a9aead',  # Mid hazard, Mid poverty
-            (1, 2): '#9c6290',  # Mid hazard, High poverty
-            (2, 0): '#73ae80',  # High hazard, Low poverty
-            (2, 1): '#6c8b74',  # High hazard, Mid poverty
-            (2, 2): '#5e5e73',  # High hazard, High poverty
-        },
-        'pink_blue': {  # Pink-Blue palette
-            (0, 0): '#e8e8e8',  # Low hazard, Low poverty
-            (0, 1): '#ace4e4',  # Low hazard, Mid poverty
-            (0, 2): '#5ac8c8',  # Low hazard, High poverty
-            (1, 0): '#dfb0d6',  # Mid hazard, Low poverty
-            (1, 1): '#a5add3',  # Mid hazard, Mid poverty
-            (1, 2): '#5698b9',  # Mid hazard, High poverty
-            (2, 0): '#be64ac',  # High hazard, Low poverty
-            (2, 1): '#8c62aa',  # High hazard, Mid poverty
-            (2, 2): '#3b4994',  # High hazard, High poverty
-        },
-        'green_blue': {  # Green-Blue palette
-            (0, 0): '#e8e8e8',  # Low hazard, Low poverty
-            (0, 1): '#b5c0da',  # Low hazard, Mid poverty
-            (0, 2): '#6c83b5',  # Low hazard, High poverty
-            (1, 0): '#b8d6be',  # Mid hazard, Low poverty
-            (1, 1): '#90b2b3',  # Mid hazard, Mid poverty
-            (1, 2): '#567994',  # Mid hazard, High poverty
-            (2, 0): '#73ae80',  # High hazard, Low poverty
-            (2, 1): '#5a9178',  # High hazard, Mid poverty
-            (2, 2): '#2a5a5b',  # High hazard, High poverty
-        },
-        'purple_yellow': {  # Purple-Yellow palette
-            (0, 0): '#e8e8e8',  # Low hazard, Low poverty
-            (0, 1): '#e4d9ac',  # Low hazard, Mid poverty
-            (0, 2): '#c8b35a',  # Low hazard, High poverty
-            (1, 0): '#cbb8d7',  # Mid hazard, Low poverty
-            (1, 1): '#c8ada0',  # Mid hazard, Mid poverty
-            (1, 2): '#af8e53',  # Mid hazard, High poverty
-            (2, 0): '#9972af',  # High hazard, Low poverty
-            (2, 1): '#976b82',  # High hazard, Mid poverty
-            (2, 2): '#804d36',  # High hazard, High poverty
-        }
-    }
-
-    # Create a 4×4 palette based on the 3×3 palette (interpolation)
-    def create_4x4_palette(palette_3x3):
-        palette_4x4 = {}
-
-        # Define corner points from 3×3 (these stay the same)
-        palette_4x4[(0, 0)] = palette_3x3[(0, 0)]  # Low-Low
-        palette_4x4[(0, 3)] = palette_3x3[(0, 2)]  # Low-High
-        palette_4x4[(3, 0)] = palette_3x3[(2, 0)]  # High-Low
-        palette_4x4[(3, 3)] = palette_3x3[(2, 2)]  # High-High
-
-        # Convert all colors to RGB floats for interpolation
-        colors_rgb = {pos: hex_to_rgb(color) for pos, color in palette_3x3.items()}
-
-        # Generate the 4×4 palette through bilinear interpolation
-        for i in range(4):
-            for j in range(4):
-                # Skip already defined corners
-                if (i, j) in palette_4x4:
-                    continue
-
-                # Map 4×4 position to 3×3 position for interpolation
-                x = i / 3 * 2  # Map 0-3 to 0-2
-                y = j / 3 * 2  # Map 0-3 to 0-2
-
-                # Find the four surrounding points in the 3×3 grid
-                x0, y0 = int(x), int(y)
-                x1, y1 = min(x0 + 1, 2), min(y0 + 1, 2)
-
-                # Calculate interpolation weights
-                wx = x - x0
-                wy = y - y0
-
-                # Bilinear interpolation of RGB values
-                color = [0, 0, 0, 1.0]
-                for c in range(3):  # RGB channels
-                    color[c] = (
-                        (1-wx)*(1-wy) * colors_rgb[(x0, y0)][c] +
-                        wx*(1-wy) * colors_rgb[(x1, y0)][c] +
-                        (1-wx)*wy * colors_rgb[(x0, y1)][c] +
-                        wx*wy * colors_rgb[(x1, y1)][c]
-                    )
-
-                # Convert to hex and add to palette
-                hex_color = mcolors.rgb2hex(color[:3])
-                palette_4x4[(i, j)] = hex_color
-
-        return palette_4x4
-
-    # Create a 5×5 palette (similar approach to 4×4)
-    def create_5x5_palette(palette_3x3):
-        palette_5x5 = {}
-
-        # Define corner points
-        palette_5x5[(0, 0)] = palette_3x3[(0, 0)]  # Low-Low
-        palette_5x5[(0, 4)] = palette_3x3[(0, 2)]  # Low-High
-        palette_5x5[(4, 0)] = palette_3x3[(2, 0)]  # High-Low
-        palette_5x5[(4, 4)] = palette_3x3[(2, 2)]  # High-High
-
-        # Convert all colors to RGB floats for interpolation
-        colors_rgb = {pos: hex_to_rgb(color) for pos, color in palette_3x3.items()}
-
-        # Generate the 5×5 palette through bilinear interpolation
-        for i in range(5):
-            for j in range(5):
-                # Skip already defined corners
-                if (i, j) in palette_5x5:
-                    continue
-
-                # Map 5×5 position to 3×3 position for interpolation
-                x = i / 4 * 2  # Map 0-4 to 0-2
-                y = j / 4 * 2  # Map 0-4 to 0-2
-
-                # Find the four surrounding points in the 3×3 grid
-                x0, y0 = int(x), int(y)
-                x1, y1 = min(x0 + 1, 2), min(y0 + 1, 2)
-
-                # Calculate interpolation weights
-                wx = x - x0
-                wy = y - y0
-
-                # Bilinear interpolation of RGB values
-                color = [0, 0, 0, 1.0]
-                for c in range(3):  # RGB channels
-                    color[c] = (
-                        (1-wx)*(1-wy) * colors_rgb[(x0, y0)][c] +
-                        wx*(1-wy) * colors_rgb[(x1, y0)][c] +
-                        (1-wx)*wy * colors_rgb[(x0, y1)][c] +
-                        wx*wy * colors_rgb[(x1, y1)][c]
-                    )
-
-                # Convert to hex and add to palette
-                hex_color = mcolors.rgb2hex(color[:3])
-                palette_5x5[(i, j)] = hex_color
-
-        return palette_5x5
-
-    # Fallback to blue_red if an invalid palette key is provided
-    if palette_key not in stevens_palettes:
-        palette_key = 'blue_red'
-
-    # Get the appropriate base palette
-    base_palette = stevens_palettes[palette_key]
-
-    # Select or generate the palette for the requested number of quantiles
-    match num_quantiles:
-        case 3:
-            palette = base_palette
-        case 4:
-            palette = create_4x4_palette(base_palette)
-        case 5:
-            palette = create_5x5_palette(base_palette)
-        case _:
-            # Fall back to 3×3 for any other value
-            palette = base_palette
-            num_quantiles = 3
-
-    # Create the color matrix from the palette using list comprehension
-    bivariate_colors = np.array([
-        [hex_to_rgb(palette[(i, j)]) for j in range(num_quantiles)]
-        for i in range(num_quantiles)
-    ])
+    bivariate_colors = bivariate_palette(palette_key, num_quantiles)
 
     # Create a flattened list of colors
-    colors_list = [bivariate_colors[i, j, :] for i in range(num_quantiles) for j in range(num_quantiles)]
+    colors_list = list(bivariate_colors.reshape(-1, 4))
 
     return bivariate_colors, colors_list
 
@@ -4,7 +4,6 @@ import numpy as np
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
 import geopandas as gpd
-from urllib.request import urlretrieve
 from shapely.geometry import shape
 from IPython.display import display, clear_output, HTML
 import ipywidgets as widgets
@@ -15,7 +14,9 @@ import folium
 import tkinter as tk
 from tkinter import filedialog
 from input_utils import get_adm_data
-from rasterstats import zonal_stats
+import download_utils
+import netcdf_utils
+import zonal_utils
 import warnings
 warnings.filterwarnings("ignore", message=".*crs.*", category=UserWarning)
 
@@ -314,7 +315,7 @@ def download_file(url, local_path, mode='baseline', ssp=None):
     if not os.path.exists(modified_path):
         print(f"Downloading {url} to {modified_path}")
         try:
-            urlretrieve(url, modified_path)
+            download_utils.download(url, modified_path)
             print(f"Download complete: {modified_path}")
             return modified_path, True
         except Exception as e:
@@ -382,16 +383,14 @@ def get_index_metadata(index):
     return title, unit, cmap
 
 # Function to load NetCDF data
-def load_netcdf(file_path, variable_name):
-    """Load a NetCDF file and check for the specified variable."""
+def load_netcdf(file_path, variable_name, bounds=None):
+    """
+    Load a NetCDF file lazily (dask chunks) and check for the specified variable.
+    With bounds (e.g. netcdf_utils.geographic_bounds of the boundaries), the grid is clipped to the country window
+    before any value is read (see netcdf_utils.open_netcdf).
+    """
     try:
-        ds = xr.open_dataset(file_path)
-        # Check if the variable exists
-        if variable_name not in ds:
-            print(f"Variable {variable_name} not found in {file_path}")
-            print(f"Available variables: {list(ds.variables)}")
-            return None
-        return ds
+        return netcdf_utils.open_netcdf(file_path, variable_name, bounds=bounds)
     except Exception as e:
         print(f"Error loading NetCDF file: {e}")
         return None
@@ -430,22 +429,11 @@ def extract_seasonal_data(ds, variable_name, year):
         # For seasonal data, we expect a 'season' dimension or coordinate
         has_season_dim = 'season' in ds.dims or 'season' in ds.coords
         
-        # Find the index for the specified year
-        times = ds.time.values
-        if not np.issubdtype(times.dtype, np.datetime64):
-            try:
-                times = np.array([np.datetime64(str(t)) for t in times])
-            except:
-                print(f"Unable to convert time values to datetime64: {times}")
-                return None
-        
-        # Extract the years
-        years = pd.DatetimeIndex(times).year
-        
-        # Find the indices for the specified year
-        year_indices = np.where(years == year)[0]
+        # Find the indices for the specified year, from the year map computed once per file
+        year_map = netcdf_utils.year_index_map(ds)
+        year_indices = year_map.get(year, [])
         if len(year_indices) == 0:
-            print(f"Year {year} not found in dataset. Available years: {sorted(set(years))}")
+            print(f"Year {year} not found in dataset. Available years: {sorted(year_map)}")
             return None
             
         # Extract the data for all seasons in the specified year
@@ -468,8 +456,7 @@ def extract_seasonal_data(ds, variable_name, year):
             # We'll try to infer seasons based on the month
             seasons_data = {}
             for idx in year_indices:
-                time = pd.Timestamp(times[idx])
-                month = time.month
+                month = ds.indexes['time'][idx].month
                 
                 # Assign season based on month
                 if month in [12, 1, 2]:
@@ -503,23 +490,11 @@ def extract_year_from_timeseries(ds, variable_name, year):
             print(f"Available dimensions: {ds.dims}")
             return None
             
-        # Find the index for the specified year
-        # First, convert the time coordinate to numpy datetime64 if it's not already
-        times = ds.time.values
-        if not np.issubdtype(times.dtype, np.datetime64):
-            try:
-                times = np.array([np.datetime64(str(t)) for t in times])
-            except:
-                print(f"Unable to convert time values to datetime64: {times}")
-                return None
-        
-        # Extract the years
-        years = pd.DatetimeIndex(times).year
-        
-        # Find the index for the specified year
-        year_indices = np.where(years == year)[0]
+        # Find the index for the specified year, from the year map computed once per file
+        year_map = netcdf_utils.year_index_map(ds)
+        year_indices = year_map.get(year, [])
         if len(year_indices) == 0:
-            print(f"Year {year} not found in dataset. Available years: {sorted(set(years))}")
+            print(f"Year {year} not found in dataset. Available years: {sorted(year_map)}")
             return None
             
         # Use the first index if multiple found
@@ -537,63 +512,94 @@ def extract_year_from_timeseries(ds, variable_name, year):
         traceback.print_exc()
         return None
 
-# Function to prepare xarray for zonal statistics
-def prepare_xarray_for_zonal_stats(xds):
-    """Convert xarray DataArray to a format suitable for zonal statistics."""
-    try:
-        # Create a copy to avoid modifying the original
-        xds_copy = xds.copy()
-        
-        # Check dimensions - the data may need to be squeezed to remove singleton dimensions
-        print(f"Original xarray data shape: {xds_copy.shape}")
-        
-        # If it's a 3D array with a singleton first dimension, squeeze it
-        if len(xds_copy.shape) == 3 and xds_copy.shape[0] == 1:
-            xds_copy = xds_copy.squeeze(dim=xds_copy.dims[0])
-            print(f"Squeezed xarray data to shape: {xds_copy.shape}")
-        
-        # Check if we need to add the rio accessor
-        if not hasattr(xds_copy, 'rio'):
-            import rioxarray
-        
-        # Make sure the CRS is properly set
-        if not hasattr(xds_copy, 'rio') or not xds_copy.rio.crs:
-            xds_copy = xds_copy.rio.write_crs("EPSG:4326")
-            print("Set CRS to EPSG:4326")
-        
-        # Ensure no NaN values that might cause issues
-        xds_copy = xds_copy.fillna(-999)
-        
-        # Check the final shape
-        print(f"Prepared xarray data with shape {xds_copy.shape}")
-        return xds_copy
+# Function to extract all the selected years and seasons as zonal statistics at once
+def extract_zonal_timeseries(ds, variable_name, index, admin_boundaries, years, timescale='Annual'):
+    """
+    Extract the data of all the selected years (and seasons) and reduce it to zonal means in one pass.
+    
+    The layers are selected lazily (see extract_year_from_timeseries and extract_seasonal_data), stacked as one
+    (layer, lat, lon) block that is read once, and reduced to (zone, layer) with the coverage weights of the
+    boundaries (see zonal_utils.coverage_weights), instead of one zonal statistics pass per year and season.
+    
+    Args:
+        ds: Timeseries dataset
+        variable_name: Variable of the climate index
+        index: Climate index, for the conversion of time units
+        admin_boundaries: GeoDataFrame with administrative boundaries
+        years: Selected years
+        timescale: 'Annual' or 'Seasonal'
         
-    except Exception as e:
-        print(f"Error preparing xarray for zonal statistics: {e}")
-        import traceback
-        traceback.print_exc()
+    Returns:
+        Tuple (periods, zonal_values): list of (year, period) of each layer, with period 'Annual' or the season
+        name, and array of zonal means of shape (n_zones, n_layers); (None, None) if no data is available
+    """
+    periods = []
+    layers = []
+    for year in years:
+        if timescale == 'Annual':
+            year_data = extract_year_from_timeseries(ds, variable_name, year)
+            year_layers = {} if year_data is None else {'Annual': year_data}
+        else:
+            year_layers = extract_seasonal_data(ds, variable_name, year) or {}
+        for period, data in year_layers.items():
+            if 'time' in data.dims:
+                data = data.isel(time=0)
+            periods.append((year, period))
+            layers.append(data.drop_vars([coord for coord in data.coords if coord not in ('lat', 'lon')]))
+    
+    if not layers:
+        print(f"No data available for {index} in the selected years")
+        return None, None
+    
+    # Read all the layers at once, then convert the time units of the whole block
+    print(f"Reading {len(layers)} layers of {index} as one block...")
+    block = xr.concat(layers, dim='layer').transpose('layer', 'lat', 'lon').compute()
+    block = handle_time_units(block, index)
+    
+    if admin_boundaries.crs is None:
+        print("Setting CRS for admin boundaries to EPSG:4326")
+        admin_boundaries = admin_boundaries.set_crs("EPSG:4326")
+    weights = zonal_utils.coverage_weights(admin_boundaries.geometry.to_crs("EPSG:4326"), block.lat.values, block.lon.values)
+    zonal_values = zonal_utils.coverage_reduce(weights, block.values.reshape(len(layers), -1).T, 'mean')
+    
+    print(f"Calculated zonal statistics for {zonal_values.shape[0]} zones and {len(periods)} layers")
+    return periods, zonal_values
+
+# Function to combine the zonal statistics of all years and seasons in one GeoDataFrame
+def build_timeseries_gdf(admin_boundaries, periods, zonal_values):
+    """
+    Add one column per year and season to the boundaries, e.g. "Y2020_mean" or "Y2020_djf_mean".
+    
+    Args:
+        admin_boundaries: GeoDataFrame with administrative boundaries
+        periods: List of (year, period) of each layer, see extract_zonal_timeseries
+        zonal_values: Array of zonal means of shape (n_zones, n_layers)
         
-        # Try a last-ditch simple conversion
-        try:
-            if len(xds.shape) > 2:
-                # Try to convert to 2D by taking the first slice
-                xds_2d = xds[0]
-                print(f"Emergency conversion to 2D: shape {xds_2d.shape}")
-                return xds_2d
-        except:
-            pass
-            
-        return xds  # Return original as fallback
+    Returns:
+        GeoDataFrame with the boundaries and the zonal statistics columns
+    """
+    columns = {}
+    for (year, period), values in zip(periods, zonal_values.T):
+        season_suffix = "" if period == 'Annual' else f"_{period.lower()}"
+        columns[f"Y{year}{season_suffix}_mean"] = values
+    all_gdf = admin_boundaries.assign(**columns)
+    if all_gdf.crs is None:
+        all_gdf = all_gdf.set_crs("EPSG:4326")
+    return all_gdf
 
 # Function to calculate zonal statistics
 def calculate_zonal_stats(data_array, admin_boundaries, stat='mean'):
     """
     Calculate zonal statistics for each administrative boundary.
     
+    Cells are weighted by the area of each boundary covering them (see zonal_utils.coverage_weights), so
+    small units on a coarse grid still get exact values. The weight matrix is computed once per boundary
+    set and grid, then each layer is reduced with a sparse matrix product.
+    
     Args:
-        data_array: xarray DataArray to use for statistics
+        data_array: xarray DataArray to use for statistics, with lat and lon dimensions
         admin_boundaries: GeoDataFrame with administrative boundaries
-        stat: Statistic to calculate ('mean', 'min', 'max', etc.)
+        stat: Statistic to calculate ('mean', 'min' or 'max')
         
     Returns:
         GeoDataFrame with original boundaries and added statistics column
@@ -601,171 +607,24 @@ def calculate_zonal_stats(data_array, admin_boundaries, stat='mean'):
     print(f"Calculating zonal {stat} statistics...")
     column_name = f"{data_array.name}_{stat}"
     
-    # First, try using xarray's built-in methods
     try:
-        # Prepare admin_boundaries
         admin_boundaries_copy = admin_boundaries.copy()
         if admin_boundaries_copy.crs is None:
             print("Setting CRS for admin boundaries to EPSG:4326")
             admin_boundaries_copy = admin_boundaries_copy.set_crs("EPSG:4326")
-            
-        # Create a copy of data_array
-        arr_copy = data_array.copy()
+        geometries = admin_boundaries_copy.geometry.to_crs("EPSG:4326")
         
-        # Squeeze array if needed to remove singleton dimensions
-        if len(arr_copy.shape) > 2:
-            print(f"Original array shape: {arr_copy.shape}")
-            arr_copy = arr_copy.squeeze()
-            print(f"After squeezing: {arr_copy.shape}")
+        # Remove singleton dimensions (e.g. a single time step) and keep the grid in (lat, lon) order
+        arr = data_array.squeeze().transpose('lat', 'lon')
+        weights = zonal_utils.coverage_weights(geometries, arr.lat.values, arr.lon.values)
+        values = zonal_utils.coverage_reduce(weights, arr.values.ravel(), stat)
         
-        # Get coordinates for better debugging
-        if hasattr(arr_copy, 'lat') and hasattr(arr_copy, 'lon'):
-            print(f"Array coordinates - Lat: {arr_copy.lat.values.min()} to {arr_copy.lat.values.max()}, "
-                  f"Lon: {arr_copy.lon.values.min()} to {arr_copy.lon.values.max()}")
-                  
-        # Try direct calculation with xarray and GeoPandas
-        # This is an experimental direct approach without rasterstats
-        try:
-            import numpy as np
-            from shapely.geometry import Point
-            
-            # Create a simple zonal statistics approach using point sampling
-            print("Attempting direct sampling approach...")
-            
-            # Get lat/lon values 
-            lats = arr_copy.lat.values
-            lons = arr_copy.lon.values
-            
-            # Create mesh grid of all points
-            lon_grid, lat_grid = np.meshgrid(lons, lats)
-            
-            # Sample mean values for each polygon
-            means = []
-            
-            for idx, row in admin_boundaries_copy.iterrows():
-                geom = row.geometry
-                # Sample points within the geometry
-                mask = np.zeros_like(arr_copy.values, dtype=bool)
-                
-                # For efficiency, sample a subset of points
-                sample_step = max(1, int(len(lats) * len(lons) / 10000))
-                for i in range(0, len(lats), sample_step):
-                    for j in range(0, len(lons), sample_step):
-                        point = Point(lon_grid[i, j], lat_grid[i, j])
-                        if geom.contains(point):
-                            mask[i, j] = True
-                
-                # Calculate mean for this polygon
-                if np.any(mask):
-                    polygon_mean = float(arr_copy.values[mask].mean())
-                else:
-                    # If no points in polygon, use nearest point
-                    centroid = geom.centroid
-                    # Find closest point
-                    dist = (lon_grid - centroid.x)**2 + (lat_grid - centroid.y)**2
-                    closest_idx = np.unravel_index(dist.argmin(), dist.shape)
-                    polygon_mean = float(arr_copy.values[closest_idx])
-                
-                means.append(polygon_mean)
-            
-            # Add values to the GeoDataFrame
-            admin_boundaries_copy[column_name] = means
-            print(f"Direct sampling successful - values range: {min(means)} to {max(means)}")
-            return admin_boundaries_copy
-            
-        except Exception as e:
-            print(f"Direct sampling approach failed: {e}")
-            # Continue to traditional rasterstats approach
-    
-    except Exception as e:
-        print(f"Error in initial processing: {e}")
-    
-    # Traditional approach using rasterstats
-    try:
-        # Create a temporary GeoTIFF file
-        temp_dir = os.path.join(common.OUTPUT_DIR, "climate_indices_temp")
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_tif = os.path.join(temp_dir, f"temp_{data_array.name}_raster.tif")
-        
-        # Prepare the data array
-        data_array_rio = prepare_xarray_for_zonal_stats(data_array)
-        if data_array_rio is None:
-            print("Failed to prepare xarray for zonal statistics")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-        
-        # Check spatial dimensions
-        if len(data_array_rio.shape) < 2 or data_array_rio.shape[0] <= 0 or data_array_rio.shape[1] <= 0:
-            print(f"Error: Invalid raster dimensions {data_array_rio.shape}")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-        
-        # Set up rioxarray properly
-        try:
-            # Ensure proper data type and nodata value
-            data_array_rio = data_array_rio.astype('float32')
-            
-            # Set nodata value
-            if hasattr(data_array_rio, 'rio'):
-                data_array_rio = data_array_rio.rio.write_nodata(-999)
-                
-            # Write to GeoTIFF with explicit parameters
-            data_array_rio.rio.to_raster(
-                temp_tif,
-                driver='GTiff',
-                dtype='float32',
-                nodata=-999
-            )
-            
-            print(f"Successfully wrote temporary raster to {temp_tif}")
-        except Exception as e:
-            print(f"Error writing raster: {e}")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-        
-        # Ensure admin_boundaries has a CRS set
-        admin_boundaries_copy = admin_boundaries.copy()
-        if admin_boundaries_copy.crs is None:
-            print("Setting CRS for admin boundaries to EPSG:4326")
-            admin_boundaries_copy = admin_boundaries_copy.set_crs("EPSG:4326")
-        
-        # Verify the temp file exists and has valid data
-        if not os.path.exists(temp_tif):
-            print(f"Error: Failed to create temporary raster file {temp_tif}")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-        
-        # Try zonal stats
-        try:
-            stats_results = zonal_stats(
-                vectors=admin_boundaries_copy,
-                raster=temp_tif,
-                stats=[stat],
-                all_touched=True,
-                nodata=-999
-            )
-            
-            # Add the calculated statistic to the GeoDataFrame
-            admin_boundaries_copy[column_name] = [s.get(stat) for s in stats_results]
-            
-            # Verify we have meaningful values
-            values = [s.get(stat) for s in stats_results if s.get(stat) is not None]
-            if len(values) > 0:
-                unique_values = len(set(values))
-                print(f"Zonal stats calculation successful - {unique_values} unique values found")
-                if unique_values == 1:
-                    print("WARNING: All zones have the same value - this may indicate an issue")
-            else:
-                print("WARNING: No valid statistics calculated")
-                return use_fallback_values(admin_boundaries, data_array, column_name)
-                
-        except Exception as e:
-            print(f"Zonal stats attempt failed: {e}")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-            
-        # Clean up temporary file
-        if os.path.exists(temp_tif):
-            try:
-                os.remove(temp_tif)
-            except:
-                print(f"Warning: Could not remove temporary file {temp_tif}")
-                
+        admin_boundaries_copy[column_name] = values
+        valid = values[np.isfinite(values)]
+        if len(valid) > 0:
+            print(f"Zonal stats calculation successful - values range: {valid.min()} to {valid.max()}")
+        if len(valid) < len(values):
+            print(f"WARNING: {len(values) - len(valid)} zones are not covered by valid grid cells")
         return admin_boundaries_copy
         
     except Exception as e:
@@ -880,8 +739,12 @@ def create_choropleth_map(admin_boundaries_with_stats, data_col, title, unit, cm
     return fig
 
 # Function to create plots for a climate index year
-def create_climate_plots(timeseries_ds, admin_boundaries, index, selected_year, mode='baseline', timescale='Annual', ssp=None):
-    """Create plots for a climate index showing data for the selected year/seasons."""
+def create_climate_plots(timeseries_ds, admin_boundaries, index, selected_year, mode='baseline', timescale='Annual', ssp=None, zonal_values=None):
+    """
+    Create plots for a climate index showing data for the selected year/seasons.
+    zonal_values maps each period ('Annual' or season name) to zonal means already calculated for this year
+    (see extract_zonal_timeseries), otherwise zonal statistics are calculated for each plot.
+    """
     # Get variable name
     variable_name = get_variable_name(index, timescale)
     
@@ -910,7 +773,8 @@ def create_climate_plots(timeseries_ds, admin_boundaries, index, selected_year,
         # Create figure and zonal stats
         fig, zonal_fig, zonal_data = create_single_climate_plot(
             year_data, admin_boundaries, index, title, unit, cmap, selected_year, 
-            mode=mode, ssp=ssp, season=None
+            mode=mode, ssp=ssp, season=None,
+            zonal_values=zonal_values.get('Annual') if zonal_values else None
         )
         
         if fig is not None:
@@ -935,7 +799,8 @@ def create_climate_plots(timeseries_ds, admin_boundaries, index, selected_year,
             # Create figure and zonal stats for this season
             fig, zonal_fig, zonal_data = create_single_climate_plot(
                 season_data, admin_boundaries, index, title, unit, cmap, selected_year, 
-                mode=mode, ssp=ssp, season=season_name
+                mode=mode, ssp=ssp, season=season_name,
+                zonal_values=zonal_values.get(season_name) if zonal_values else None
             )
             
             if fig is not None:
@@ -948,8 +813,8 @@ def create_climate_plots(timeseries_ds, admin_boundaries, index, selected_year,
     return figures, zonal_figures, zonal_data_list
 
 # Helper function to create a single plot
-def create_single_climate_plot(data, admin_boundaries, index, title, unit, cmap, year, mode='baseline', ssp=None, season=None):
-    """Create a single climate plot for a given data slice."""
+def create_single_climate_plot(data, admin_boundaries, index, title, unit, cmap, year, mode='baseline', ssp=None, season=None, zonal_values=None):
+    """Create a single climate plot for a given data slice, using the zonal means in zonal_values if given."""
     # Print data range for reference
     print(f"Data range for {index} in {year}{' '+season if season else ''}: {data.min().values} to {data.max().values}")
     
@@ -1067,10 +932,14 @@ def create_single_climate_plot(data, admin_boundaries, index, title, unit, cmap,
             # Add suffix for season if provided
             data_name = f"{index}{'_'+season if season else ''}"
             data.name = data_name
-            gdf_zonal = calculate_zonal_stats(data, admin_boundaries)
             
             # Determine column name for zonal statistics
             zonal_col = f"{data_name}_mean"
+            if zonal_values is not None:
+                gdf_zonal = admin_boundaries.copy()
+                gdf_zonal[zonal_col] = zonal_values
+            else:
+                gdf_zonal = calculate_zonal_stats(data, admin_boundaries)
             
             if zonal_col in gdf_zonal.columns:
                 # Update title for zonal map
@@ -1098,87 +967,55 @@ def create_single_climate_plot(data, admin_boundaries, index, title, unit, cmap,
     return fig, zonal_fig, zonal_data
 
 # Function to generate summary statistics
-def generate_summary_statistics(zonal_data_list, index, timescale, output_dir):
-    """Generate summary statistics for the processed data."""
+def generate_summary_statistics(periods, zonal_values, index, timescale, output_dir):
+    """
+    Generate summary statistics for the processed data.
+    
+    Args:
+        periods: List of (year, period) of each layer, with period 'Annual' or the season name
+        zonal_values: Array of zonal means of shape (n_zones, n_layers), see extract_zonal_timeseries
+        index: Climate index
+        timescale: 'Annual' or 'Seasonal'
+        output_dir: Output directory
+    """
     try:
         # Create a dedicated statistics directory
         stats_dir = os.path.join(output_dir, "statistics")
         os.makedirs(stats_dir, exist_ok=True)
         
-        # Organize data by time period (annual or season)
-        period_data = {}
-        
-        for year, period, gdf in zonal_data_list:
-            if period not in period_data:
-                period_data[period] = []
-            period_data[period].append((year, gdf))
+        # Statistics across zones of every layer (year and period) at once, ignoring zones without data
+        valid = np.isfinite(zonal_values)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            layer_stats = pd.DataFrame({
+                'Year': [year for year, _ in periods],
+                'Period': [period for _, period in periods],
+                'Mean': np.nanmean(zonal_values, axis=0),
+                'Median': np.nanmedian(zonal_values, axis=0),
+                'Min': np.nanmin(zonal_values, axis=0),
+                'Max': np.nanmax(zonal_values, axis=0),
+                'StdDev': np.nanstd(zonal_values, axis=0),
+                'Count': valid.sum(axis=0)
+            })
+        layer_stats = layer_stats[layer_stats['Count'] > 0]
         
-        # Process each time period
-        for period, data_list in period_data.items():
+        # Process each time period (annual or season), in the order of the layers
+        period_names = list(dict.fromkeys(layer_stats['Period']))
+        for period in period_names:
             print(f"\nSummary statistics for {period}:")
+            stats_df = layer_stats[layer_stats['Period'] == period].reset_index(drop=True)
+            for _, stats in stats_df.iterrows():
+                print(f"Year {stats['Year']}: Mean={stats['Mean']:.2f}, Min={stats['Min']:.2f}, Max={stats['Max']:.2f}")
             
-            # Find the zonal statistics column in the GeoDataFrame
-            # Try several possible column name patterns
-            column_patterns = [
-                f"{index}_{period.lower()}_mean",
-                f"{index}_mean",
-                f"{index.lower()}_{period.lower()}_mean",
-                f"{index.lower()}_mean"
-            ]
-            
-            # For the first GeoDataFrame, find the correct column
-            _, sample_gdf = data_list[0]
-            zonal_col = None
-            
-            for pattern in column_patterns:
-                matching_cols = [col for col in sample_gdf.columns if pattern in col.lower()]
-                if matching_cols:
-                    zonal_col = matching_cols[0]
-                    break
-            
-            if not zonal_col:
-                print(f"Could not identify zonal statistics column for {period}")
-                # Try to find any column that might contain the index name and 'mean'
-                potential_cols = [col for col in sample_gdf.columns 
-                                if index.lower() in col.lower() and 'mean' in col.lower()]
-                if potential_cols:
-                    zonal_col = potential_cols[0]
-                    print(f"Using column: {zonal_col}")
-                else:
-                    print("No suitable column found for statistics")
-                    continue
-            
-            # Calculate statistics for each year
-            stats_rows = []
-            
-            for year, gdf in data_list:
-                if zonal_col in gdf.columns:
-                    values = gdf[zonal_col].dropna().values
-                    if len(values) > 0:
-                        stats = {
-                            'Year': year,
-                            'Period': period,
-                            'Mean': np.mean(values),
-                            'Median': np.median(values),
-                            'Min': np.min(values),
-                            'Max': np.max(values),
-                            'StdDev': np.std(values),
-                            'Count': len(values)
-                        }
-                        stats_rows.append(stats)
-                        print(f"Year {year}: Mean={stats['Mean']:.2f}, Min={stats['Min']:.2f}, Max={stats['Max']:.2f}")
-            
-            # Create a DataFrame with the statistics
-            if stats_rows:
-                stats_df = pd.DataFrame(stats_rows)
-                
+            # Save the statistics
+            if len(stats_df) > 0:
                 # Create filename for statistics
                 stats_file = os.path.join(stats_dir, f"{index}_{period.lower()}_statistics.csv")
                 stats_df.to_csv(stats_file, index=False)
                 print(f"Saved {period} statistics to {stats_file}")
                 
                 # If we have multiple years, create a trend visualization
-                if len(stats_rows) > 1:
+                if len(stats_df) > 1:
                     plt.figure(figsize=(10, 6))
                     plt.plot(stats_df['Year'], stats_df['Mean'], 'o-', label='Mean')
                     plt.fill_between(stats_df['Year'], 
@@ -1201,47 +1038,13 @@ def generate_summary_statistics(zonal_data_list, index, timescale, output_dir):
                     print(f"Saved {period} trend visualization to {trend_file}")
         
         # Create a combined statistics summary if we have seasonal data
-        if timescale == 'Seasonal' and len(period_data) > 1:
+        if timescale == 'Seasonal' and len(period_names) > 1:
             # Combine all seasonal statistics
-            all_stats = []
-            for period, data_list in period_data.items():
-                if period == 'Annual':
-                    continue  # Skip annual data if present
-                    
-                for year, gdf in data_list:
-                    # Find the appropriate column
-                    zonal_col = None
-                    for pattern in column_patterns:
-                        matching_cols = [col for col in gdf.columns if pattern in col.lower()]
-                        if matching_cols:
-                            zonal_col = matching_cols[0]
-                            break
-                    
-                    if not zonal_col:
-                        # Try to find any column that might contain the index name and 'mean'
-                        potential_cols = [col for col in gdf.columns 
-                                        if index.lower() in col.lower() and 'mean' in col.lower()]
-                        if potential_cols:
-                            zonal_col = potential_cols[0]
-                        else:
-                            continue
-                    
-                    if zonal_col in gdf.columns:
-                        values = gdf[zonal_col].dropna().values
-                        if len(values) > 0:
-                            all_stats.append({
-                                'Year': year,
-                                'Season': period,
-                                'Mean': np.mean(values),
-                                'Median': np.median(values),
-                                'Min': np.min(values),
-                                'Max': np.max(values),
-                                'StdDev': np.std(values)
-                            })
+            all_stats = layer_stats[layer_stats['Period'] != 'Annual']
             
-            if all_stats:
+            if len(all_stats) > 0:
                 # Create a DataFrame with all seasons
-                all_seasons_df = pd.DataFrame(all_stats)
+                all_seasons_df = all_stats.rename(columns={'Period': 'Season'}).drop(columns='Count').reset_index(drop=True)
                 
                 # Save the combined statistics
                 combined_stats_file = os.path.join(stats_dir, f"{index}_all_seasons_statistics.csv")
@@ -1382,28 +1185,25 @@ def save_figure(fig, country, index, year, output_dir, mode='baseline', ssp=None
     return output_path
 
 # Function to export GeoDataFrame to GeoPackage
-def export_boundaries_to_gpkg(gdf, country, adm_level, index, year, output_dir, mode='baseline', ssp=None, all_gdf=None, is_final=False):
+def export_boundaries_to_gpkg(all_gdf, country, adm_level, index, output_dir, mode='baseline', ssp=None):
     """
     Export administrative boundaries with statistics to a GeoPackage file.
     
     Args:
-        gdf: GeoDataFrame with zonal statistics for the current year
+        all_gdf: Combined GeoDataFrame with all years and seasons (see build_timeseries_gdf)
         country: Country ISO code
         adm_level: Administrative level
-        index: Climate index (may include season suffix)
-        year: Year of the data
+        index: Climate index
         output_dir: Output directory
         mode: Data mode ('baseline' or 'projections')
         ssp: SSP scenario (only for projections mode)
-        all_gdf: Combined GeoDataFrame with all years (if not None)
-        is_final: Whether this is the final call (to save the combined GeoPackage)
     
     Returns:
         Path to the saved GeoPackage or None if failed
     """
-    if gdf is None:
+    if all_gdf is None:
         print("No boundary data to export")
-        return None, None
+        return None
         
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -1416,123 +1216,19 @@ def export_boundaries_to_gpkg(gdf, country, adm_level, index, year, output_dir,
     
     try:
         # Ensure the GeoDataFrame has a proper CRS
-        if gdf.crs is None:
-            gdf = gdf.set_crs("EPSG:4326")
+        if all_gdf.crs is None:
+            all_gdf = all_gdf.set_crs("EPSG:4326")
         
-        # Rename the zonal statistic column to include the year
-        zonal_col = None
-        for col in gdf.columns:
-            if "_mean" in col:
-                zonal_col = col
-                break
-        
-        if zonal_col:
-            # Copy the original GeoDataFrame
-            gdf_copy = gdf.copy()
-            # Rename the column to include the year and season info (if any)
-            # Extract possible season information from index
-            season_suffix = ""
-            if "_" in index and not index.endswith("_"):
-                # Check if index contains season info like "rx5day_djf"
-                parts = index.split("_")
-                if len(parts) > 1:
-                    season_suffix = f"_{parts[-1]}"
-            
-            year_col = f"Y{year}{season_suffix}_mean"
-            gdf_copy = gdf_copy.rename(columns={zonal_col: year_col})
-            
-            # If all_gdf is None, initialize it with the first year's data
-            if all_gdf is None:
-                all_gdf = gdf_copy
-            else:
-                # Check if the year column already exists in all_gdf
-                if year_col in all_gdf.columns:
-                    print(f"Warning: Column {year_col} already exists. Updating values.")
-                    # If already exists, we'll replace it rather than merge
-                    
-                    # Find ID columns for matching records
-                    id_cols = [col for col in all_gdf.columns if 'ID' in col.upper() or 'CODE' in col.upper() or 'HASC' in col.upper()]
-                    # Add essential columns
-                    essential_cols = ['geometry', 'NAM_0']
-                    if 'ADM0_PCODE' in all_gdf.columns:
-                        essential_cols.append('ADM0_PCODE')
-                    
-                    # Use geometry to match records if available, otherwise use id columns
-                    merge_cols = list(set(id_cols + essential_cols).intersection(set(all_gdf.columns)).intersection(set(gdf_copy.columns)))
-                    
-                    if not merge_cols:
-                        print("Warning: No common columns found for merging. Using index-based updates.")
-                        # If no common columns, try to use the index
-                        if len(all_gdf) == len(gdf_copy):
-                            # If same length, update by index position
-                            all_gdf[year_col] = gdf_copy[year_col].values
-                        else:
-                            print(f"Error: Cannot merge data with different lengths ({len(all_gdf)} vs {len(gdf_copy)}).")
-                    else:
-                        # Extract just the necessary columns from gdf_copy
-                        year_data = gdf_copy[merge_cols + [year_col]]
-                        
-                        # To avoid duplication, remove any existing year column from all_gdf
-                        if year_col in all_gdf.columns:
-                            all_gdf = all_gdf.drop(columns=[year_col])
-                        
-                        # Merge with suffixes to avoid collision
-                        all_gdf = all_gdf.merge(
-                            year_data[[col for col in year_data.columns if col not in merge_cols] + [merge_cols[0]]], 
-                            on=merge_cols[0],
-                            how='left',
-                            suffixes=('', '_new')  # Use empty string for existing columns
-                        )
-                else:
-                    # If the column doesn't exist yet, it's safe to merge
-                    id_cols = [col for col in all_gdf.columns if 'ID' in col.upper() or 'CODE' in col.upper() or 'HASC' in col.upper()]
-                    essential_cols = ['geometry', 'NAM_0']
-                    if 'ADM0_PCODE' in all_gdf.columns:
-                        essential_cols.append('ADM0_PCODE')
-                    
-                    merge_cols = list(set(id_cols + essential_cols).intersection(set(all_gdf.columns)).intersection(set(gdf_copy.columns)))
-                    
-                    if 'geometry' in merge_cols:
-                        # If geometry is available, use it as key
-                        key_col = 'geometry'
-                    elif merge_cols:
-                        # Use the first available ID column
-                        key_col = merge_cols[0]
-                    else:
-                        print("Warning: No common columns for merge, using index")
-                        # Fallback to index-based update if no common columns
-                        if len(all_gdf) == len(gdf_copy):
-                            all_gdf[year_col] = gdf_copy[year_col].values
-                            key_col = None
-                        else:
-                            print("Error: Cannot merge data with different lengths")
-                            key_col = None
-                    
-                    if key_col:
-                        # Extract just the year column and key column
-                        year_data = gdf_copy[[key_col, year_col]]
-                        
-                        # Merge only the new column
-                        all_gdf = all_gdf.merge(
-                            year_data, 
-                            on=key_col,
-                            how='left'
-                        )
-        
-        # If this is the final export, save the combined GeoPackage
-        if is_final and all_gdf is not None:
-            layer_name = f"{index}_timeseries"
-            all_gdf.to_file(output_path, layer=layer_name, driver="GPKG")
-            print(f"Saved combined boundary data with {len([col for col in all_gdf.columns if '_mean' in col])} data columns to {output_path}")
-            return output_path, all_gdf
-        
-        return None, all_gdf
+        layer_name = f"{index}_timeseries"
+        all_gdf.to_file(output_path, layer=layer_name, driver="GPKG")
+        print(f"Saved combined boundary data with {len([col for col in all_gdf.columns if '_mean' in col])} data columns to {output_path}")
+        return output_path
         
     except Exception as e:
         print(f"Error exporting boundaries to GeoPackage: {e}")
         import traceback
         traceback.print_exc()
-        return None, all_gdf
+        return None
 
 # Function to export statistics to Excel
 def export_to_excel(all_gdf, country, adm_level, index, output_dir, mode='baseline', ssp=None):
@@ -1540,7 +1236,7 @@ def export_to_excel(all_gdf, country, adm_level, index, output_dir, mode='baseli
     Export zonal statistics to an Excel file.
 
     Args:
-        all_gdf: Combined GeoDataFrame with all years
+        all_gdf: Combined GeoDataFrame with all years (see build_timeseries_gdf)
         country: Country ISO code
         adm_level: Administrative level
         index: Climate index (may include season suffix)
@@ -1587,20 +1283,15 @@ def export_to_excel(all_gdf, country, adm_level, index, output_dir, mode='baseli
                     # Select first name column for labeling
                     name_col = next((col for col in id_cols if 'NAME' in col.upper()), id_cols[0])
 
-                    # Create timeseries data
-                    timeseries_data = []
-                    for idx, row in df_export.iterrows():
-                        location_name = row[name_col]
-                        for year_col in sorted(year_cols):
-                            # Extract year from column name (e.g., "Y2020_mean" -> 2020)
-                            year = year_col.split('_')[0][1:]  # Remove 'Y' prefix
-                            timeseries_data.append({
-                                'Location': location_name,
-                                'Year': year,
-                                'Value': row[year_col]
-                            })
-
-                    timeseries_df = pd.DataFrame(timeseries_data)
+                    # Create timeseries data, one row per location and year column
+                    year_cols = sorted(year_cols)
+                    # Extract year from column name (e.g., "Y2020_mean" -> 2020)
+                    years = [year_col.split('_')[0][1:] for year_col in year_cols]  # Remove 'Y' prefix
+                    timeseries_df = pd.DataFrame({
+                        'Location': np.repeat(df_export[name_col].values, len(year_cols)),
+                        'Year': np.tile(years, len(df_export)),
+                        'Value': df_export[year_cols].to_numpy().ravel()
+                    })
                     timeseries_df.to_excel(writer, sheet_name='Timeseries', index=False)
 
             # Create metadata sheet
@@ -1771,21 +1462,6 @@ def run_analysis(b):
                 print("Error: Failed to download required data file")
                 return
                 
-            # Load NetCDF data
-            variable_name = get_variable_name(selected_index, selected_timescale)
-            print(f"Variable name: {variable_name}")
-            
-            if download_success:
-                print("Loading NetCDF data file...")
-                timeseries_ds = load_netcdf(timeseries_file, variable_name)
-                
-                if timeseries_ds is None:
-                    print("Error: Failed to load NetCDF data file")
-                    return
-            else:
-                print("Error: Failed to download required data file")
-                return
-                
             # Get administrative boundaries
             print(f"Loading administrative boundaries (ADM level {selected_adm_level})...")
             try:
@@ -1819,123 +1495,145 @@ def run_analysis(b):
                 print(f"Error loading boundaries: {str(e)}")
                 return
                 
+            # Load NetCDF data
+            variable_name = get_variable_name(selected_index, selected_timescale)
+            print(f"Variable name: {variable_name}")
+            
+            if download_success:
+                print("Loading NetCDF data file (clipped to the boundaries extent)...")
+                timeseries_ds = load_netcdf(timeseries_file, variable_name, bounds=netcdf_utils.geographic_bounds(admin_boundaries))
+                
+                if timeseries_ds is None:
+                    print("Error: Failed to load NetCDF data file")
+                    return
+            else:
+                print("Error: Failed to download required data file")
+                return
+                
             # Clear previous charts
             with chart_output:
                 clear_output(wait=True)
             
-            # Initialize lists to store all figures and data
+            # Zonal statistics of all the selected years and seasons, calculated at once
+            ssp_value = selected_ssp if selected_mode == 'Projections' else None
+            periods, zonal_values = extract_zonal_timeseries(
+                timeseries_ds, variable_name, selected_index, admin_boundaries,
+                selected_years, timescale=selected_timescale
+            )
+            if periods is None:
+                print("Error: No data available for the selected years")
+                return
+            
+            # Zonal means of each year, by period, for the maps
+            zonal_by_year = {}
+            for (year, period), values in zip(periods, zonal_values.T):
+                zonal_by_year.setdefault(year, {})[period] = values
+            
+            # Combined GeoDataFrame with all years and seasons
+            combined_gdf = build_timeseries_gdf(admin_boundaries, periods, zonal_values)
+            
+            # Initialize lists to store all figures
             all_grid_figs = []
             all_zonal_figs = []
-            all_zonal_data = []
-            combined_gdf = None  # For storing combined GeoDataFrame with all years and seasons
             
-            # Process each selected year
-            for year_idx, selected_year in enumerate(selected_years):
-                print(f"\nProcessing year {selected_year} ({year_idx+1}/{len(selected_years)})...")
-                
-                # Create plots for this year (handles both annual and seasonal based on timescale)
-                figures, zonal_figures, zonal_data_list = create_climate_plots(
-                    timeseries_ds, admin_boundaries, 
-                    selected_index, selected_year,
-                    mode=selected_mode,
-                    timescale=selected_timescale,
-                    ssp=selected_ssp if selected_mode == 'Projections' else None
-                )              
-                
-                if figures is None or len(figures) == 0:
-                    print(f"Warning: Failed to create plots for year {selected_year}, skipping...")
-                    continue
-                
-                # Store figures and data
-                for time_period, fig in figures:
-                    all_grid_figs.append((selected_year, time_period, fig))
-                
-                for time_period, zonal_fig in zonal_figures:
-                    all_zonal_figs.append((selected_year, time_period, zonal_fig))
-                
-                for time_period, zonal_data in zonal_data_list:
-                    all_zonal_data.append((selected_year, time_period, zonal_data))
-                
-                # Save figures if export is enabled
-                if export_charts_chk.value:
+            # Maps of each selected year, only if they are displayed or exported
+            if preview_chk.value or export_charts_chk.value:
+                for year_idx, selected_year in enumerate(selected_years):
+                    if selected_year not in zonal_by_year:
+                        print(f"Warning: No data for year {selected_year}, skipping...")
+                        continue
+                    print(f"\nCreating maps for year {selected_year} ({year_idx+1}/{len(selected_years)})...")
+                    
+                    # Create plots for this year (handles both annual and seasonal based on timescale)
+                    figures, zonal_figures, _ = create_climate_plots(
+                        timeseries_ds, admin_boundaries, 
+                        selected_index, selected_year,
+                        mode=selected_mode,
+                        timescale=selected_timescale,
+                        ssp=ssp_value,
+                        zonal_values=zonal_by_year[selected_year]
+                    )
+                    
+                    if figures is None or len(figures) == 0:
+                        print(f"Warning: Failed to create plots for year {selected_year}, skipping...")
+                        continue
+                    
+                    # Store figures
                     for time_period, fig in figures:
-                        if export_charts_chk.value:    
+                        all_grid_figs.append((selected_year, time_period, fig))
+                    
+                    for time_period, zonal_fig in zonal_figures:
+                        all_zonal_figs.append((selected_year, time_period, zonal_fig))
+                    
+                    # Save figures if export is enabled
+                    if export_charts_chk.value:
+                        for time_period, fig in figures:
                             save_figure(
                                 fig, iso_a3, selected_index, selected_year, 
                                 output_dir, 
                                 mode=selected_mode,
-                                ssp=selected_ssp if selected_mode == 'Projections' else None,
+                                ssp=ssp_value,
                                 suffix=f"_{time_period.lower()}"
                             )
-                    
-                    for time_period, zonal_fig in zonal_figures:
-                        if export_charts_chk.value:   
+                        
+                        for time_period, zonal_fig in zonal_figures:
                             save_figure(
                                 zonal_fig, iso_a3, selected_index, selected_year, 
                                 output_dir, 
                                 mode=selected_mode,
-                                ssp=selected_ssp if selected_mode == 'Projections' else None,
+                                ssp=ssp_value,
                                 suffix=f"_{time_period.lower()}_zonal"
                             )
-
-                # Add this year's data to the combined GeoDataFrame if needed
-                if export_boundaries_chk.value:
-                    for time_period, zonal_data in zonal_data_list:
-                        print(f"Adding {selected_year} {time_period} data to combined GeoPackage...")
-                        # Only save on the last iteration of the last year
-                        is_final = (year_idx == len(selected_years) - 1 and 
-                                    time_period == zonal_data_list[-1][0])
-                        
-                        _, combined_gdf = export_boundaries_to_gpkg(
-                            zonal_data, 
-                            iso_a3,
-                            selected_adm_level,
-                            f"{selected_index}_{time_period.lower()}" if time_period != 'Annual' else selected_index, 
-                            selected_year, 
-                            output_dir,
-                            mode=selected_mode,
-                            ssp=selected_ssp if selected_mode == 'Projections' else None,
-                            all_gdf=combined_gdf,
-                            is_final=is_final
-                        )
-                
-                # Display figures for this year
-                if preview_chk.value:    
-                    with chart_output:
-                        for time_period, fig in figures:
-                            display(HTML(f"<h3>Year {selected_year} - {time_period}</h3>"))
-                            display(fig)
-                            plt.close(fig)
-                        
-                        for time_period, zonal_fig in zonal_figures:
-                            display(HTML(f"<h3>Year {selected_year} - {time_period} (Zonal Statistics)</h3>"))
-                            display(zonal_fig)
-                            plt.close(zonal_fig)
+                    
+                    # Display figures for this year
+                    if preview_chk.value:    
+                        with chart_output:
+                            for time_period, fig in figures:
+                                display(HTML(f"<h3>Year {selected_year} - {time_period}</h3>"))
+                                display(fig)
+                            
+                            for time_period, zonal_fig in zonal_figures:
+                                display(HTML(f"<h3>Year {selected_year} - {time_period} (Zonal Statistics)</h3>"))
+                                display(zonal_fig)
+                    
+                    for _, fig in figures + zonal_figures:
+                        plt.close(fig)
+            
+            # Save the combined GeoPackage with all years and seasons
+            if export_boundaries_chk.value:
+                export_boundaries_to_gpkg(
+                    combined_gdf,
+                    iso_a3,
+                    selected_adm_level,
+                    selected_index,
+                    output_dir,
+                    mode=selected_mode,
+                    ssp=ssp_value
+                )
             
-            # Generate summary statistics if any data was processed
-            if all_zonal_data:
-                print("\nGenerating summary statistics...")
-                generate_summary_statistics(all_zonal_data, selected_index, selected_timescale, output_dir)
+            # Generate summary statistics
+            print("\nGenerating summary statistics...")
+            generate_summary_statistics(periods, zonal_values, selected_index, selected_timescale, output_dir)
             
             # Summary
             print("\nAnalysis summary:")
-            print(f"Successfully processed {len(set([y for y, _, _ in all_grid_figs]))} out of {len(selected_years)} selected years")
+            print(f"Successfully processed {len(zonal_by_year)} out of {len(selected_years)} selected years")
             
             if selected_timescale == 'Seasonal':
-                print(f"Processed {len(all_grid_figs)} seasonal plots")
+                print(f"Processed {len(periods)} seasonal layers")
                 seasons_count = {}
-                for _, season, _ in all_grid_figs:
+                for _, season in periods:
                     seasons_count[season] = seasons_count.get(season, 0) + 1
                 for season, count in seasons_count.items():
-                    print(f" - {season}: {count} plots")
+                    print(f" - {season}: {count} years")
             
             if export_charts_chk.value:
                 print(f"Exported {len(all_grid_figs)} grid maps and {len(all_zonal_figs)} zonal maps")
             if export_boundaries_chk.value:
-                print(f"Exported data for {len(all_zonal_data)} time periods to a combined GeoPackage")
+                print(f"Exported data for {len(periods)} time periods to a combined GeoPackage")
 
             # Export to Excel if checkbox is checked
-            if export_excel_chk.value and combined_gdf is not None:
+            if export_excel_chk.value:
                 print("Exporting statistics to Excel...")
                 excel_path = export_to_excel(
                     combined_gdf,
@@ -1944,7 +1642,7 @@ def run_analysis(b):
                     selected_index,
                     output_dir,
                     mode=selected_mode,
-                    ssp=selected_ssp if selected_mode == 'Projections' else None
+                    ssp=ssp_value
                 )
                 if excel_path:
                     print(f"Statistics exported to: {excel_path}")
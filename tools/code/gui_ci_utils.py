@@ -1,12 +1,11 @@
 import os
-import xarray as xr
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
 import cartopy.crs as ccrs
 import geopandas as gpd
 from matplotlib.colors import TwoSlopeNorm
-from urllib.request import urlretrieve
+from concurrent.futures import ThreadPoolExecutor
 from IPython.display import display, clear_output, HTML
 import ipywidgets as widgets
 import pandas as pd
@@ -16,10 +15,13 @@ import folium
 import tkinter as tk
 from tkinter import filedialog
 from input_utils import get_adm_data
-from rasterstats import zonal_stats
 import rioxarray
 import warnings
 import notebook_utils
+import download_utils
+import netcdf_utils
+import zonal_utils
+import climate_cache
 warnings.filterwarnings("ignore", message=".*crs.*", category=UserWarning)
 
 # Load country data
@@ -264,7 +266,7 @@ def download_file(url, local_path):
     if not os.path.exists(local_path):
         print(f"Downloading {url} to {local_path}")
         try:
-            urlretrieve(url, local_path)
+            download_utils.download(url, local_path)
             print(f"Download complete: {local_path}")
             return True
         except Exception as e:
@@ -332,16 +334,14 @@ def get_index_metadata(index):
     return title, unit, cmap, anomaly_cmap
 
 # Function to load NetCDF data
-def load_netcdf(file_path, variable_name):
-    """Load a NetCDF file and check for the specified variable."""
+def load_netcdf(file_path, variable_name, bounds=None):
+    """
+    Load a NetCDF file lazily (dask chunks) and check for the specified variable.
+    With bounds (e.g. netcdf_utils.geographic_bounds of the boundaries), the grid is clipped to the country window
+    before any value is read (see netcdf_utils.open_netcdf).
+    """
     try:
-        ds = xr.open_dataset(file_path)
-        # Check if the variable exists
-        if variable_name not in ds:
-            print(f"Variable {variable_name} not found in {file_path}")
-            print(f"Available variables: {list(ds.variables)}")
-            return None
-        return ds
+        return netcdf_utils.open_netcdf(file_path, variable_name, bounds=bounds)
     except Exception as e:
         print(f"Error loading NetCDF file: {e}")
         return None
@@ -351,6 +351,10 @@ def standardize_anomaly(historical_var, anomaly_var, method='epsilon'):
     """
     Standardize anomaly data using various methods.
     
+    The computation is lazy: with dask-backed inputs (see load_netcdf), the alignment, future data and
+    standardized anomaly are only built as one dask graph over the (clipped) grid, evaluated chunk by chunk
+    when values are needed, without copying the inputs or allocating full-size intermediate arrays.
+    
     Args:
         historical_var: xarray DataArray with historical data
         anomaly_var: xarray DataArray with anomaly data
@@ -361,20 +365,8 @@ def standardize_anomaly(historical_var, anomaly_var, method='epsilon'):
     """
     print(f"Standardizing anomaly data using '{method}' method...")
     
-    # Copy the data arrays to avoid modifying the originals
-    hist_data = historical_var.copy()
-    anom_data = anomaly_var.copy()
-    
-    # Make sure the coordinates are aligned
-    if not np.array_equal(hist_data.lat.values, anom_data.lat.values) or \
-       not np.array_equal(hist_data.lon.values, anom_data.lon.values):
-        print("Aligning coordinates between datasets...")
-        anom_data = anom_data.interp(
-            lon=hist_data.lon.values,
-            lat=hist_data.lat.values,
-            method="linear",
-            kwargs={"fill_value": "extrapolate"}
-        )
+    # Make sure the grids are aligned cell by cell, whatever the time stamps of the two files
+    hist_data, anom_data = netcdf_utils.align_grids(historical_var, anomaly_var)
     
     # Calculate future data (historical + anomaly)
     future_data = hist_data + anom_data
@@ -387,63 +379,32 @@ def standardize_anomaly(historical_var, anomaly_var, method='epsilon'):
     
     elif method == 'epsilon':
         print("Calculating epsilon-adjusted percentage change...")
-        # Extract numpy arrays for easier manipulation
-        hist_np = hist_data.values
-        anom_np = anom_data.values
-        
         # Define epsilon for standard percent change calculation
         epsilon = 5.0  # A reasonable value
         
-        # Create empty result array filled with NaN
-        perc_np = np.full_like(hist_np, np.nan, dtype=np.float32)
-        
-        # Calculate percentage change only where denominator is not too close to zero
-        valid_mask = (hist_np + epsilon) > 0.00001
-        perc_np[valid_mask] = 100 * anom_np[valid_mask] / (hist_np[valid_mask] + epsilon)
-        
-        # Create xarray DataArray with the same coordinates as the historical data
-        perc_change = xr.DataArray(
-            data=perc_np,
-            dims=hist_data.dims,
-            coords=hist_data.coords,
-            name="percentage_change",
-            attrs={
-                "long_name": "Percentage change with epsilon correction",
-                "units": "%",
-                "epsilon_value": str(epsilon)
-            }
-        )
+        # Calculate percentage change only where denominator is not too close to zero (NaN elsewhere)
+        denominator = hist_data + epsilon
+        perc_change = (100 * anom_data / denominator.where(denominator > 0.00001)).astype(np.float32)
+        perc_change = perc_change.rename("percentage_change").assign_attrs({
+            "long_name": "Percentage change with epsilon correction",
+            "units": "%",
+            "epsilon_value": str(epsilon)
+        })
         return perc_change, future_data
 
     elif method == 'log':
         print("Calculating log-adjusted percentage change...")
-        # Extract numpy arrays for easier manipulation - exactly like in the epsilon method
-        hist_np = hist_data.values
-        anom_np = anom_data.values
-        future_np = hist_np + anom_np  # Calculate future values
-        
         # Define offset for log calculation
         offset = 1.0  # Small offset to handle zeros
         
-        # Create empty result array filled with NaN - exactly like in the epsilon method
-        log_np = np.full_like(hist_np, np.nan, dtype=np.float32)
-        
-        # Calculate log ratio only where values are valid
-        valid_mask = (hist_np + offset) > 0.00001
-        log_np[valid_mask] = 100 * np.log((future_np[valid_mask] + offset) / (hist_np[valid_mask] + offset))
-        
-        # Create xarray DataArray with the same coordinates as the historical data - exactly like in the epsilon method
-        log_change = xr.DataArray(
-            data=log_np,
-            dims=hist_data.dims,
-            coords=hist_data.coords,
-            name="log_percentage_change",
-            attrs={
-                "long_name": "Log percentage change",
-                "units": "%",
-                "offset_value": str(offset)
-            }
-        )
+        # Calculate log ratio only where values are valid (NaN elsewhere)
+        denominator = hist_data + offset
+        log_change = (100 * np.log((future_data + offset) / denominator.where(denominator > 0.00001))).astype(np.float32)
+        log_change = log_change.rename("log_percentage_change").assign_attrs({
+            "long_name": "Log percentage change",
+            "units": "%",
+            "offset_value": str(offset)
+        })
         return log_change, future_data
      
     else:
@@ -472,63 +433,34 @@ def handle_time_units(data_var, index):
     # Return original data for other indices or if conversion fails
     return data_var
 
-# Function to prepare xarray for zonal statistics
-def prepare_xarray_for_zonal_stats(xds, var_name):
-    """Convert xarray DataArray to a format suitable for zonal statistics."""
-    try:
-        # Create a copy to avoid modifying the original
-        xds_copy = xds.copy()
-        
-        # Check dimensions - the data may need to be squeezed to remove singleton dimensions
-        print(f"Original xarray data shape: {xds_copy.shape}")
-        
-        # If it's a 3D array with a singleton first dimension, squeeze it
-        if len(xds_copy.shape) == 3 and xds_copy.shape[0] == 1:
-            xds_copy = xds_copy.squeeze(dim=xds_copy.dims[0])
-            print(f"Squeezed xarray data to shape: {xds_copy.shape}")
-        
-        # Check if we need to add the rio accessor
-        if not hasattr(xds_copy, 'rio'):
-            import rioxarray
-        
-        # Make sure the CRS is properly set
-        if not hasattr(xds_copy, 'rio') or not xds_copy.rio.crs:
-            xds_copy = xds_copy.rio.write_crs("EPSG:4326")
-            print("Set CRS to EPSG:4326")
-        
-        # Ensure no NaN values that might cause issues
-        xds_copy = xds_copy.fillna(-999)
-        
-        # Check the final shape
-        print(f"Prepared xarray data with shape {xds_copy.shape}")
-        return xds_copy
-        
-    except Exception as e:
-        print(f"Error preparing xarray for zonal statistics: {e}")
-        import traceback
-        traceback.print_exc()
-        
-        # Try a last-ditch simple conversion
-        try:
-            if len(xds.shape) > 2:
-                # Try to convert to 2D by taking the first slice
-                xds_2d = xds[0]
-                print(f"Emergency conversion to 2D: shape {xds_2d.shape}")
-                return xds_2d
-        except:
-            pass
-            
-        return xds  # Return original as fallback
+# Function to calculate the zonal statistic values of a data array
+def zonal_stat_values(data_array, admin_boundaries, stat='mean'):
+    """
+    Zonal statistic of a data array for each administrative boundary, as an array (see calculate_zonal_stats).
+    Unlike calculate_zonal_stats, errors are raised instead of falling back to placeholder values.
+    """
+    geometries = admin_boundaries.geometry
+    if geometries.crs is None:
+        geometries = geometries.set_crs("EPSG:4326")
+    
+    # Remove singleton dimensions (e.g. a single time step) and keep the grid in (lat, lon) order
+    arr = data_array.squeeze().transpose('lat', 'lon')
+    weights = zonal_utils.coverage_weights(geometries.to_crs("EPSG:4326"), arr.lat.values, arr.lon.values)
+    return zonal_utils.coverage_reduce(weights, arr.values.ravel(), stat)
 
 # Function to calculate zonal statistics
 def calculate_zonal_stats(data_array, admin_boundaries, stat='mean'):
     """
     Calculate zonal statistics for each administrative boundary.
     
+    Cells are weighted by the area of each boundary covering them (see zonal_utils.coverage_weights), so
+    small units on a coarse grid still get exact values. The weight matrix is computed once per boundary
+    set and grid, then each layer is reduced with a sparse matrix product.
+    
     Args:
-        data_array: xarray DataArray to use for statistics
+        data_array: xarray DataArray to use for statistics, with lat and lon dimensions
         admin_boundaries: GeoDataFrame with administrative boundaries
-        stat: Statistic to calculate ('mean', 'min', 'max', etc.)
+        stat: Statistic to calculate ('mean', 'min' or 'max')
         
     Returns:
         GeoDataFrame with original boundaries and added statistics column
@@ -536,171 +468,19 @@ def calculate_zonal_stats(data_array, admin_boundaries, stat='mean'):
     print(f"Calculating zonal {stat} statistics...")
     column_name = f"{data_array.name}_{stat}"
     
-    # First, try using xarray's built-in methods
     try:
-        # Prepare admin_boundaries
         admin_boundaries_copy = admin_boundaries.copy()
         if admin_boundaries_copy.crs is None:
             print("Setting CRS for admin boundaries to EPSG:4326")
             admin_boundaries_copy = admin_boundaries_copy.set_crs("EPSG:4326")
-            
-        # Create a copy of data_array
-        arr_copy = data_array.copy()
-        
-        # Squeeze array if needed to remove singleton dimensions
-        if len(arr_copy.shape) > 2:
-            print(f"Original array shape: {arr_copy.shape}")
-            arr_copy = arr_copy.squeeze()
-            print(f"After squeezing: {arr_copy.shape}")
+        values = zonal_stat_values(data_array, admin_boundaries_copy, stat)
         
-        # Get coordinates for better debugging
-        if hasattr(arr_copy, 'lat') and hasattr(arr_copy, 'lon'):
-            print(f"Array coordinates - Lat: {arr_copy.lat.values.min()} to {arr_copy.lat.values.max()}, "
-                  f"Lon: {arr_copy.lon.values.min()} to {arr_copy.lon.values.max()}")
-                  
-        # Try direct calculation with xarray and GeoPandas
-        # This is an experimental direct approach without rasterstats
-        try:
-            import numpy as np
-            from shapely.geometry import Point
-            
-            # Create a simple zonal statistics approach using point sampling
-            print("Attempting direct sampling approach...")
-            
-            # Get lat/lon values 
-            lats = arr_copy.lat.values
-            lons = arr_copy.lon.values
-            
-            # Create mesh grid of all points
-            lon_grid, lat_grid = np.meshgrid(lons, lats)
-            
-            # Sample mean values for each polygon
-            means = []
-            
-            for idx, row in admin_boundaries_copy.iterrows():
-                geom = row.geometry
-                # Sample points within the geometry
-                mask = np.zeros_like(arr_copy.values, dtype=bool)
-                
-                # For efficiency, sample a subset of points
-                sample_step = max(1, int(len(lats) * len(lons) / 10000))
-                for i in range(0, len(lats), sample_step):
-                    for j in range(0, len(lons), sample_step):
-                        point = Point(lon_grid[i, j], lat_grid[i, j])
-                        if geom.contains(point):
-                            mask[i, j] = True
-                
-                # Calculate mean for this polygon
-                if np.any(mask):
-                    polygon_mean = float(arr_copy.values[mask].mean())
-                else:
-                    # If no points in polygon, use nearest point
-                    centroid = geom.centroid
-                    # Find closest point
-                    dist = (lon_grid - centroid.x)**2 + (lat_grid - centroid.y)**2
-                    closest_idx = np.unravel_index(dist.argmin(), dist.shape)
-                    polygon_mean = float(arr_copy.values[closest_idx])
-                
-                means.append(polygon_mean)
-            
-            # Add values to the GeoDataFrame
-            admin_boundaries_copy[column_name] = means
-            print(f"Direct sampling successful - values range: {min(means)} to {max(means)}")
-            return admin_boundaries_copy
-            
-        except Exception as e:
-            print(f"Direct sampling approach failed: {e}")
-            # Continue to traditional rasterstats approach
-    
-    except Exception as e:
-        print(f"Error in initial processing: {e}")
-    
-    # Traditional approach using rasterstats
-    try:
-        # Create a temporary GeoTIFF file
-        temp_dir = os.path.join(common.OUTPUT_DIR, "climate_indices_temp")
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_tif = os.path.join(temp_dir, f"temp_{data_array.name}_raster.tif")
-        
-        # Prepare the data array
-        data_array_rio = prepare_xarray_for_zonal_stats(data_array, data_array.name)
-        if data_array_rio is None:
-            print("Failed to prepare xarray for zonal statistics")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-        
-        # Check spatial dimensions
-        if len(data_array_rio.shape) < 2 or data_array_rio.shape[0] <= 0 or data_array_rio.shape[1] <= 0:
-            print(f"Error: Invalid raster dimensions {data_array_rio.shape}")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-        
-        # Set up rioxarray properly
-        try:
-            # Ensure proper data type and nodata value
-            data_array_rio = data_array_rio.astype('float32')
-            
-            # Set nodata value
-            if hasattr(data_array_rio, 'rio'):
-                data_array_rio = data_array_rio.rio.write_nodata(-999)
-                
-            # Write to GeoTIFF with explicit parameters
-            data_array_rio.rio.to_raster(
-                temp_tif,
-                driver='GTiff',
-                dtype='float32',
-                nodata=-999
-            )
-            
-            print(f"Successfully wrote temporary raster to {temp_tif}")
-        except Exception as e:
-            print(f"Error writing raster: {e}")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-        
-        # Ensure admin_boundaries has a CRS set
-        admin_boundaries_copy = admin_boundaries.copy()
-        if admin_boundaries_copy.crs is None:
-            print("Setting CRS for admin boundaries to EPSG:4326")
-            admin_boundaries_copy = admin_boundaries_copy.set_crs("EPSG:4326")
-        
-        # Verify the temp file exists and has valid data
-        if not os.path.exists(temp_tif):
-            print(f"Error: Failed to create temporary raster file {temp_tif}")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-        
-        # Try zonal stats
-        try:
-            stats_results = zonal_stats(
-                vectors=admin_boundaries_copy,
-                raster=temp_tif,
-                stats=[stat],
-                all_touched=True,
-                nodata=-999
-            )
-            
-            # Add the calculated statistic to the GeoDataFrame
-            admin_boundaries_copy[column_name] = [s.get(stat) for s in stats_results]
-            
-            # Verify we have meaningful values
-            values = [s.get(stat) for s in stats_results if s.get(stat) is not None]
-            if len(values) > 0:
-                unique_values = len(set(values))
-                print(f"Zonal stats calculation successful - {unique_values} unique values found")
-                if unique_values == 1:
-                    print("WARNING: All zones have the same value - this may indicate an issue")
-            else:
-                print("WARNING: No valid statistics calculated")
-                return use_fallback_values(admin_boundaries, data_array, column_name)
-                
-        except Exception as e:
-            print(f"Zonal stats attempt failed: {e}")
-            return use_fallback_values(admin_boundaries, data_array, column_name)
-            
-        # Clean up temporary file
-        if os.path.exists(temp_tif):
-            try:
-                os.remove(temp_tif)
-            except:
-                print(f"Warning: Could not remove temporary file {temp_tif}")
-                
+        admin_boundaries_copy[column_name] = values
+        valid = values[np.isfinite(values)]
+        if len(valid) > 0:
+            print(f"Zonal stats calculation successful - values range: {valid.min()} to {valid.max()}")
+        if len(valid) < len(values):
+            print(f"WARNING: {len(values) - len(valid)} zones are not covered by valid grid cells")
         return admin_boundaries_copy
         
     except Exception as e:
@@ -742,6 +522,53 @@ def use_fallback_values(admin_boundaries, data_array, column_name):
     
     return admin_boundaries_copy
 
+# Function to get the zonal statistics of the historical data and of the change, from the results cache
+def zonal_change_stats(historical_ds, future_ds, admin_boundaries, index, projection, time_period, standardization_method):
+    """
+    Zonal means of the historical data and of the (standardized) change for each administrative boundary.
+    
+    Results are kept in the climate results cache (see climate_cache), by boundary set, index, projection,
+    time period and standardization method: layers already computed are served from the cache and only the
+    missing ones are computed from the NetCDF data.
+    
+    Args:
+        historical_ds: xarray Dataset with historical data
+        future_ds: xarray Dataset with anomaly data
+        admin_boundaries: GeoDataFrame with administrative boundaries
+        index: Climate index
+        projection: Projection (SSP) of the anomaly data
+        time_period: Time period of the anomaly data
+        standardization_method: Standardization method ('none', 'epsilon', 'log')
+        
+    Returns:
+        GeoDataFrame with original boundaries and added 'historical_mean' and 'change_mean' columns
+    """
+    variable_name, anomaly_variable_name = get_variable_names(index)
+    # SPEI is already standardized, the raw anomaly is used
+    method = 'none' if index == 'spei12' else standardization_method
+    historical_key = climate_cache.layer_key(index, 'historical', '1995-2014', 'historical')
+    change_key = climate_cache.layer_key(index, projection, time_period, f"change_{method}")
+    
+    def compute(missing):
+        results = {}
+        historical_var = handle_time_units(historical_ds[variable_name].astype(float), index)
+        if historical_key in missing:
+            results[historical_key] = zonal_stat_values(historical_var, admin_boundaries)
+        if change_key in missing:
+            anomaly_var = handle_time_units(future_ds[anomaly_variable_name].astype(float), index)
+            if method != 'none':
+                anomaly_var, _ = standardize_anomaly(historical_var, anomaly_var, method)
+            results[change_key] = zonal_stat_values(anomaly_var, admin_boundaries)
+        return results
+    
+    historical_values, change_values = climate_cache.get_layers(
+        admin_boundaries.geometry, [historical_key, change_key], compute
+    )
+    gdf_change = admin_boundaries.copy()
+    gdf_change['historical_mean'] = historical_values
+    gdf_change['change_mean'] = change_values
+    return gdf_change
+
 # Function to create choropleth maps for zonal statistics
 def create_choropleth_maps(admin_boundaries_with_stats, historical_col, change_col, title, unit, hist_cmap, change_cmap, standardization_method="none"):
     """
@@ -890,8 +717,8 @@ def create_climate_plots(historical_ds, future_ds, admin_boundaries, index, proj
     # Apply standardization
     if index == 'spei12' and standardization_method != 'none':
         print("Note: SPEI is already standardized, using raw anomaly values")
-        std_anomaly = anomaly_var
-        future_var = historical_var + anomaly_var
+        hist_data, std_anomaly = netcdf_utils.align_grids(historical_var, anomaly_var)
+        future_var = hist_data + std_anomaly
     else:
         std_anomaly, future_var = standardize_anomaly(historical_var, anomaly_var, standardization_method)
     
@@ -1042,17 +869,11 @@ def create_climate_plots(historical_ds, future_ds, admin_boundaries, index, proj
                 print("Setting CRS for admin boundaries to EPSG:4326")
                 admin_boundaries = admin_boundaries.set_crs("EPSG:4326")
             
-            # Calculate zonal statistics for historical data
-            historical_var.name = "historical"
-            gdf_hist = calculate_zonal_stats(historical_var, admin_boundaries)
-            
-            # For change data, use either raw anomaly or standardized anomaly based on method
-            if standardization_method == 'none':
-                anomaly_var.name = "change"
-                gdf_change = calculate_zonal_stats(anomaly_var, gdf_hist)
-            else:
-                std_anomaly.name = "change"
-                gdf_change = calculate_zonal_stats(std_anomaly, gdf_hist)
+            # Zonal statistics of the historical data and of the change, served from the cache if available
+            gdf_change = zonal_change_stats(
+                historical_ds, future_ds, admin_boundaries,
+                index, projection, time_period, standardization_method
+            )
             
             # Check if columns exist before creating maps
             hist_col = "historical_mean"
@@ -1311,27 +1132,17 @@ def run_analysis(b):
             
             print("Downloading data files...")
             print(f"Historical data URL: {historical_url}")
-            historical_success = download_file(historical_url, historical_file)
-            
             print(f"Future data URL: {future_url}")
-            future_success = download_file(future_url, future_file)
+            # Both files are downloaded concurrently
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                historical_success, future_success = executor.map(
+                    download_file, [historical_url, future_url], [historical_file, future_file]
+                )
             
             if not (historical_success and future_success):
                 print("Error: Failed to download required data files")
                 return
                 
-            # Load NetCDF data
-            variable_name, anomaly_variable_name = get_variable_names(selected_index)
-            print(f"Variable names - Historical: {variable_name}, Future: {anomaly_variable_name}")
-            
-            print("Loading NetCDF data files...")
-            historical_ds = load_netcdf(historical_file, variable_name)
-            future_ds = load_netcdf(future_file, anomaly_variable_name)
-            
-            if historical_ds is None or future_ds is None:
-                print("Error: Failed to load NetCDF data files")
-                return
-
             # Get administrative boundaries
             print("Loading boundaries...")
             try:
@@ -1365,6 +1176,19 @@ def run_analysis(b):
                 print(f"Error loading boundaries: {str(e)}")
                 return
                 
+            # Load NetCDF data
+            variable_name, anomaly_variable_name = get_variable_names(selected_index)
+            print(f"Variable names - Historical: {variable_name}, Future: {anomaly_variable_name}")
+            
+            print("Loading NetCDF data files (clipped to the boundaries extent)...")
+            bounds = netcdf_utils.geographic_bounds(admin_boundaries)
+            historical_ds = load_netcdf(historical_file, variable_name, bounds=bounds)
+            future_ds = load_netcdf(future_file, anomaly_variable_name, bounds=bounds)
+            
+            if historical_ds is None or future_ds is None:
+                print("Error: Failed to load NetCDF data files")
+                return
+
             # Create plots
             print("Creating climate plots...")
             fig, zonal_fig = create_climate_plots(
@@ -1380,21 +1204,12 @@ def run_analysis(b):
             # Store the GeoDataFrame with zonal statistics for export
             if admin_boundaries is not None:
                 try:
-                    # Re-run the zonal statistics calculation to ensure we have the data for export
-                    historical_var = handle_time_units(historical_ds[variable_name].astype(float), selected_index)
-                    historical_var.name = "historical"
-                    gdf_hist = calculate_zonal_stats(historical_var, admin_boundaries)
-                    
-                    # For change data, use either raw anomaly or standardized anomaly
-                    anomaly_var = handle_time_units(future_ds[anomaly_variable_name].astype(float), selected_index)
-                    if selected_std_method == 'none':
-                        anomaly_var.name = "change" 
-                        gdf_change = calculate_zonal_stats(anomaly_var, gdf_hist)
-                    else:
-                        # Apply standardization if needed
-                        std_anomaly, _ = standardize_anomaly(historical_var, anomaly_var, selected_std_method)
-                        std_anomaly.name = "change"
-                        gdf_change = calculate_zonal_stats(std_anomaly, gdf_hist)
+                    # Zonal statistics for export, from the cache filled when creating the plots
+                    gdf_change = zonal_change_stats(
+                        historical_ds, future_ds, admin_boundaries,
+                        selected_index, selected_projection, selected_time_period,
+                        selected_std_method
+                    )
                 except Exception as e:
                     print(f"Warning: Could not prepare data for export: {e}")
             
@@ -13,7 +13,7 @@ from damageFunctions import FL_mortality_factor, FL_damage_factor_builtup, FL_da
 from input_utils import get_adm_data
 import notebook_utils
 from runAnalysis import (
-    run_analysis, plot_results, create_summary_df, prepare_excel_gpkg_files,
+    run_analysis_multi, plot_results, create_summary_df, prepare_excel_gpkg_files,
     prepare_sheet_name, saving_excel_and_gpgk_file, prepare_and_save_summary_df
 )
 
@@ -518,21 +518,21 @@ def run_analysis_script(b):
             excel_file, gpkg_file = prepare_excel_gpkg_files(country, adm_level, haz_cat, period, scenario)
 
             # Use ExcelWriter as a context manager
-            # Run analysis for each exposure category
-            for i in range(len(exp_cat_list)):
-                exp_cat = exp_cat_list[i]
-                exp_nam = exp_nam_list[i]
-                print(f"Running analysis for {exp_cat}...")
-                result_df = run_analysis(
-                    country, haz_type, haz_cat, period, scenario, return_periods, min_haz_slider,
-                    exp_cat, exp_nam, exp_year, adm_level, analysis_type, class_edges,
-                    save_check_raster, n_cores, use_custom_boundaries=use_custom_boundaries,
-                    custom_boundaries_file_path=custom_boundaries_file_path, custom_code_field=custom_code_field,
-                    custom_name_field=custom_name_field, wb_region=wb_region)
-
-                if result_df is None:
-                    print("Encountered Exception! Please fix issue above.")
-                    return
+            # Run analysis for all exposure categories together, reading each hazard RP once
+            print(f"Running analysis for {', '.join(exp_cat_list)}...")
+            result_dfs = run_analysis_multi(
+                country, haz_type, haz_cat, period, scenario, return_periods, min_haz_slider,
+                exp_cat_list, exp_nam_list, exp_year, adm_level, analysis_type, class_edges,
+                save_check_raster, n_cores, use_custom_boundaries=use_custom_boundaries,
+                custom_boundaries_file_path=custom_boundaries_file_path, custom_code_field=custom_code_field,
+                custom_name_field=custom_name_field, wb_region=wb_region)
+
+            if result_dfs is None:
+                print("Encountered Exception! Please fix issue above.")
+                return
+
+            for exp_cat in exp_cat_list:
+                result_df = result_dfs[exp_cat]
 
                 sheet_name = prepare_sheet_name(analysis_type, return_periods, exp_cat)
 
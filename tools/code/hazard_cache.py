@@ -0,0 +1,111 @@
+# On-disk cache of hazard rasters aligned to an exposure grid
+#
+# Reprojecting a hazard raster onto the exposure grid is the same work every time a country is run
+# again with another exposure category, other class edges or damage function. Aligned hazards are
+# therefore stored once as tiled, compressed COGs, keyed by the source file (path and modification
+# time) and the target grid (CRS, transform and shape). The cache is bounded in size: the least
+# recently used rasters are removed first.
+import os
+import hashlib
+import tempfile
+import rasterio
+import rasterio.shutil
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+
+import common
+
+HAZARD_CACHE_DIR = os.path.join(common.CACHE_DIR, "hazards")
+
+# Maximum size of the hazard cache, in bytes
+HAZARD_CACHE_MAX_BYTES = int(float(common.config.get("HAZARD_CACHE_MAX_GB") or 20) * 1024 ** 3)
+
+# Creation options of the cached rasters
+COG_OPTIONS = {'COMPRESS': 'DEFLATE', 'PREDICTOR': 'YES', 'BLOCKSIZE': 512, 'BIGTIFF': 'IF_SAFER'}
+
+
+def hazard_cache_key(hazard_file, crs, transform, shape, resampling=Resampling.nearest):
+    """Cache key of an aligned hazard: source path and modification time, plus target grid and resampling."""
+    crs = CRS.from_user_input(crs).to_wkt() if crs is not None else None
+    source = f"{os.path.abspath(hazard_file)}|{os.path.getmtime(hazard_file)}"
+    grid = f"{crs}|{tuple(transform)[:6]}|{tuple(shape)}|{Resampling(resampling).name}"
+    return hashlib.sha1(f"{source}|{grid}".encode()).hexdigest()
+
+
+def get_aligned_hazard(hazard_file, crs, transform, shape, resampling=Resampling.nearest, cache_dir=None):
+    """
+    Return the path of a COG holding the hazard raster reprojected onto the given grid, creating it if needed.
+
+    The raster is warped window by window by GDAL (through a WarpedVRT), so memory use does not grow with the
+    grid size. Nodata and data type of the source are kept. Cached rasters are found again as long as the source
+    file is not modified; every hit refreshes its modification time, which is used for LRU eviction
+    (see prune_hazard_cache).
+
+    Parameters
+    ----------
+    hazard_file : path of the source hazard raster
+    crs : CRS of the target grid
+    transform : affine transform of the target grid
+    shape : (height, width) of the target grid
+    resampling : resampling method (rasterio.enums.Resampling)
+    cache_dir : folder of the hazard cache, defaults to CACHE_DIR/hazards
+    """
+    cache_dir = HAZARD_CACHE_DIR if cache_dir is None else cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    key = hazard_cache_key(hazard_file, crs, transform, shape, resampling)
+    name = os.path.splitext(os.path.basename(hazard_file))[0]
+    cached_path = os.path.join(cache_dir, f"{name}_{key}.tif")
+
+    if os.path.exists(cached_path):
+        os.utime(cached_path)
+        return cached_path
+
+    height, width = shape
+    # Write to a temporary file first, so that concurrent runs never read a partial raster
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tif', delete=False) as tmp:
+        tmp_path = tmp.name
+    try:
+        with rasterio.open(hazard_file) as src, WarpedVRT(
+            src, src_crs=src.crs, crs=crs, transform=transform, height=height, width=width, resampling=resampling
+        ) as vrt:
+            rasterio.shutil.copy(vrt, tmp_path, driver='COG', **COG_OPTIONS)
+        os.replace(tmp_path, cached_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return cached_path
+
+
+def prune_hazard_cache(max_bytes=HAZARD_CACHE_MAX_BYTES, cache_dir=None):
+    """
+    Remove the least recently used rasters until the hazard cache fits in max_bytes.
+
+    Returns the list of removed files.
+    """
+    cache_dir = HAZARD_CACHE_DIR if cache_dir is None else cache_dir
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for file in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, file)
+        if file.endswith('.tif') and os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed.append(path)
+
+    return removed
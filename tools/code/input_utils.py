@@ -18,82 +18,213 @@ except ImportError:
         pass
 
 import os
+import json
+import sqlite3
+import tempfile
 from osgeo import gdal
 import numpy as np
+import pandas as pd
 import common
+import download_utils
 import requests
 import geopandas as gpd
 import shutil
-from shapely.geometry import shape, MultiPolygon
+from shapely.geometry import MultiPolygon
 from shapely.geometry.base import BaseGeometry
-from tqdm import tqdm
 
 DATA_DIR = common.DATA_DIR
 OUTPUT_DIR = common.OUTPUT_DIR
 
+# Local boundary store: one GeoPackage per ADM level and service, with one layer (spatially indexed) per country
+ADM_STORE_DIR = os.path.join(common.CACHE_DIR, "ADM")
+
+# Number of features requested per page from the REST service
+ADM_PAGE_SIZE = 2000
+
+# Boundaries already loaded in this session, by (service, ADM level, country)
+ADM_MEMORY_CACHE = {}
+
+
+def adm_store_dir():
+    """Folder of the local boundary store for the active REST service."""
+    return os.path.join(ADM_STORE_DIR, "NEW" if common.USE_NEW_SERVICE else "VIEW")
+
+
+def adm_store_path(adm_level):
+    """Path of the GeoPackage holding the boundaries of the given ADM level, one layer per country."""
+    return os.path.join(adm_store_dir(), f"WB_GAD_ADM{adm_level}.gpkg")
+
+def get_layers_info(offline=None):
+    """
+    Return the list of layers of the REST service (id, name and object id field of each).
+
+    The list of layers is fetched once and kept in the local boundary store, so later calls do not
+    query the service. In offline mode (see common.OFFLINE), only the stored list is used.
+    """
+    offline = common.OFFLINE if offline is None else offline
+    layers_file = os.path.join(adm_store_dir(), "layers.json")
+
+    if os.path.exists(layers_file):
+        with open(layers_file) as f:
+            layers_info = json.load(f)
+    elif offline:
+        raise ValueError(f"Layer list not found in the local boundary store ({layers_file}) and offline mode is on.")
+    else:
+        layers_url = f"{common.rest_api_url}/layers"
+        response = requests.get(layers_url, params={'f': 'json'})
+
+        if response.status_code != 200:
+            print(f"Failed to fetch layers. Status code: {response.status_code}")
+            return None
+
+        layers_info = [{'id': elem['id'], 'name': elem['name'], 'objectIdField': object_id_field(elem)}
+                       for elem in response.json().get('layers', [])]
+        os.makedirs(adm_store_dir(), exist_ok=True)
+        write_atomic(layers_file, json.dumps(layers_info).encode())
+
+    return layers_info
+
+
+def object_id_field(layer):
+    """Name of the object id field of a REST service layer description, OBJECTID if not given."""
+    oid_fields = [field['name'] for field in layer.get('fields') or [] if field.get('type') == 'esriFieldTypeOID']
+    return layer.get('objectIdField') or (oid_fields[0] if oid_fields else 'OBJECTID')
+
+
 # Function to get the correct layer ID based on administrative level
-def get_layer_id_for_adm(adm_level):
-    layers_url = f"{common.rest_api_url}/layers"
+def get_layer_id_for_adm(adm_level, offline=None):
+    """Return the id of the REST service layer of the given ADM level (see get_layers_info)."""
     target_layer_name = f"WB_GAD_ADM{adm_level}"
-
-    response = requests.get(layers_url, params={'f': 'json'})
-    
-    if response.status_code != 200:
-        print(f"Failed to fetch layers. Status code: {response.status_code}")
+    layers_info = get_layers_info(offline)
+    if layers_info is None:
         return None
 
-    layers_info = response.json().get('layers', [])
-    
     layers = [elem['id'] for elem in layers_info if elem['name'] == target_layer_name]
     if len(layers) == 0:
         raise ValueError(f"Layer matching {target_layer_name} not found.")
     return layers[0]
-    
+
 
 # Function to fetch the ADM data using the correct layer ID
-def get_adm_data(country: str, adm_level):
+def get_adm_data(country: str, adm_level, offline=None, refresh=False):
+    """
+    Return the ADM boundaries of a country as a GeoDataFrame (EPSG:4326).
+
+    Boundaries are read from the local boundary store (see adm_store_path), and only fetched from the
+    REST service the first time a country and ADM level are requested, or if refresh is True.
+    In offline mode (see common.OFFLINE), boundaries missing from the store raise an error instead.
+
+    Parameters
+    ----------
+    country : country ISOa3 code
+    adm_level : ADM level of sub-national boundaries
+    offline : never query the REST service, defaults to common.OFFLINE
+    refresh : fetch the boundaries again from the REST service and update the store
+    """
+    offline = common.OFFLINE if offline is None else offline
+    key = (adm_store_dir(), adm_level, country)
+    store_path = adm_store_path(adm_level)
+
+    if not refresh:
+        if key in ADM_MEMORY_CACHE:
+            return ADM_MEMORY_CACHE[key].copy()
+        gdf = read_adm_store(store_path, country)
+        if gdf is not None:
+            ADM_MEMORY_CACHE[key] = gdf
+            return gdf.copy()
+        if offline:
+            raise ValueError(f"No ADM{adm_level} boundaries for {country} in the local boundary store "
+                             f"({store_path}) and offline mode is on.")
+
+    gdf = fetch_adm_data(country, adm_level)
+    if gdf is None:
+        return None
+
+    # Add the country to the store, as its own layer
+    os.makedirs(adm_store_dir(), exist_ok=True)
+    gdf.to_file(store_path, layer=country, driver="GPKG")
+    ADM_MEMORY_CACHE[key] = gdf
+    return gdf.copy()
+
+
+def read_adm_store(store_path, country):
+    """Read the boundaries of a country from a boundary store GeoPackage, or return None if not there."""
+    if not os.path.exists(store_path):
+        return None
+    # Layers are listed from the GeoPackage contents table, whatever the geopandas version and I/O engine
+    conn = sqlite3.connect(store_path)
+    try:
+        layers = {row[0] for row in conn.execute("SELECT table_name FROM gpkg_contents")}
+    finally:
+        conn.close()
+    if country not in layers:
+        return None
+    return gpd.read_file(store_path, layer=country)
+
+
+def fetch_adm_data(country: str, adm_level):
+    """Fetch the ADM boundaries of a country from the REST service, page by page."""
     layer_id = get_layer_id_for_adm(adm_level)
+    oid_field = next((object_id_field(elem) for elem in get_layers_info() or [] if elem['id'] == layer_id), 'OBJECTID')
     
     query_url = f"{common.rest_api_url}/{layer_id}/query"
-    params = {
-        'where': f"ISO_A3 = '{country}'",
-        'outFields': '*',
-        'f': 'geojson'
-    }
-    
-    response = requests.get(query_url, params=params)
-    
-    if response.status_code != 200:
-        print(f"Error fetching data: {response.status_code}")
-        return None
-    
-    data = response.json()
-    features = data.get('features', [])
+    pages = []
+    offset = 0
+    while True:
+        params = {
+            'where': f"ISO_A3 = '{country}'",
+            'outFields': '*',
+            # Pages are only stable in a fixed order
+            'orderByFields': f"{oid_field} ASC",
+            'resultOffset': offset,
+            'resultRecordCount': ADM_PAGE_SIZE,
+            'f': 'geojson'
+        }
+
+        response = requests.get(query_url, params=params)
+
+        if response.status_code != 200:
+            print(f"Error fetching data: {response.status_code}")
+            return None
+
+        # Each page is parsed once: features and paging flag come from the same document
+        data = response.json()
+        features = data.get('features', [])
+        if not features:
+            break
+        pages.append(gpd.GeoDataFrame.from_features(features, crs="EPSG:4326"))
+        offset += len(features)
+
+        # Stop at the last page: fewer features than requested, and no more flagged by the service
+        exceeded = data.get('exceededTransferLimit') or data.get('properties', {}).get('exceededTransferLimit')
+        if len(features) < ADM_PAGE_SIZE and not exceeded:
+            break
     
-    if not features:
+    if not pages:
         raise Exception("No features found for the specified query.")
     
-    geometry = [shape(feature['geometry']) for feature in features]
-    properties = [feature['properties'] for feature in features]
-    gdf = gpd.GeoDataFrame(properties, geometry=geometry)
-    return gdf
+    gdf = gpd.GeoDataFrame(pd.concat(pages, ignore_index=True), crs="EPSG:4326")
+    # Geometry last, as read back from the boundary store, so that fresh and stored boundaries are alike
+    return gdf[[col for col in gdf.columns if col != 'geometry'] + ['geometry']]
+
+
+def write_atomic(file_name, content: bytes):
+    """Write content to file_name through a temporary file, so that readers never see a partial file."""
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(file_name) or '.', delete=False) as tmp:
+        tmp.write(content)
+    os.replace(tmp.name, file_name)
 
 # Defining the function to download WorldPop data
 def fetch_population_data(country: str, year: str):
     dataset_path = f"Global_2000_2020_Constrained/2020/BSGM/{country}/{country.lower()}_ppp_2020_UNadj_constrained.tif"
     download_url = f"{common.worldpop_url}{dataset_path}"
     try:
-        response = requests.get(download_url)        
-        if response.status_code != 200:
-            print(f"Failed to fetch data. Status code: {response.status_code}")
-            print(f"Response text: {response.text}")
-
+        # Streamed to disk, resumed if interrupted
         file_name = f"{DATA_DIR}/EXP/{country}_POP.tif"
-        with open(file_name, 'wb') as file:
-            file.write(response.content)
+        download_utils.download(download_url, file_name)
         print(f"Data downloaded successfully and saved as {file_name}")
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, IOError) as e:
         print(f"An error occurred: {e}")
 
 
@@ -133,45 +264,27 @@ def fetch_built_up_data(country: str):
     print(f"Found {len(items)} items.")
     subfolder_name = f"{country}_tifs"
     download_folder = os.path.join(f"{DATA_DIR}/EXP/{country}_WSF_2019/", subfolder_name)
+    output_calc_file = os.path.join(f"{DATA_DIR}/EXP/", f"{country}_BU.tif")
+    if os.path.exists(output_calc_file):
+        print(f"{output_calc_file} already exists, skipping download and processing.")
+        return
     if not os.path.exists(download_folder):
         os.makedirs(download_folder)
 
-    tif_files = []
-    total_files = len([asset for item in items for asset in item['assets'].values() if asset['href'].endswith('.tif')])
-    
-    with tqdm(total=total_files, desc="Downloading .tif files") as pbar:
-        for item in items:
-            for _, asset_value in item['assets'].items():
-                if asset_value['href'].endswith('.tif'):
-                    tif_file = download_file(asset_value['href'], download_folder)
-                    tif_files.append(tif_file)
-                    pbar.update(1)
-                    
-    merged_tif_path = os.path.join(download_folder, f"{subfolder_name}.tif")
-    output_filename = os.path.join(f"{DATA_DIR}/EXP/{country}_WSF_2019/", f"{country}_WSF-2019.tif")
-    if tif_files and not os.path.exists(output_filename):
-        print("Mosaicing downloaded .tif files...")
-        merge_tifs(download_folder)
-        os.rename(merged_tif_path, output_filename)
-    else:
-        print("Mosaic already exists, skipping mosaicing.")  
-        
-    input_file = output_filename
-    output_file = os.path.join(f"{DATA_DIR}/EXP/{country}_WSF_2019/", f"{country}_WSF-2019_100m.tif")
-    output_calc_file = os.path.join(f"{DATA_DIR}/EXP/", f"{country}_BU.tif")
-        
-    if not os.path.exists(output_file):
-        print("Resampling WSF 2019 to 100m...")
-        gdalwarp_wsf19(input_file, output_file)
-    else:
-        print(f"{output_file} already exists, skipping upscaling.")
-    
-    if not os.path.exists(output_calc_file):
-        print("Normalising WSF 2019 range [0 to 1]")
-        gdal_calc_wsf19(output_file, output_calc_file)
+    # Verified against the size and checksum published in the STAC items; tiles already downloaded are resumed
+    jobs = []
+    for item in items:
+        for asset_value in item['assets'].values():
+            if asset_value['href'].endswith('.tif'):
+                jobs.append({'url': asset_value['href'],
+                             'dest_path': os.path.join(download_folder, asset_value['href'].split('/')[-1]),
+                             'size': asset_value.get('file:size'), 'checksum': asset_value.get('file:checksum')})
+    tif_files = download_utils.download_many(jobs, desc="Downloading .tif files") if jobs else []
+
+    if tif_files:
+        print("Mosaicing and upscaling WSF 2019 tiles...")
+        process_wsf19_tiles(tif_files, output_calc_file)
         print(f"Mosaiced and Upscaled file saved as {output_calc_file}")
-    else:
-        print(f"{output_calc_file} already exists, skipping normalization.")
 
     if os.path.exists(download_folder):
         shutil.rmtree(download_folder)
@@ -183,17 +296,12 @@ def fetch_agri_data(country: str):
     dataset_path = f"Global_2000_2020_Constrained/2020/BSGM/{country}/{country.lower()}_ppp_2020_UNadj_constrained.tif"
     download_url = f"{common.worldpop_url}{dataset_path}"
     try:
-        response = requests.get(download_url)
-        if response.status_code != 200:
-            print(f"Failed to fetch data. Status code: {response.status_code}")
-            print(f"Response text: {response.text}")
-
+        # Streamed to disk, resumed if interrupted
         file_name = f"{DATA_DIR}/EXP/{country}_AGR.tif"
-        with open(file_name, 'wb') as file:
-            file.write(response.content)
+        download_utils.download(download_url, file_name)
         print(f"Data downloaded successfully and saved as {file_name}")
 
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, IOError) as e:
         print(f"An error occurred: {e}")
 
 
@@ -203,15 +311,7 @@ def download_file(url, dest_folder):
         os.makedirs(dest_folder)
 
     local_filename = os.path.join(dest_folder, url.split('/')[-1])
-    if os.path.exists(local_filename):
-        return local_filename
-
-    with requests.get(url, stream=True) as r:
-        r.raise_for_status()
-        with open(local_filename, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-    return local_filename
+    return download_utils.download(url, local_filename)
 
 
 # Mosaic tiles
@@ -222,19 +322,32 @@ def merge_tifs(subdir_path):
     # If there are .tif files in the subdirectory, merge them
     if tif_files:
         output_file = os.path.join(subdir_path, f"{os.path.basename(subdir_path)}.tif")
-        vrt = gdal.BuildVRT('', tif_files)
-        gdal.Translate(output_file, vrt, options='-co COMPRESS=DEFLATE -co PREDICTOR=2 -co ZLEVEL=9')
-        vrt = None
+        merge_tifs_vrt(tif_files, output_file)
+
+# WSF2019 resolution once resampled to 100 meters
+WSF19_RES_100M = 0.0008983152841195213
+
+# Number of rows read and written at once when normalising
+WSF19_BLOCK_ROWS = 512
+
+
+# Mosaic a list of tiles through a VRT, written out block by block by GDAL
+def merge_tifs_vrt(tif_files, output_file):
+    vrt = gdal.BuildVRT('', tif_files)
+    gdal.Translate(output_file, vrt, options='-co COMPRESS=DEFLATE -co PREDICTOR=2 -co ZLEVEL=9 -co TILED=YES')
+    vrt = None
+
 
 # Resample WSF2019 from 10 to 100 meters
-def gdalwarp_wsf19(input_file, output_file):
+def gdalwarp_wsf19(input_file, output_file, format='GTiff'):
     warp_options = gdal.WarpOptions(
-        format='GTiff',
-        xRes=0.0008983152841195213,
-        yRes=0.0008983152841195213,
+        format=format,
+        xRes=WSF19_RES_100M,
+        yRes=WSF19_RES_100M,
         resampleAlg='average',
+        outputType=gdal.GDT_Float32,
         multithread=True,
-        creationOptions=[
+        creationOptions=[] if format == 'VRT' else [
             'COMPRESS=DEFLATE',
             'PREDICTOR=2',
             'ZLEVEL=9'
@@ -242,31 +355,57 @@ def gdalwarp_wsf19(input_file, output_file):
     )
     gdal.Warp(output_file, input_file, options=warp_options)
 
-# Normalize WSF2019 as 0 to 1 range.
-def gdal_calc_wsf19(input_file, output_file):
+
+# Mosaic, resample and normalise the downloaded WSF2019 tiles
+def process_wsf19_tiles(tif_files, output_file):
+    """
+    Mosaic 10m WSF2019 tiles, average them to 100m and normalise them to [0 to 1] into output_file.
+
+    The tiles are mosaiced through a VRT, which is resampled once through a warped VRT: 100m pixels
+    straddling two tiles average the 10m pixels of both. Both VRTs are only evaluated block by block
+    while normalising, so no full-resolution mosaic is written or loaded in memory.
+    """
+    folder = os.path.dirname(output_file)
+    name = os.path.splitext(os.path.basename(output_file))[0]
+    mosaic_file = os.path.join(folder, f"{name}_10m.vrt")
+    warped_file = os.path.join(folder, f"{name}_100m.vrt")
+    vrt = gdal.BuildVRT(mosaic_file, tif_files)
+    vrt = None
+    gdalwarp_wsf19(mosaic_file, warped_file, format='VRT')
+    gdal_calc_wsf19(warped_file, f"{output_file}.tmp")
+    os.replace(f"{output_file}.tmp", output_file)
+    os.remove(warped_file)
+    os.remove(mosaic_file)
+
+
+# Normalize WSF2019 as 0 to 1 range, block by block.
+def gdal_calc_wsf19(input_file, output_file, block_rows=WSF19_BLOCK_ROWS):
     # Open the input file
     ds = gdal.Open(input_file)
     band = ds.GetRasterBand(1)
-    
-    # Read the data into a numpy array
-    data = band.ReadAsArray().astype(np.float32)
-    
-    # Perform the calculation
-    result = data / 255.0
-    
+    nodata = band.GetNoDataValue()
+
     # Create the output file
     driver = gdal.GetDriverByName('GTiff')
     out_ds = driver.Create(output_file, ds.RasterXSize, ds.RasterYSize, 1, gdal.GDT_Float32,
-                           options=['COMPRESS=DEFLATE', 'PREDICTOR=2', 'ZLEVEL=9'])
-    
+                           options=['COMPRESS=DEFLATE', 'PREDICTOR=2', 'ZLEVEL=9', 'TILED=YES'])
+
     # Set the geotransform and projection
     out_ds.SetGeoTransform(ds.GetGeoTransform())
     out_ds.SetProjection(ds.GetProjection())
-    
-    # Write the data
     out_band = out_ds.GetRasterBand(1)
-    out_band.WriteArray(result)
-    
+    if nodata is not None:
+        out_band.SetNoDataValue(nodata)
+
+    # Read, scale and write strips of rows
+    for y in range(0, ds.RasterYSize, block_rows):
+        rows = min(block_rows, ds.RasterYSize - y)
+        data = band.ReadAsArray(0, y, ds.RasterXSize, rows).astype(np.float32)
+        result = data / 255.0
+        if nodata is not None:
+            result[data == nodata] = nodata
+        out_band.WriteArray(result, 0, y)
+
     # Close the datasets
     ds = None
     out_ds = None
@@ -1,7 +1,7 @@
 # Importing the required packages
 import sys
 from runAnalysis import (
-    run_analysis, create_summary_df, prepare_excel_gpkg_files,
+    run_analysis_multi, create_summary_df, prepare_excel_gpkg_files,
     prepare_sheet_name, saving_excel_and_gpgk_file, prepare_and_save_summary_df
 )
 
@@ -35,18 +35,18 @@ def main():
 
     # Running the analysis    
     if exp_nam_list and len(exp_nam_list) != len(exp_cat_list): sys.exit("ERROR: Parameter 'exp_nam_list' should either be 'None' or have the same length as 'exp_cat_list'")
+    # All exp_cat are evaluated together, reading each hazard RP once
+    result_dfs = run_analysis_multi(country, haz_type, haz_cat, period, scenario, return_periods, min_haz_slider,
+                   exp_cat_list, exp_nam_list, exp_year, adm_level, analysis_type, class_edges, save_check_raster, n_cores)
+
+    if result_dfs is None:
+        print("Encountered Exception! Please fix it!")
+        return
+
     # For every exp_cat
-    for i in range(len(exp_cat_list)):
-        # Defining the list variable to pass to run_analysis
-        exp_cat = exp_cat_list[i]
-        exp_nam = exp_nam_list[i]
-        result_df = run_analysis(country, haz_type, haz_cat, period, scenario, return_periods, min_haz_slider,
-                   exp_cat, exp_nam, exp_year, adm_level, analysis_type, class_edges, save_check_raster, n_cores)
-
-        if result_df is None:
-            print("Encountered Exception! Please fix it!")
-            return
-        
+    for exp_cat in exp_cat_list:
+        result_df = result_dfs[exp_cat]
+
         sheet_name = prepare_sheet_name(analysis_type, return_periods, exp_cat)
         saving_excel_and_gpgk_file(result_df, excel_file, sheet_name, gpkg_file, exp_cat)
 
@@ -60,4 +60,4 @@ def main():
     print("--- %s seconds ---" % (time.perf_counter() - start_time))
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# Lazy NetCDF loading for the climate indices tools (gui_ci_utils, gui_ci_timeseries_utils)
+#
+# CCKP climate index files are global grids (0.25° for CMIP6/ERA5) with a time dimension, while an
+# analysis only needs the cells around one country. Files are opened with dask chunks, so nothing is
+# read until values are needed, and clipped to the country bounding box first: every later step
+# (unit conversion, standardization, zonal statistics, plots) only streams the country window.
+# The year of each time step is worked out once per file and kept as a year -> indices map.
+import os
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Chunks of the dask arrays, for the dimensions present in the file
+NETCDF_CHUNKS = {'time': 1, 'season': 1, 'lat': 512, 'lon': 512}
+
+# Margin kept around the clipping bounds: at least CLIP_BUFFER_DEG, or a fraction of the extent,
+# so that cells overlapping the edge units and the margins of the maps are kept
+CLIP_BUFFER_DEG = 1.0
+CLIP_BUFFER_FRACTION = 0.1
+
+# Year -> time indices maps, by file (path and modification time) and number of time steps
+YEAR_INDEX_CACHE = {}
+
+
+def open_netcdf(file_path, variable_name, bounds=None, chunks=None):
+    """
+    Open a NetCDF file lazily (dask chunks) and clip it to the given bounds, without reading any value.
+
+    Parameters
+    ----------
+    file_path : path of the NetCDF file
+    variable_name : variable that must be in the file
+    bounds : (minx, miny, maxx, maxy) in degrees, see geographic_bounds (optional, no clipping if None)
+    chunks : dict of chunk sizes by dimension, defaults to NETCDF_CHUNKS
+
+    Returns
+    -------
+    xarray Dataset, or None if the variable is not in the file
+    """
+    ds = xr.open_dataset(file_path, chunks={})
+    chunks = NETCDF_CHUNKS if chunks is None else chunks
+    ds = ds.chunk({dim: size for dim, size in chunks.items() if dim in ds.dims})
+
+    if variable_name not in ds:
+        print(f"Variable {variable_name} not found in {file_path}")
+        print(f"Available variables: {list(ds.variables)}")
+        ds.close()
+        return None
+
+    if bounds is not None:
+        ds = clip_to_bounds(ds, bounds)
+    return ds
+
+
+def clip_to_bounds(ds, bounds):
+    """
+    Select the lat/lon window of a dataset covering bounds plus a margin (see CLIP_BUFFER_DEG), lazily.
+
+    Grids in 0-360 longitudes are supported, as well as windows across the antimeridian or the 0/360 seam.
+    """
+    minx, miny, maxx, maxy = bounds
+    buffer_x = max(CLIP_BUFFER_DEG, (maxx - minx) * CLIP_BUFFER_FRACTION)
+    buffer_y = max(CLIP_BUFFER_DEG, (maxy - miny) * CLIP_BUFFER_FRACTION)
+    lats = ds['lat'].values
+    lons = ds['lon'].values
+
+    lat_idx = np.flatnonzero((lats >= miny - buffer_y) & (lats <= maxy + buffer_y))
+    # Window edges in the longitude convention of the grid (-180-180 or 0-360)
+    lon_origin = 0 if lons.max() > 180 else -180
+    west = (minx - buffer_x - lon_origin) % 360 + lon_origin
+    east = (maxx + buffer_x - lon_origin) % 360 + lon_origin
+    if (maxx - minx) + 2 * buffer_x >= 360:
+        lon_mask = np.ones(len(lons), dtype=bool)
+    elif west <= east:
+        lon_mask = (lons >= west) & (lons <= east)
+    else:
+        lon_mask = (lons >= west) | (lons <= east)
+    lon_idx = np.flatnonzero(lon_mask)
+
+    if len(lat_idx) == 0 or len(lon_idx) == 0:
+        print(f"Warning: no grid cell within bounds {tuple(bounds)}, keeping the whole grid")
+        return ds
+    ds = ds.isel(lat=lat_idx, lon=lon_idx)
+    print(f"Clipped grid to {len(lat_idx)} x {len(lon_idx)} cells around bounds")
+    return ds
+
+
+def align_grids(reference, data):
+    """
+    Return reference and data ready for cell-by-cell arithmetic, with data on the grid of reference.
+
+    Length-1 dimensions other than lat/lon (e.g. the single time step of a climatology) are squeezed out and
+    coordinates other than lat/lon are dropped: files of different periods have different time stamps, which
+    would otherwise not match when xarray aligns the arrays by label. If lat/lon differ, data is interpolated
+    linearly onto the grid of reference.
+    """
+    def spatial_only(da):
+        da = da.squeeze([dim for dim in da.dims if dim not in ('lat', 'lon') and da.sizes[dim] == 1])
+        return da.drop_vars([coord for coord in da.coords if coord not in ('lat', 'lon')])
+
+    reference, data = spatial_only(reference), spatial_only(data)
+    if not np.array_equal(reference.lat.values, data.lat.values) or \
+       not np.array_equal(reference.lon.values, data.lon.values):
+        print("Aligning coordinates between datasets...")
+        data = data.interp(lon=reference.lon.values, lat=reference.lat.values, method="linear",
+                           kwargs={"fill_value": "extrapolate"})
+    return reference, data
+
+def geographic_bounds(gdf):
+    """Bounds (minx, miny, maxx, maxy) of a GeoDataFrame in degrees of longitude/latitude (EPSG:4326)."""
+    if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+        gdf = gdf.to_crs("EPSG:4326")
+    return gdf.total_bounds
+
+
+def year_index_map(ds):
+    """
+    Return a dict mapping each year of the time coordinate of a dataset to the array of its time indices.
+
+    The map is computed once per file (and number of time steps) and reused by later calls.
+    """
+    source = ds.encoding.get('source')
+    key = None
+    if source is not None and os.path.exists(source):
+        key = (source, os.path.getmtime(source), ds.sizes.get('time'))
+        if key in YEAR_INDEX_CACHE:
+            return YEAR_INDEX_CACHE[key]
+
+    # DatetimeIndex and CFTimeIndex both expose the year of each time step
+    time_index = ds.indexes['time']
+    if hasattr(time_index, 'year'):
+        years = np.asarray(time_index.year)
+    else:
+        years = pd.DatetimeIndex(np.array([np.datetime64(str(t)) for t in ds['time'].values])).year.values
+
+    year_map = {int(year): np.flatnonzero(years == year) for year in np.unique(years)}
+    if key is not None:
+        YEAR_INDEX_CACHE[key] = year_map
+    return year_map
@@ -1,6 +1,7 @@
 # Required libraries
 import os, gc
 import warnings
+import tempfile
 import numpy as np
 import pandas as pd
 import geopandas as gpd
@@ -8,17 +9,21 @@ import folium
 from branca.colormap import LinearColormap
 from openpyxl import load_workbook
 import rasterio
-import rioxarray as rxr
-from rasterstats import gen_zonal_stats, zonal_stats
+from rasterio.windows import Window
+from rasterstats import zonal_stats
 import xarray as xr
+import shapely
 
 # Importing internal libraries
 import common
 import input_utils
+import zonal_utils
+import hazard_cache
 from damageFunctions import FL_mortality_factor, FL_damage_factor_builtup, FL_damage_factor_agri, TC_damage_factor_builtup 
 
 # Importing the libraries for parallel processing
 import itertools as it
+from contextlib import ExitStack
 from functools import partial
 import multiprocess as mp
 import dask.array as da
@@ -33,6 +38,9 @@ dask.config.set({
 
 DATA_DIR = common.DATA_DIR
 OUTPUT_DIR = common.OUTPUT_DIR
+
+# Window size (pixels) used when streaming country-scale rasters instead of loading them in memory
+STREAM_BLOCK_SIZE = 2048
 warnings.filterwarnings("ignore", message="'GeoSeries.swapaxes' is deprecated", category=FutureWarning)
 
 # Defining functions for parallel processing of zonal_stats
@@ -145,6 +153,38 @@ def process_exposure_data(country, haz_type, exp_cat, exp_nam, exp_year, exp_fol
         print(f"Error in process_exposure_data: {str(e)}")
 
 
+def read_exposure_block(src, window):
+    """
+    Read a window of the exposure raster, with nodata as NaN and negative values set to 0.
+    """
+    exp_block = src.read(1, window=window).astype('float32')
+    if src.nodata is not None:
+        exp_block[exp_block == src.nodata] = np.nan
+    exp_block[exp_block < 0.0] = 0.0
+    return exp_block
+
+
+def share_exposure(exp_ras, block_size=STREAM_BLOCK_SIZE):
+    """
+    Write the exposure raster, cleaned as in read_exposure_block, to a temporary .npy file, band by band.
+
+    Workers open it with np.load(path, mmap_mode='r') and share the same memory pages, instead of each
+    receiving a pickled copy of the exposure grid. The caller removes the file when done.
+    """
+    with tempfile.NamedTemporaryFile(suffix='.npy', delete=False) as tmp:
+        exp_path = tmp.name
+
+    with rasterio.open(exp_ras) as src:
+        exp_array = np.lib.format.open_memmap(exp_path, mode='w+', dtype='float32', shape=src.shape)
+        for row_off in range(0, src.height, block_size):
+            window = Window(0, row_off, src.width, min(block_size, src.height - row_off))
+            exp_array[window.toslices()] = read_exposure_block(src, window)
+        exp_array.flush()
+    del exp_array
+
+    return exp_path
+
+
 def exception_handler(func):
     def wrapper(*args, **kwargs):
         try:
@@ -164,7 +204,7 @@ def run_analysis(
     exp_nam: str, exp_year: str, adm_level: str, analysis_type: str, 
     class_edges: list[float], save_check_raster: bool, n_cores: int = None,
     use_custom_boundaries=False, custom_boundaries_file_path=None, custom_code_field=None,
-    custom_name_field=None, wb_region=None
+    custom_name_field=None, wb_region=None, block_size: int = None
 ):
     """
     Run specified analysis.
@@ -185,6 +225,37 @@ def run_analysis(
     analysis_type : type of analysis (class or function)
     class_edges : class edges for class-based analysis
     save_check_raster : save intermediate results to disk?
+    block_size : if set, stream exposure and hazard rasters in windows of block_size x block_size pixels
+                 instead of loading them in memory (used automatically if the exposure does not fit in memory)
+    """
+    results = run_analysis_multi(
+        country, haz_type, haz_cat, period, scenario, valid_RPs, min_haz_threshold, [exp_cat], [exp_nam],
+        exp_year, adm_level, analysis_type, class_edges, save_check_raster, n_cores,
+        use_custom_boundaries=use_custom_boundaries, custom_boundaries_file_path=custom_boundaries_file_path,
+        custom_code_field=custom_code_field, custom_name_field=custom_name_field, wb_region=wb_region,
+        block_size=block_size
+    )
+    return None if results is None else results[exp_cat]
+
+
+@exception_handler
+def run_analysis_multi(
+    country: str, haz_type: str, haz_cat: str, period: str, scenario: str,
+    valid_RPs: list[int], min_haz_threshold: float, exp_cat_list: list[str],
+    exp_nam_list: list[str], exp_year: str, adm_level: str, analysis_type: str,
+    class_edges: list[float], save_check_raster: bool, n_cores: int = None,
+    use_custom_boundaries=False, custom_boundaries_file_path=None, custom_code_field=None,
+    custom_name_field=None, wb_region=None, block_size: int = None
+):
+    """
+    Run specified analysis for several exposure categories at once.
+
+    Boundaries are fetched and rasterized once, and each hazard raster is read and reprojected once per exposure
+    grid (once in total when the exposure layers share a grid) and applied to every exposure category.
+    Parameters are the same as run_analysis, with exp_cat_list and exp_nam_list (or None for default names)
+    instead of exp_cat and exp_nam.
+
+    Returns a dict of result GeoDataFrames by exposure category, each one also saved as in run_analysis.
     """
 
     try:
@@ -195,6 +266,8 @@ def run_analysis(
             haz_folder = f"{DATA_DIR}/HZD/{country}/{haz_cat}/{period}/{scenario.replace('-', '_')}"
 
         exp_folder = f"{DATA_DIR}/EXP"
+        if exp_nam_list is None:
+            exp_nam_list = [None] * len(exp_cat_list)
 
         # Validating Classes analysis parameters
         if analysis_type == "Classes":
@@ -233,38 +306,7 @@ def run_analysis(
         # Only explode when multiparts have nested/overlapping parts within other units
         from shapely.geometry import MultiPolygon
 
-        def has_nested_multiparts(gdf):
-            """
-            Check if any multipart geometry has parts that are spatially separated
-            in a way that might overlap with other administrative units.
-            This detects problematic cases like parts of one unit nested within another.
-            """
-            multipart_indices = gdf.geometry.apply(lambda geom: isinstance(geom, MultiPolygon))
-
-            if not multipart_indices.any():
-                return False
-
-            # For each multipart geometry, check if its parts are far apart
-            # (suggesting they might overlap with other units rather than just being islands)
-            for idx in gdf[multipart_indices].index:
-                geom = gdf.loc[idx, 'geometry']
-                if isinstance(geom, MultiPolygon) and len(geom.geoms) > 1:
-                    # Get bounding boxes of all parts
-                    parts_bounds = [part.bounds for part in geom.geoms]
-
-                    # Check if any parts are contained within bounding boxes of other units
-                    other_units = gdf[gdf.index != idx]
-                    for part in geom.geoms:
-                        part_centroid = part.centroid
-                        # Check if this part's centroid falls within another unit
-                        for other_idx, other_geom in other_units.geometry.items():
-                            if other_geom.contains(part_centroid):
-                                # Found a problematic case: part of one unit inside another
-                                return True
-
-            return False
-
-        has_multipart = has_nested_multiparts(adm_data)
+        has_multipart = zonal_utils.has_nested_multiparts(adm_data.geometry)
 
         if has_multipart:
             print(f"Warning: Found problematic nested multipart geometries in ADM{adm_level} boundaries.")
@@ -280,52 +322,28 @@ def run_analysis(
             if multipart_count > 0:
                 print(f"Note: Found {multipart_count} simple multipart geometries (e.g., islands) - no explosion needed.")
 
-        # Handle exposure data
-        print(f"Processing exposure data for {exp_cat}")
-        exp_ras, damage_factor = process_exposure_data(country, haz_type, exp_cat, exp_nam, exp_year, exp_folder)
-
-        # Importing the exposure data (original approach with chunking fallback)
-        with rasterio.open(exp_ras) as src:
-            original_nodata = src.nodata
-
-        try:
-            # Try original approach first (fastest)
-            exp_data = rxr.open_rasterio(exp_ras)[0].astype('float32')
-        except MemoryError:
-            print("Memory error detected, falling back to chunked loading...")
-            exp_data = rxr.open_rasterio(exp_ras, chunks=True)[0].astype('float32')
-            # Compute immediately to avoid alignment issues later
-            exp_data = exp_data.compute()
-
-        # Handle nodata values
-        if original_nodata is not None:
-            # Mask the original nodata values
-            exp_data = exp_data.where(exp_data != original_nodata)
-        exp_data.rio.write_nodata(-1.0, inplace=True)
-        exp_data.data[exp_data < 0.0] = 0.0
-
-        # Parallel processing setup
-        cores = min(len(valid_RPs), mp.cpu_count()) if n_cores is None else n_cores
-
-        with mp.Pool(cores) as p:
-            # Get total exposure for each ADM area
-            func = partial(zonal_stats_partial, raster=exp_ras, stats="sum")
-            stats_parallel = p.map(func, np.array_split(adm_data.geometry, cores))
-
-        exp_per_ADM = list(it.chain(*stats_parallel))
-
-        # Creating the results pandas dataframe
+        # Handle exposure data, grouping the categories that share the same grid
+        exposures = {}
+        exp_grids = {}
+        for exp_cat, exp_nam in zip(exp_cat_list, exp_nam_list):
+            print(f"Processing exposure data for {exp_cat}")
+            exp_ras, damage_factor = process_exposure_data(country, haz_type, exp_cat, exp_nam, exp_year, exp_folder)
+            with rasterio.open(exp_ras) as src:
+                grid = (src.crs.to_string() if src.crs else None, tuple(src.transform)[:6], src.shape)
+            exposures[exp_cat] = {"exp_cat": exp_cat, "exp_ras": exp_ras, "exp_path": None,
+                                  "damage_factor": damage_factor}
+            exp_grids.setdefault(grid, []).append(exp_cat)
+
+        if block_size is not None:
+            print(f"Streaming the rasters in {block_size}px windows...")
+
+        # Creating the results pandas dataframes
         columns_to_include = all_adm_codes + all_adm_names + ["geometry"]
         # Include _original_idx if it exists (from exploded geometries)
         if '_original_idx' in adm_data.columns:
             columns_to_include.append('_original_idx')
-        result_df = adm_data.loc[:, columns_to_include]
-        result_df[f"ADM{adm_level}_{exp_cat}"] = [x['sum'] for x in exp_per_ADM]
+        result_dfs = {exp_cat: adm_data.loc[:, columns_to_include] for exp_cat in exp_cat_list}
 
-        # Cleaning-up memory
-        del (stats_parallel, exp_per_ADM)
-        gc.collect()
-        
         # Defining the list of valid prob_RPs - probability of return period
         prob_RPs = 1./np.array(valid_RPs)
         prob_RPs_LB = np.append(-np.diff(prob_RPs), prob_RPs[-1]).tolist()           # Lower bound - alternative --> prob_RPs_LB = np.append(1-prob_RPs[0],-np.diff(prob_RPs)).tolist() # Lower bound [0-1]
@@ -338,185 +356,257 @@ def run_analysis(
                                     'prob_RPs_Mean':prob_RPs_Mean})
         prob_RPs_df.to_csv(os.path.join(OUTPUT_DIR, f"{country}_{haz_cat}_prob_RPs.csv"), index=False)
         
-        # Computing the results for each RP
+        # Parallel processing setup
         n_valid_RPs_gt_1 = len(valid_RPs) > 1
         cores = min(len(valid_RPs), mp.cpu_count()) if n_cores is None else n_cores
-        with mp.Pool(cores) as p:
-            params = {
-                "haz_folder": haz_folder,
-                "analysis_type": analysis_type,
-                "country": country,
-                "haz_cat": haz_cat,
-                "period": period,
-                "scenario": scenario,
-                "exp_cat": exp_cat,
-                "exp_data": exp_data,
-                "min_haz_threshold": min_haz_threshold,
-                "damage_factor": damage_factor,
-                "save_check_raster": save_check_raster,
-                "bin_seq": bin_seq,
-                "num_bins": num_bins,
-                "adm_data": adm_data,
-            }
-            func = partial(calc_imp_RPs, wb_region=wb_region, **params)
-            res = p.map(func, np.array_split(valid_RPs, cores))
-        if not isinstance(res, list):
-            to_concat = [result_df, res]
-        else:
-            to_concat = [result_df] + res
-
-        result_df = pd.concat(to_concat, axis=1) # Concatenating the results
-        result_df = result_df.replace(np.nan, 0) # Converting eventual nan/null to zero
-        result_df = result_df_reorder_columns(result_df, valid_RPs, analysis_type, exp_cat, 
-                                            adm_level, all_adm_codes, all_adm_names)
-        result_df = calc_EAEI(result_df, valid_RPs, prob_RPs_df, 'LB', 
-                            analysis_type, exp_cat, adm_level, num_bins, n_valid_RPs_gt_1)
-        result_df = calc_EAEI(result_df, valid_RPs, prob_RPs_df, 'UB', 
-                            analysis_type, exp_cat, adm_level, num_bins, n_valid_RPs_gt_1)
-        result_df = calc_EAEI(result_df, valid_RPs, prob_RPs_df, 'Mean', 
-                            analysis_type, exp_cat, adm_level, num_bins, n_valid_RPs_gt_1)
-        result_df = result_df.round(3) # Round to three decimal places to avoid giving the impression of high precision
-        
-        # If method == 'Mean', then simplify it's name    
-        # If not n_valid_RPs_gt_1 and any column contains the initial part as 'RP1_', it is removed then
-        replace_string = '_Mean' if n_valid_RPs_gt_1 else 'RP1'
-        result_df_colnames = [s.replace(replace_string, '') for s in result_df.columns]
-        result_df.columns = result_df_colnames
-
-        # Aggregate results if multipart geometries were exploded
-        if has_multipart:
-            print(f"Aggregating results from exploded geometries back to original administrative units...")
-
-            # Verify grouping column exists and has valid values
-            if '_original_idx' not in result_df.columns:
-                raise ValueError("Original index not found in result_df. Cannot aggregate exploded geometries.")
-
-            # Check for NaN values in grouping columns
-            grouping_col = '_original_idx'
-            if result_df[grouping_col].isna().any():
-                print(f"Warning: Found {result_df[grouping_col].isna().sum()} NaN values in grouping column")
-                result_df = result_df.dropna(subset=[grouping_col])
-
-            # Get numeric columns for aggregation
-            numeric_cols = result_df.select_dtypes(include=[np.number]).columns.tolist()
-            # Remove the grouping index from numeric columns if present
-            numeric_cols = [col for col in numeric_cols if col != '_original_idx']
-
-            # Aggregate numeric columns by sum, keep first value for name and code fields
-            agg_dict = {col: 'sum' for col in numeric_cols}
-            for name_col in all_adm_names + all_adm_codes:
-                if name_col in result_df.columns and name_col not in numeric_cols:
-                    agg_dict[name_col] = 'first'
+        n_zones = len(adm_data)
+        res = {exp_cat: [] for exp_cat in exp_cat_list}
 
-            # Use dissolve to merge geometries back to multipart based on original index
-            result_df = result_df.dissolve(by=grouping_col, aggfunc=agg_dict).reset_index(drop=True)
-
-            # Remove the temporary grouping column
-            if '_original_idx' in result_df.columns:
-                result_df = result_df.drop('_original_idx', axis=1)
-
-            print(f"Aggregated to {len(result_df)} administrative units")
-
-        # Write output csv table and geopackages
-        save_geopackage(result_df, country, adm_level, haz_cat, exp_cat, period, scenario, analysis_type, valid_RPs)
-
-        # Trying to fix output not being passed to plot_results
-        return result_df
+        try:
+            with mp.Pool(cores) as p:
+                # Get total exposure for each ADM area
+                # Geometries are sent to the workers pre-serialized as WKB, which rasterstats reads directly
+                adm_wkb = np.array_split(shapely.to_wkb(adm_data.geometry.values), cores)
+                for exp_cat, exposure in exposures.items():
+                    func = partial(zonal_stats_partial, raster=exposure["exp_ras"], stats="sum")
+                    exp_per_ADM = list(it.chain(*p.map(func, adm_wkb)))
+                    result_dfs[exp_cat][f"ADM{adm_level}_{exp_cat}"] = [x['sum'] for x in exp_per_ADM]
+                del (adm_wkb, exp_per_ADM)
+                gc.collect()
+
+                # Computing the results for each RP, once per exposure grid
+                for grid, grid_exp_cats in exp_grids.items():
+                    # Rasterize the ADM units once onto the exposure grid (cached on disk), shared by all RPs
+                    zones_path = zonal_utils.get_zone_labels(adm_data.geometry, grid[1], grid[2])
+                    grid_exposures = [exposures[exp_cat] for exp_cat in grid_exp_cats]
+                    # Unless streaming, workers attach to one memory-mapped copy of each exposure instead of pickled ones
+                    if block_size is None:
+                        for exposure in grid_exposures:
+                            exposure["exp_path"] = share_exposure(exposure["exp_ras"])
+                    params = {
+                        "haz_folder": haz_folder,
+                        "analysis_type": analysis_type,
+                        "country": country,
+                        "haz_cat": haz_cat,
+                        "period": period,
+                        "scenario": scenario,
+                        "exposures": grid_exposures,
+                        "min_haz_threshold": min_haz_threshold,
+                        "save_check_raster": save_check_raster,
+                        "bin_seq": bin_seq,
+                        "num_bins": num_bins,
+                        "zones_path": zones_path,
+                        "n_zones": n_zones,
+                    }
+                    try:
+                        func = partial(calc_imp_RPs, wb_region=wb_region, block_size=block_size, **params)
+                        grid_res = p.map(func, np.array_split(valid_RPs, cores))
+                    except MemoryError:
+                        if block_size is not None:
+                            raise
+                        print(f"Memory error detected, streaming the rasters in {STREAM_BLOCK_SIZE}px windows instead...")
+                        func = partial(calc_imp_RPs, wb_region=wb_region, block_size=STREAM_BLOCK_SIZE, **params)
+                        grid_res = p.map(func, np.array_split(valid_RPs, cores))
+                    for exp_cat in grid_exp_cats:
+                        res[exp_cat] = [rp_res[exp_cat] for rp_res in grid_res]
+        finally:
+            for exposure in exposures.values():
+                if exposure["exp_path"] is not None:
+                    os.remove(exposure["exp_path"])
+            # Keep the hazard cache within its size limit, dropping the least recently used rasters
+            hazard_cache.prune_hazard_cache()
+
+        for exp_cat in exp_cat_list:
+            result_df = pd.concat([result_dfs[exp_cat]] + res[exp_cat], axis=1) # Concatenating the results
+            result_df = result_df.replace(np.nan, 0) # Converting eventual nan/null to zero
+            result_df = result_df_reorder_columns(result_df, valid_RPs, analysis_type, exp_cat, 
+                                                adm_level, all_adm_codes, all_adm_names)
+            result_df = calc_EAEI(result_df, valid_RPs, prob_RPs_df, ['LB', 'UB', 'Mean'], 
+                                analysis_type, exp_cat, adm_level, num_bins, n_valid_RPs_gt_1)
+            result_df = result_df.round(3) # Round to three decimal places to avoid giving the impression of high precision
+
+            # If method == 'Mean', then simplify it's name    
+            # If not n_valid_RPs_gt_1 and any column contains the initial part as 'RP1_', it is removed then
+            replace_string = '_Mean' if n_valid_RPs_gt_1 else 'RP1'
+            result_df_colnames = [s.replace(replace_string, '') for s in result_df.columns]
+            result_df.columns = result_df_colnames
+
+            # Aggregate results if multipart geometries were exploded
+            if has_multipart:
+                print(f"Aggregating results from exploded geometries back to original administrative units...")
+
+                # Verify grouping column exists and has valid values
+                if '_original_idx' not in result_df.columns:
+                    raise ValueError("Original index not found in result_df. Cannot aggregate exploded geometries.")
+
+                # Check for NaN values in grouping columns
+                grouping_col = '_original_idx'
+                if result_df[grouping_col].isna().any():
+                    print(f"Warning: Found {result_df[grouping_col].isna().sum()} NaN values in grouping column")
+                    result_df = result_df.dropna(subset=[grouping_col])
+
+                # Get numeric columns for aggregation
+                numeric_cols = result_df.select_dtypes(include=[np.number]).columns.tolist()
+                # Remove the grouping index from numeric columns if present
+                numeric_cols = [col for col in numeric_cols if col != '_original_idx']
+
+                # Aggregate numeric columns by sum, keep first value for name and code fields
+                agg_dict = {col: 'sum' for col in numeric_cols}
+                for name_col in all_adm_names + all_adm_codes:
+                    if name_col in result_df.columns and name_col not in numeric_cols:
+                        agg_dict[name_col] = 'first'
+
+                # Use dissolve to merge geometries back to multipart based on original index
+                result_df = result_df.dissolve(by=grouping_col, aggfunc=agg_dict).reset_index(drop=True)
+
+                # Remove the temporary grouping column
+                if '_original_idx' in result_df.columns:
+                    result_df = result_df.drop('_original_idx', axis=1)
+
+                print(f"Aggregated to {len(result_df)} administrative units")
+
+            # Write output csv table and geopackages
+            save_geopackage(result_df, country, adm_level, haz_cat, exp_cat, period, scenario, analysis_type, valid_RPs)
+            result_dfs[exp_cat] = result_df
+
+        return result_dfs
 
     except Exception as e:
         print(f"An error occurred in run_analysis: {str(e)}")
         raise    
 
-def calc_imp_RPs(RPs, haz_folder, analysis_type, country, haz_cat, period, scenario, exp_cat, exp_data, min_haz_threshold,
-                 damage_factor, save_check_raster, bin_seq, num_bins, adm_data, wb_region):
+def calc_imp_RPs(RPs, haz_folder, analysis_type, country, haz_cat, period, scenario, exposures, min_haz_threshold,
+                 save_check_raster, bin_seq, num_bins, zones_path, n_zones, wb_region, block_size=None):
     """
     Apply calculates for each given return period.
-    """
-    result_df = pd.DataFrame()
-    for rp in RPs:
-        if rp%1==0: rp = int(rp)
-        # Loading the corresponding hazard dataset
-        try:
-            # We reproject using WarpedVRT as this applies the operation from disk
-            # https://github.com/corteva/rioxarray/discussions/207
-            # https://rasterio.readthedocs.io/en/latest/api/rasterio.vrt.html
-            with rasterio.open(os.path.join(haz_folder, f"1in{rp}.tif")) as src:
-                vrt_options = {
-                    'src_crs': src.crs,
-                    'crs': exp_data.rio.crs,
-                    'transform': exp_data.rio.transform(recalc=True),
-                    'height': exp_data.rio.height,
-                    'width': exp_data.rio.width,
-                }
-                with rasterio.vrt.WarpedVRT(src, **vrt_options) as vrt:
-                    try:
-                        # Try original approach first (fastest)
-                        haz_data = rxr.open_rasterio(vrt)[0].astype('float32')
-                    except MemoryError:
-                        print(f"Memory error loading hazard RP{rp}, falling back to chunked loading...")
-                        haz_data = rxr.open_rasterio(vrt, chunks=True)[0].astype('float32')
-                        # For chunked data, compute immediately to avoid alignment issues
-                        haz_data = haz_data.compute()
-                    haz_data.rio.write_nodata(-1.0, inplace=True)
-
-        except rasterio._err.CPLE_OpenFailedError:
-            raise IOError(f"Error occurred trying to open raster file: 1in{rp}.tif")
-
-        # Set values below min threshold to nan (original approach)
-        haz_data = haz_data.where(haz_data.data > min_haz_threshold, np.nan)
-
-        # Checking the analysis_type
-        if analysis_type == "Function":
-            # Assign impact factor (this is F_i in the equations)
-            haz_data = damage_factor(haz_data, wb_region)
-            if save_check_raster:
-                haz_data.rio.to_raster(os.path.join(OUTPUT_DIR, f"{country}_{haz_cat}_{period}_{scenario}_{rp}_{exp_cat}_haz_imp_factor.tif"))
-        elif analysis_type == "Classes":
-            # Assign bin values to raster data - Follows: x_{i-1} <= x_{i} < x_{i+1}
-            bin_idx = np.digitize(haz_data, bin_seq).astype('int32')
-
-        # Calculate affected exposure in ADM
-        # Filter down to valid areas affected areas which have people
-        affected_exp = exp_data.where(haz_data.data > 0, np.nan)
 
+    exposures is a list of dicts (exp_cat, exp_ras, exp_path, damage_factor), one per exposure category, all on
+    the same grid: each hazard is read and reprojected once and applied to every exposure category.
+    Per-ADM sums are reduced over the zone-label raster at zones_path (see zonal_utils.get_zone_labels).
+    If block_size is None, each exposure is taken from the shared .npy at exp_path (see share_exposure) and each
+    hazard is read in one go. Otherwise exposure (exp_ras) and hazard rasters are read window by window and
+    the per-ADM partial sums are accumulated, so that memory is bounded by the window size.
+
+    Returns a dict of result DataFrames by exposure category.
+    """
+    RPs = [int(rp) if rp % 1 == 0 else rp for rp in RPs]
+    exp_cats = [exposure["exp_cat"] for exposure in exposures]
+    zone_labels = np.load(zones_path, mmap_mode='r')
+
+    with ExitStack() as stack:
+        exp_srcs = {exposure["exp_cat"]: stack.enter_context(rasterio.open(exposure["exp_ras"])) for exposure in exposures}
+        exp_data = {exposure["exp_cat"]: np.load(exposure["exp_path"], mmap_mode='r') if block_size is None else None
+                    for exposure in exposures}
+        damage_factors = {exposure["exp_cat"]: exposure["damage_factor"] for exposure in exposures}
+        exp_src = exp_srcs[exp_cats[0]]
+        height, width = exp_src.shape
+        # Hazards are reprojected onto the exposure grid once and kept in the on-disk hazard cache (tiled COGs),
+        # so later runs on the same grid read them directly
+        grid_options = {'crs': exp_src.crs, 'transform': exp_src.transform, 'height': height, 'width': width}
+        haz_srcs = {}
+        for rp in RPs:
+            haz_file = os.path.join(haz_folder, f"1in{rp}.tif")
+            try:
+                aligned_file = hazard_cache.get_aligned_hazard(haz_file, exp_src.crs, exp_src.transform, (height, width))
+                haz_srcs[rp] = stack.enter_context(rasterio.open(aligned_file))
+            except (FileNotFoundError, rasterio._err.CPLE_OpenFailedError, rasterio.errors.RasterioIOError):
+                raise IOError(f"Error occurred trying to open raster file: 1in{rp}.tif")
+
+        # Intermediate rasters are written window by window as well
+        check_rasters = {}
         if save_check_raster:
-            affected_exp.rio.to_raster(os.path.join(OUTPUT_DIR, f"{country}_{haz_cat}_{period}_{scenario}_{rp}_{exp_cat}_affected.tif"))
+            check_profile = {'driver': 'GTiff', 'dtype': 'float32', 'count': 1, 'nodata': np.nan,
+                             'tiled': True, 'blockxsize': 256, 'blockysize': 256, **grid_options}
+            for rp, exp_cat in it.product(RPs, exp_cats):
+                check_files = {'affected': f"{country}_{haz_cat}_{period}_{scenario}_{rp}_{exp_cat}_affected.tif"}
+                if analysis_type == "Function":
+                    check_files['factor'] = f"{country}_{haz_cat}_{period}_{scenario}_{rp}_{exp_cat}_haz_imp_factor.tif"
+                    check_files['impact'] = f"{country}_{period}_{scenario}_{rp}_{exp_cat}_impact.tif"
+                check_rasters[rp, exp_cat] = {
+                    name: stack.enter_context(rasterio.open(os.path.join(OUTPUT_DIR, file), 'w', **check_profile))
+                    for name, file in check_files.items()
+                }
 
-        # Conduct analyses for classes
+        # Per-ADM partial sums by RP and exposure category, accumulated over the windows
         if analysis_type == "Classes":
-            del haz_data
-            for bin_x in reversed(range(num_bins)):
-                # Compute the impact for this class
-                impact_class = gen_zonal_stats(vectors=adm_data["geometry"],
-                                               raster=np.array(bin_idx == bin_x).astype('int32') * affected_exp.data,
-                                               stats=["sum"], affine=affected_exp.rio.transform(), nodata=np.nan)
-                result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] = [x['sum'] for x in impact_class]
-                # Compute the cumulative impact for this class
-                if bin_x < (num_bins - 1):
-                    result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] = result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] + \
-                                                                  result_df[f"RP{rp}_{exp_cat}_C{bin_x+1}_exp"]
-
-        # Conduct analyses for function
-        if analysis_type == "Function":
-            # Compute the exposure per ADM level
-            affected_exp_per_ADM = gen_zonal_stats(vectors=adm_data["geometry"], raster=affected_exp.data,
-                                                   stats=["sum"], affine=affected_exp.rio.transform(), nodata=np.nan)
-            result_df[f"RP{rp}_{exp_cat}_exp"] = [x['sum'] for x in affected_exp_per_ADM]
-            # Calculate impacted exposure in affected areas
-            impact_exp = affected_exp.data * haz_data
-            # If save intermediate to disk is TRUE, then
-            if save_check_raster:
-                impact_exp.rio.to_raster(os.path.join(OUTPUT_DIR, f"{country}_{period}_{scenario}_{rp}_{exp_cat}_impact.tif"))
-            # Compute the impact per ADM level
-            impact_exp_per_ADM = gen_zonal_stats(vectors=adm_data["geometry"], raster=impact_exp.data, stats=["sum"],
-                                                 affine=impact_exp.rio.transform(), nodata=np.nan)
-            result_df[f"RP{rp}_{exp_cat}_imp"] = [x['sum'] for x in impact_exp_per_ADM]
-            del (haz_data, impact_exp, impact_exp_per_ADM, affected_exp_per_ADM)
-
-        del affected_exp
-        gc.collect()
+            class_exp = {key: np.zeros((n_zones, num_bins)) for key in it.product(RPs, exp_cats)}
+        else:
+            affected_exp_per_ADM = {key: np.zeros(n_zones) for key in it.product(RPs, exp_cats)}
+            impact_exp_per_ADM = {key: np.zeros(n_zones) for key in it.product(RPs, exp_cats)}
 
-    return result_df
+        if block_size is None:
+            windows = [Window(0, 0, width, height)]
+        else:
+            windows = zonal_utils.block_windows(height, width, block_size)
+
+        for window in windows:
+            zone_block = zone_labels[window.toslices()]
+            exp_blocks = {}
+            for exp_cat in exp_cats:
+                if exp_data[exp_cat] is None:
+                    exp_blocks[exp_cat] = read_exposure_block(exp_srcs[exp_cat], window)
+                else:
+                    exp_blocks[exp_cat] = exp_data[exp_cat][window.toslices()]
+
+            for rp in RPs:
+                # Loading the corresponding hazard window, once for all exposure categories
+                haz_block = haz_srcs[rp].read(1, window=window).astype('float32')
+                # Set values below min threshold to nan
+                haz_block = np.where(haz_block > min_haz_threshold, haz_block, np.nan)
+
+                if analysis_type == "Classes":
+                    # Assign bin values to raster data - Follows: x_{i-1} <= x_{i} < x_{i+1}
+                    bin_idx = np.digitize(haz_block, bin_seq).astype('int32')
+
+                for exp_cat in exp_cats:
+                    # Checking the analysis_type
+                    if analysis_type == "Function":
+                        # Assign impact factor (this is F_i in the equations)
+                        imp_factor = damage_factors[exp_cat](haz_block, wb_region)
+                    else:
+                        imp_factor = haz_block
+
+                    # Calculate affected exposure in ADM
+                    # Filter down to valid areas affected areas which have people
+                    affected_exp = np.where(imp_factor > 0, exp_blocks[exp_cat], np.nan)
+
+                    # Conduct analyses for classes
+                    if analysis_type == "Classes":
+                        # Exposure per ADM unit and class in a single pass
+                        class_exp[rp, exp_cat] += zonal_utils.zonal_reduce(zone_block, affected_exp, n_zones,
+                                                                           classes=bin_idx, n_classes=num_bins)
+
+                    # Conduct analyses for function
+                    if analysis_type == "Function":
+                        # Compute the exposure per ADM level
+                        affected_exp_per_ADM[rp, exp_cat] += zonal_utils.zonal_sum(zone_block, affected_exp, n_zones)
+                        # Calculate impacted exposure in affected areas
+                        impact_exp = affected_exp * imp_factor
+                        # Compute the impact per ADM level
+                        impact_exp_per_ADM[rp, exp_cat] += zonal_utils.zonal_sum(zone_block, impact_exp, n_zones)
+
+                    # If save intermediate to disk is TRUE, then
+                    if save_check_raster:
+                        check_rasters[rp, exp_cat]['affected'].write(affected_exp.astype('float32'), 1, window=window)
+                        if analysis_type == "Function":
+                            check_rasters[rp, exp_cat]['factor'].write(imp_factor.astype('float32'), 1, window=window)
+                            check_rasters[rp, exp_cat]['impact'].write(impact_exp.astype('float32'), 1, window=window)
+
+    result_dfs = {}
+    for exp_cat in exp_cats:
+        result_df = pd.DataFrame()
+        for rp in RPs:
+            if analysis_type == "Classes":
+                # Cumulate the exposure from the highest class down
+                cumulative_exp = np.cumsum(class_exp[rp, exp_cat][:, ::-1], axis=1)[:, ::-1]
+                for bin_x in reversed(range(num_bins)):
+                    result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] = cumulative_exp[:, bin_x]
+            if analysis_type == "Function":
+                result_df[f"RP{rp}_{exp_cat}_exp"] = affected_exp_per_ADM[rp, exp_cat]
+                result_df[f"RP{rp}_{exp_cat}_imp"] = impact_exp_per_ADM[rp, exp_cat]
+        result_dfs[exp_cat] = result_df
+
+    return result_dfs
 
 def result_df_reorder_columns(result_df, RPs, analysis_type, exp_cat, adm_level, all_adm_codes, all_adm_names):
     """
@@ -546,56 +636,51 @@ def calc_EAEI(result_df, RPs, prob_RPs_df, method, analysis_type, exp_cat,
               adm_level, num_bins, n_valid_RPs_gt_1):
     """
     Computes the EAE/EAI over each given return period.
-    """
-    for rp in RPs:
 
-        # Exceedance Probability of return period
-        freq = float(prob_RPs_df.loc[prob_RPs_df['RPs'] == rp, f'prob_RPs_{method}'].iloc[0])
+    method is 'LB', 'UB' or 'Mean', or a list of them: the per-RP results are taken as a (zones x RPs) matrix
+    (x classes for Classes) and multiplied at once by the probability weights of all the methods.
+    New columns are appended in the order of the methods, as by successive calls for each method.
+    """
+    methods = [method] if isinstance(method, str) else list(method)
 
-        # Conduct analyses for classes
-        if analysis_type == "Classes":
-            # Compute the EAE for classes, if probabilistic (len(valid_RPs)>1)
-            if n_valid_RPs_gt_1:
-                for bin_x in reversed(range(num_bins)):
-                    result_df[f"RP{rp}_{exp_cat}_C{bin_x}_EAE_tmp"] = result_df[f"RP{rp}_{exp_cat}_C{bin_x}_exp"] * freq
+    # Nothing to compute if not probabilistic (len(valid_RPs)>1)
+    if not n_valid_RPs_gt_1 or analysis_type not in ("Classes", "Function"):
+        return result_df
 
-        # Conduct analyses for function
-        if analysis_type == "Function":
-            # Compute the EAI for this RP, if probabilistic (len(valid_RPs)>1)
-            if n_valid_RPs_gt_1:
-                result_df[f"RP{rp}_EAI_tmp"] = result_df[f"RP{rp}_{exp_cat}_imp"] * freq
-        
-    # Computing the EAE or EAI, if probabilistic (len(valid_RPs)>1)
-    if n_valid_RPs_gt_1:
-        # Computing EAE if analysis is Classes
-        if analysis_type == "Classes":
-            # Sum all EAI to get total EAI across all RPs and Classes
-            for bin_x in reversed(range(0, num_bins)):
-                C_EAE_cols = result_df.columns.str.contains(f"{exp_cat}_C{bin_x}_EAE_tmp")
-                result_df.loc[:, f"{exp_cat}_C{bin_x}_EAE_{method}"] = result_df.loc[:, C_EAE_cols].sum(axis=1)
+    # Probability weights of each return period (rows) for each method (columns)
+    prob_RPs = prob_RPs_df.set_index('RPs')
+    weights = np.array([[float(prob_RPs.loc[rp, f'prob_RPs_{m}']) for m in methods] for rp in RPs])
+    adm_exp = result_df[f"ADM{adm_level}_{exp_cat}"].to_numpy(dtype='float64')
 
-            # Calculate EAE% (Percent affected exposure per year)
-            for bin_x in reversed(range(0, num_bins)):
-                result_df.loc[:, f"{exp_cat}_C{bin_x}_EAE%_{method}"] = (result_df.loc[:,f"{exp_cat}_C{bin_x}_EAE_{method}"] / 
-                                                                         result_df.loc[:,f"ADM{adm_level}_{exp_cat}"]) * 100.0
-        # Computing EAI if analysis is Function
-        if analysis_type == "Function":
-            if n_valid_RPs_gt_1:
-                # Sum all EAI to get total EAI across all RPs
-                result_df.loc[:, f"{exp_cat}_EAI_{method}"] = result_df.loc[:,result_df.columns.str.contains('_EAI_tmp')].sum(axis=1)
-                # Calculate Exp_EAI% (Percent affected exposure per year)
-                result_df.loc[:, f"{exp_cat}_EAI%_{method}"] = (result_df.loc[:, f"{exp_cat}_EAI_{method}"] / 
-                                                                result_df.loc[:,f"ADM{adm_level}_{exp_cat}"]) * 100.0
-
-    # Dropping selected columns for better presentation of the results
-    if analysis_type == "Function":
-        all_EAI = [col for col in result_df.columns if '_EAI_tmp' in col] if n_valid_RPs_gt_1 else []
-        result_df = result_df.drop(all_EAI, axis=1) # dropping
     if analysis_type == "Classes":
-        all_EAE = [col for col in result_df.columns if '_EAE_tmp' in col] if n_valid_RPs_gt_1 else []
-        result_df = result_df.drop(all_EAE, axis=1) # dropping
-        
-    return result_df
+        # (zones, RPs, classes) matrix of the affected exposure, classes from the highest down
+        classes = list(reversed(range(num_bins)))
+        values = np.stack([result_df[[f"RP{rp}_{exp_cat}_C{bin_x}_exp" for bin_x in classes]].to_numpy(dtype='float64')
+                           for rp in RPs], axis=1)
+        expected = np.einsum('zrc,rm->mzc', np.nan_to_num(values), weights)
+        new_cols = {}
+        for m, method_name in enumerate(methods):
+            for c, bin_x in enumerate(classes):
+                new_cols[f"{exp_cat}_C{bin_x}_EAE_{method_name}"] = expected[m, :, c]
+            # Calculate EAE% (Percent affected exposure per year)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for c, bin_x in enumerate(classes):
+                    new_cols[f"{exp_cat}_C{bin_x}_EAE%_{method_name}"] = expected[m, :, c] / adm_exp * 100.0
+    else:
+        # (zones, RPs) matrix of the impact
+        values = result_df[[f"RP{rp}_{exp_cat}_imp" for rp in RPs]].to_numpy(dtype='float64')
+        expected = np.nan_to_num(values) @ weights
+        new_cols = {}
+        for m, method_name in enumerate(methods):
+            new_cols[f"{exp_cat}_EAI_{method_name}"] = expected[:, m]
+            # Calculate Exp_EAI% (Percent affected exposure per year)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                new_cols[f"{exp_cat}_EAI%_{method_name}"] = expected[:, m] / adm_exp * 100.0
+
+    # Appending all the new columns at once avoids fragmenting the DataFrame
+    new_cols = pd.DataFrame(new_cols, index=result_df.index)
+    result_df = result_df.drop(columns=new_cols.columns.intersection(result_df.columns))
+    return pd.concat([result_df, new_cols], axis=1)
 
 def create_summary_df(result_df, valid_RPs, exp_cat):
     summary_data = []
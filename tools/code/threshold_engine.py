@@ -0,0 +1,722 @@
+# Hazard-agnostic threshold analysis engine
+#
+# The threshold tools (TH_FL_utils for floods, TH_HZD_utils for the other hazards) all reduce hazard
+# layers per administrative unit, compare the results with value and area thresholds and turn them
+# into a hazard score. This module holds that shared machinery: return period rasters read together
+# in one traversal over a cached label raster (see zonal_utils), one pool of workers, and per-unit
+# accumulators instead of pixel arrays. Like rasterstats with all_touched, every unit counts every pixel
+# it touches: the pixels the label raster gives to another unit are added back from a cached list
+# (see zonal_utils.get_shared_pixels), so units smaller than a pixel are still scored. Pixels are
+# weighted by their true area (cached per grid row, see zonal_utils.pixel_row_areas), so area
+# percentages hold on geographic grids at any latitude.
+# Each hazard type of HAZARD_CONFIG is scored by a reducer registered with register_reducer,
+# vectorized over all units; a new hazard type plugs in by registering its own reducer.
+import multiprocessing as mp
+from functools import partial
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import rasterio
+import shapely
+from affine import Affine
+from rasterio import windows
+from rasterio.windows import Window
+
+import common
+import zonal_utils
+
+# Size of the raster windows read at once when computing zonal statistics
+BLOCK_SIZE = 2048
+
+# Equal-area CRS used to compare intersection and unit areas of vector hazards
+EQUAL_AREA_CRS = 'EPSG:6933'
+
+# Per-unit accumulators computed by zonal_rp_stats for each raster, weighted by pixel area
+RP_STAT_KEYS = ('area', 'sum', 'area_positive', 'sum_positive', 'area_above')
+
+# Reducers by hazard type (HAZARD_CONFIG 'type'), see register_reducer
+REDUCERS = {}
+
+
+def register_reducer(hazard_type):
+    """
+    Decorator registering the reducer of a hazard type.
+
+    A reducer is called as reducer(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds, pool)
+    and adds its statistics and the 'Hazard_score' column to adm_hazard (a copy of the units). Raster reducers
+    get their per-unit statistics from rp_layer_stats or zonal_class_areas, where every unit counts all the
+    pixels it touches.
+    """
+    def register(reducer):
+        REDUCERS[hazard_type] = reducer
+        return reducer
+    return register
+
+
+def run_threshold_analysis(adm_units, config, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
+    """
+    Score administrative units for one hazard, with the reducer registered for its type.
+
+    Args:
+        adm_units: GeoDataFrame with administrative boundaries
+        config: Hazard configuration (HAZARD_CONFIG entry), with at least 'type'
+        value_threshold: Minimum value threshold
+        area_threshold_pct: Minimum area percentage threshold
+        rp_thresholds: RP-specific thresholds (optional, defaults to config['rp_thresholds'] if any)
+        pool: multiprocessing Pool to share between several analyses (optional)
+
+    Returns:
+        GeoDataFrame: Copy of adm_units with the hazard statistics and 'Hazard_score'
+                      (without them if the hazard data is missing)
+    """
+    reducer = REDUCERS.get(config['type'])
+    if reducer is None:
+        raise ValueError(f"No reducer registered for hazard type: {config['type']}")
+    if rp_thresholds is None:
+        rp_thresholds = config.get('rp_thresholds')
+
+    adm_hazard = adm_units.copy()
+    reducer(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds, pool)
+    return adm_hazard
+
+
+def hazard_layers(config):
+    """
+    Return the available hazard layers of a configuration as a list of (rp_name, path).
+
+    Paths are config['paths'] (dict of rp_name: path) if given, otherwise config['files'] in
+    DATA_DIR/config['folder']. Missing files are reported and skipped.
+    """
+    if 'paths' in config:
+        candidates = [(rp_name, Path(path)) for rp_name, path in config['paths'].items()]
+    else:
+        candidates = [(rp_name, Path(common.DATA_DIR) / config['folder'] / filename)
+                      for rp_name, filename in zip(config['rp_names'], config['files'])]
+
+    layers = []
+    for rp_name, path in candidates:
+        if not path.exists():
+            print(f"Warning: Raster not found: {path}")
+            continue
+        layers.append((rp_name, path))
+    return layers
+
+
+def calculate_mean_above_threshold(values, threshold=0):
+    """
+    Calculate mean of values greater than threshold.
+    Returns 0 if no values meet the condition.
+    """
+    if values is None or len(values) == 0:
+        return 0
+
+    # None values become NaN, which never pass the comparison
+    values = np.asarray(values, dtype='float64')
+    filtered_values = values[values > threshold]
+
+    if len(filtered_values) == 0:
+        return 0
+
+    return filtered_values.mean()
+
+
+def calculate_hazard_score(value_threshold, area_threshold_pct, *rp_stats):
+    """
+    Calculate hazard score based on value and area thresholds.
+
+    Logic:
+    - For each return period, check if BOTH value threshold and area threshold are met
+    - Score = count of RPs meeting both thresholds (ranges from 0 to N, where N is the number of selected return periods)
+
+    Args:
+        value_threshold: Minimum mean value threshold
+        area_threshold_pct: Minimum area percentage threshold
+        *rp_stats: Tuples of (mean_value, area_pct) for each return period, as scalars or arrays (one value per unit)
+
+    Returns:
+        int or array of int: Hazard score (0 to N, where N = number of return periods)
+    """
+    score = 0
+
+    for mean_val, area_pct in rp_stats:
+        score = score + ((np.asarray(mean_val) >= value_threshold) &
+                         (np.asarray(area_pct) >= area_threshold_pct)).astype(int)
+
+    return score
+
+
+def calculate_hazard_score_raster(value_threshold, area_threshold_pct, *rp_stats):
+    """
+    Calculate hazard score based on area threshold for raster data.
+
+    Logic:
+    - For each return period, check if area threshold is met
+    - Area is calculated as percentage of the area with values > value_threshold
+    - Score = count of RPs meeting area threshold (0, 1, 2, or 3)
+
+    Args:
+        value_threshold: Value threshold (used to identify affected pixels)
+        area_threshold_pct: Minimum area percentage threshold
+        *rp_stats: Tuples of (mean_value, area_pct) for each return period, as scalars or arrays (one value per unit)
+                   Note: mean_value is kept for backwards compatibility but not used in scoring
+
+    Returns:
+        int or array of int: Hazard score (0-3)
+    """
+    score = 0
+
+    for mean_val, area_pct in rp_stats:
+        # Only check if area percentage meets threshold
+        # The area_pct already represents the area with values > value_threshold
+        score = score + (np.asarray(area_pct) >= area_threshold_pct).astype(int)
+
+    return score
+
+
+def ratio_or_zero(numerator, denominator):
+    """Element-wise numerator / denominator, 0 where the denominator is 0."""
+    numerator = np.asarray(numerator, dtype='float64')
+    denominator = np.asarray(denominator, dtype='float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / denominator, 0)
+
+
+def add_to_histogram(histogram, zones, bins):
+    """
+    Add pixels to a (unit, bin) histogram, widening it if a bin is beyond its last column.
+
+    Only the (unit, bin) pairs present are updated, so the cost follows the number of pixels, not of units.
+    """
+    if len(bins) == 0:
+        return histogram
+    n_bins = max(histogram.shape[1], int(bins.max()) + 1)
+    if n_bins > histogram.shape[1]:
+        histogram = np.pad(histogram, ((0, 0), (0, n_bins - histogram.shape[1])))
+    index, counts = np.unique(zones * n_bins + bins, return_counts=True)
+    histogram.ravel()[index] += counts
+    return histogram
+
+
+def add_histograms(a, b):
+    """Sum of two (unit, bin) histograms of possibly different widths."""
+    n_bins = max(a.shape[1], b.shape[1])
+    return np.pad(a, ((0, 0), (0, n_bins - a.shape[1]))) + np.pad(b, ((0, 0), (0, n_bins - b.shape[1])))
+
+
+def map_tasks(func, tasks, pool=None, cores=None, star=False):
+    """
+    Run func on every task, on the given pool, on a new pool of cores processes, or sequentially if there is a
+    single task or core. Results are returned in the order of the tasks.
+    """
+    cores = mp.cpu_count() if cores is None else cores
+    if pool is not None and len(tasks) > 1:
+        return pool.starmap(func, tasks) if star else pool.map(func, tasks)
+    if len(tasks) > 1 and cores > 1:
+        with mp.Pool(min(cores, len(tasks))) as p:
+            return p.starmap(func, tasks) if star else p.map(func, tasks)
+    return [func(*task) if star else func(task) for task in tasks]
+
+
+def unit_areas_m2(adm_units):
+    """
+    Area in m² of each unit, in an equal-area projection for geographic units (correct at any latitude,
+    unlike a single UTM zone for a global dataset), or in the units of their CRS otherwise.
+    """
+    if adm_units.crs is not None and adm_units.crs.is_geographic:
+        return adm_units.geometry.to_crs(EQUAL_AREA_CRS).area.values
+    return adm_units.geometry.area.values
+
+
+def pixel_areas(src, window):
+    """Area in m² of each pixel of a window of an open raster, flattened (see zonal_utils.pixel_row_areas)."""
+    geographic = src.crs is not None and src.crs.is_geographic
+    row_areas = zonal_utils.pixel_row_areas(src.transform, src.height, geographic)
+    return np.repeat(row_areas[window.row_off:window.row_off + window.height], window.width)
+
+
+def shared_pixels_by_window(shared, label_windows, width, block_size):
+    """
+    Split shared pixels (see zonal_utils.get_shared_pixels) among the windows of
+    zonal_utils.block_windows(height, width, block_size), as one (zones, flat pixel index in the window)
+    pair of arrays per window.
+    """
+    zones, rows, cols = shared
+    n_block_cols = -(-width // block_size)
+    blocks = (rows // block_size) * n_block_cols + cols // block_size
+    order = np.argsort(blocks, kind='stable')
+    starts = np.searchsorted(blocks[order], np.arange(len(label_windows) + 1))
+    by_window = []
+    for k, window in enumerate(label_windows):
+        idx = order[starts[k]:starts[k + 1]]
+        by_window.append((zones[idx], (rows[idx] - window.row_off) * window.width + cols[idx] - window.col_off))
+    return by_window
+
+
+def unit_pixels(labels, window, shared):
+    """
+    Units and flat pixel indices of all pixels of the units in a window: labelled pixels, then the pixels
+    shared with another unit ((zones, flat pixel index) from shared_pixels_by_window).
+    """
+    zones = np.asarray(labels[window.toslices()]).ravel()
+    pixels = np.flatnonzero(zones > 0)
+    shared_zones, shared_pixels = shared
+    return np.concatenate([zones[pixels] - 1, shared_zones]), np.concatenate([pixels, shared_pixels])
+
+
+def zonal_rp_stats_worker(label_windows, window_shared, offset, raster_paths, labels_path, n_units, thresholds,
+                          nodata=None, min_value=None, majority_step=None):
+    """
+    Per-unit accumulators of several rasters sharing a grid, over a list of windows and the pixels each unit
+    shares with another in them (see zonal_rp_stats).
+
+    Returns:
+        tuple: Array of shape (n_rasters, len(RP_STAT_KEYS), n_units) and one (unit, bin) histogram per raster
+    """
+    labels = np.load(labels_path, mmap_mode='r')
+    sums = np.zeros((len(raster_paths), len(RP_STAT_KEYS), n_units))
+    histograms = [np.zeros((n_units, 0), dtype='int64') for _ in raster_paths]
+    row_off, col_off = offset
+
+    srcs = [rasterio.open(path) for path in raster_paths]
+    try:
+        for window, shared in zip(label_windows, window_shared):
+            zones, pixels = unit_pixels(labels, window, shared)
+            if len(pixels) == 0:
+                continue
+            raster_window = Window(window.col_off + col_off, window.row_off + row_off, window.width, window.height)
+            # Rasters of a job share their grid, hence their pixel areas
+            areas = pixel_areas(srcs[0], raster_window)[pixels]
+
+            # Same window of every raster, read once
+            for i, (src, threshold, raster_nodata) in enumerate(zip(srcs, thresholds, nodata)):
+                values = src.read(1, window=raster_window).ravel()[pixels].astype('float64')
+                valid = ~np.isnan(values)
+                if raster_nodata is not None:
+                    valid &= values != raster_nodata
+                if min_value is not None:
+                    valid &= values >= min_value
+                z, v, a = zones[valid], values[valid], areas[valid]
+                positive = v > 0
+                weighted = v * a
+                sums[i, 0] += np.bincount(z, weights=a, minlength=n_units)
+                sums[i, 1] += np.bincount(z, weights=weighted, minlength=n_units)
+                sums[i, 2] += np.bincount(z, weights=np.where(positive, a, 0), minlength=n_units)
+                sums[i, 3] += np.bincount(z, weights=np.where(positive, weighted, 0), minlength=n_units)
+                sums[i, 4] += np.bincount(z, weights=np.where(v > threshold, a, 0), minlength=n_units)
+                if majority_step is not None:
+                    # Positive values by bin; values below half a step still count in the first bin
+                    bins = np.maximum(np.rint(v[positive] / majority_step), 1).astype('int64')
+                    histograms[i] = add_to_histogram(histograms[i], z[positive], bins)
+    finally:
+        for src in srcs:
+            src.close()
+
+    return sums, histograms
+
+
+def zonal_rp_stats(raster_paths, geometries, thresholds, nodata=-9999, min_value=None, majority_step=None,
+                   block_size=BLOCK_SIZE, cores=None, pool=None):
+    """
+    Calculate per-unit statistics of several return period rasters in one traversal.
+
+    Rasters sharing a grid are read together, window by window, over the extent of the units only.
+    The units are burnt once per grid as a label raster (cached on disk, see zonal_utils.get_zone_labels),
+    and the windows are split among a single pool of workers, which return per-unit accumulators
+    (np.bincount) instead of pixel arrays. As with rasterstats and all_touched, each unit counts every pixel
+    it touches, including those the label raster gives to a neighbour (see zonal_utils.get_shared_pixels).
+    Each pixel counts for its area in m² (see pixel_areas), so that ratios of these accumulators are true
+    area fractions and area-weighted means. The majority is taken from a 2-D histogram of (unit, value bin)
+    pixel counts, so no pixel values are kept per unit either.
+
+    Args:
+        raster_paths: List of raster paths, one per return period
+        geometries: Unit geometries, in the CRS of the rasters
+        thresholds: List of value thresholds, one per raster, for the affected area
+        nodata: Nodata value of the rasters, or list with one value per raster (NaN values are always ignored)
+        min_value: Values below min_value are ignored as well (optional)
+        majority_step: Width of the value bins of the majority (most common) positive value of each unit,
+                       None to skip the majority
+        block_size: Size of the raster windows read at once (pixels)
+        cores: Number of worker processes (defaults to the number of CPUs)
+        pool: multiprocessing Pool to use instead of starting one (optional)
+
+    Returns:
+        list: One dict per raster of arrays with one value per unit: 'area' (area of valid pixels, m²),
+        'sum' (sum of valid values times pixel area), 'area_positive' (area of pixels > 0), 'sum_positive'
+        (sum of values > 0 times pixel area), 'area_above' (area of pixels > threshold) and, if requested,
+        'majority' (center of the most common bin, ties going to the smallest value, 0 for units without
+        positive values)
+    """
+    n_units = len(geometries)
+    cores = mp.cpu_count() if cores is None else cores
+    if not isinstance(nodata, (list, tuple)):
+        nodata = [nodata] * len(raster_paths)
+    bounds = shapely.total_bounds(np.asarray(geometries, dtype=object))
+
+    # Group the rasters by grid: each grid is rasterized and read once
+    grids = {}
+    for i, path in enumerate(raster_paths):
+        with rasterio.open(path) as src:
+            grid = (src.crs.to_wkt() if src.crs else None, tuple(src.transform)[:6], src.shape)
+        grids.setdefault(grid, []).append(i)
+
+    jobs = []
+    job_indices = []
+    for (_, transform, shape), indices in grids.items():
+        transform = Affine(*transform)
+        extent = zonal_utils.bounds_window(bounds, transform, shape)
+        if extent is None:
+            continue
+        extent_transform = windows.transform(extent, transform)
+        labels_path = zonal_utils.get_zone_labels(geometries, extent_transform, (extent.height, extent.width),
+                                                  all_touched=True)
+        shared = zonal_utils.get_shared_pixels(geometries, extent_transform, (extent.height, extent.width))
+        label_windows = list(zonal_utils.block_windows(extent.height, extent.width, block_size))
+        window_shared = shared_pixels_by_window(shared, label_windows, extent.width, block_size)
+        # Interleave the windows among the workers, to balance dense and empty areas
+        n_chunks = min(len(label_windows), cores)
+        for j in range(n_chunks):
+            jobs.append((label_windows[j::n_chunks], window_shared[j::n_chunks], (extent.row_off, extent.col_off),
+                         [str(raster_paths[i]) for i in indices], labels_path, n_units,
+                         [thresholds[i] for i in indices], [nodata[i] for i in indices], min_value, majority_step))
+            job_indices.append(indices)
+
+    outputs = map_tasks(zonal_rp_stats_worker, jobs, pool=pool, cores=cores, star=True)
+
+    # Add up the accumulators of all windows
+    sums = np.zeros((len(raster_paths), len(RP_STAT_KEYS), n_units))
+    histograms = [np.zeros((n_units, 0), dtype='int64') for _ in raster_paths]
+    for indices, (job_sums, job_histograms) in zip(job_indices, outputs):
+        for k, i in enumerate(indices):
+            sums[i] += job_sums[k]
+            if majority_step is not None:
+                histograms[i] = add_histograms(histograms[i], job_histograms[k])
+
+    results = []
+    for i in range(len(raster_paths)):
+        stats = dict(zip(RP_STAT_KEYS, sums[i]))
+        if majority_step is not None:
+            bins = zonal_utils.zonal_majority(histograms[i])
+            stats['majority'] = np.where(bins >= 0, np.round(bins * majority_step, 6), 0)
+        results.append(stats)
+
+    return results
+
+
+def partition_class_areas(task, n_classes=5, nodata=-9999, block_size=BLOCK_SIZE):
+    """
+    Area of each class of a categorical raster for a partition of units (e.g. one country).
+
+    The units are burnt as a label raster over their own window of the raster only (cached on disk, see
+    zonal_utils.get_zone_labels), which is then read block by block; each block adds the pixel areas (see
+    pixel_areas) to the per-unit class areas with a single np.bincount over (unit, class). Pixels a unit
+    shares with another (see zonal_utils.get_shared_pixels) count for both, as with rasterstats and all_touched.
+
+    Args:
+        task: Tuple of (unit positions, unit geometries, raster path)
+        n_classes: Number of classes, with values 1 to n_classes
+        nodata: Nodata value of the raster (NaN values are always ignored)
+        block_size: Size of the raster windows read at once (pixels)
+
+    Returns:
+        tuple: Unit positions and array of areas (m²) of shape (n_units, n_classes + 1), with classes
+               1 to n_classes in the matching columns and other valid values in column 0
+    """
+    indices, geometries, raster_path = task
+    n_units = len(geometries)
+    n_bins = n_classes + 1
+    areas = np.zeros((n_units, n_bins))
+
+    with rasterio.open(raster_path) as src:
+        extent = zonal_utils.bounds_window(shapely.total_bounds(geometries), src.transform, src.shape)
+        if extent is None:
+            return indices, areas
+        extent_transform = windows.transform(extent, src.transform)
+        labels_path = zonal_utils.get_zone_labels(geometries, extent_transform, (extent.height, extent.width),
+                                                  all_touched=True)
+        labels = np.load(labels_path, mmap_mode='r')
+        shared = zonal_utils.get_shared_pixels(geometries, extent_transform, (extent.height, extent.width))
+        label_windows = list(zonal_utils.block_windows(extent.height, extent.width, block_size))
+
+        for window, window_shared in zip(label_windows,
+                                         shared_pixels_by_window(shared, label_windows, extent.width, block_size)):
+            zones, pixels = unit_pixels(labels, window, window_shared)
+            if len(pixels) == 0:
+                continue
+            raster_window = Window(window.col_off + extent.col_off, window.row_off + extent.row_off,
+                                   window.width, window.height)
+            values = src.read(1, window=raster_window).ravel()[pixels].astype('float64')
+            valid = ~np.isnan(values) & (values != nodata)
+            z, v = zones[valid], values[valid]
+            a = pixel_areas(src, raster_window)[pixels][valid]
+            classes = np.where(np.isin(v, np.arange(1, n_bins)), v, 0).astype('int64')
+            areas += np.bincount(z * n_bins + classes, weights=a, minlength=n_units * n_bins).reshape(n_units, n_bins)
+
+    return indices, areas
+
+
+def zonal_class_areas(adm_units, raster_path, n_classes=5, pool=None):
+    """
+    Area of each class of a categorical raster per unit, in country partitions (ISO_A3) across a process pool.
+
+    Partitions run largest first, to balance the workers; without ISO_A3, all units form one partition.
+    See partition_class_areas for the returned areas, here with one row per unit of adm_units.
+    """
+    if 'ISO_A3' in adm_units.columns:
+        partitions = [np.flatnonzero(adm_units['ISO_A3'].values == country)
+                      for country in adm_units['ISO_A3'].unique()]
+    else:
+        partitions = [np.arange(len(adm_units))]
+    partitions.sort(key=len, reverse=True)
+    print(f"Processing {len(adm_units)} units in {len(partitions)} partitions...")
+
+    geom_list = adm_units.geometry.values
+    tasks = [(indices, geom_list[indices], str(raster_path)) for indices in partitions]
+    class_areas = np.zeros((len(adm_units), n_classes + 1))
+    for indices, areas in map_tasks(partial(partition_class_areas, n_classes=n_classes), tasks, pool=pool):
+        class_areas[indices] = areas
+    return class_areas
+
+
+def rp_layer_stats(adm_hazard, config, thresholds, pool=None, **kwargs):
+    """Available layers of a configuration and their per-unit statistics (see zonal_rp_stats)."""
+    layers = hazard_layers(config)
+    print(f"\nProcessing {', '.join(rp_name for rp_name, _ in layers)}...")
+    stats = zonal_rp_stats([path for _, path in layers], adm_hazard.geometry,
+                           [thresholds(rp_name) for rp_name, _ in layers],
+                           nodata=[config.get('nodata', {}).get(rp_name, -9999) for rp_name, _ in layers],
+                           min_value=config.get('min_value'), pool=pool, **kwargs)
+    return [rp_name for rp_name, _ in layers], stats
+
+
+@register_reducer('raster_flood')
+def reduce_flood(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
+    """
+    Mean of values > 0 and area percentage above value_threshold per RP (flood depths).
+
+    Score = number of RPs meeting both the value threshold (mean) and the area threshold (0 to N).
+    """
+    rp_names, layer_stats = rp_layer_stats(adm_hazard, config, lambda rp_name: value_threshold, pool=pool)
+
+    rp_stats = []
+    for rp_name, stats in zip(rp_names, layer_stats):
+        # Mean of values > 0 and percentage of the valid area above the value threshold
+        means_above_zero = ratio_or_zero(stats['sum_positive'], stats['area_positive'])
+        area_percentages = ratio_or_zero(stats['area_above'], stats['area']) * 100
+        adm_hazard[f'{rp_name}_mean'] = means_above_zero
+        adm_hazard[f'{rp_name}_affected_pct'] = area_percentages
+
+        print(f"  {rp_name} mean statistics: {min(means_above_zero):.2f} - {max(means_above_zero):.2f}")
+        print(f"  {rp_name} affected area %: {min(area_percentages):.2f}% - {max(area_percentages):.2f}%")
+        rp_stats.append((means_above_zero, area_percentages))
+
+    print("\nCalculating Hazard Scores...")
+    hazard_scores = calculate_hazard_score(value_threshold, area_threshold_pct, *rp_stats)
+    adm_hazard['Hazard_score'] = np.broadcast_to(hazard_scores, len(adm_hazard)).astype(int)
+
+
+@register_reducer('raster_mean')
+def reduce_raster_mean(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
+    """
+    Area percentage above value_threshold per RP (e.g. wildfire).
+
+    Score = number of RPs meeting the area threshold (0-3). With 'not_affected', units where the area with
+    values > 0 doesn't meet the area threshold in ANY RP score -1.
+    """
+    rp_names, layer_stats = rp_layer_stats(adm_hazard, config, lambda rp_name: value_threshold, pool=pool)
+    not_affected = config.get('not_affected', False)
+
+    rp_stats = []
+    area_above_zero_pcts = []
+    for rp_name, stats in zip(rp_names, layer_stats):
+        # Mean of values > 0 and area percentage (values > value_threshold)
+        means_above_zero = ratio_or_zero(stats['sum_positive'], stats['area_positive'])
+        area_percentages = ratio_or_zero(stats['area_above'], stats['area']) * 100
+        adm_hazard[f'{rp_name}_mean'] = means_above_zero
+        adm_hazard[f'{rp_name}_affected_pct'] = area_percentages
+
+        # Percentage of the area with any value > 0
+        if not_affected:
+            area_above_zero_pcts.append(ratio_or_zero(stats['area_positive'], stats['area']) * 100)
+            adm_hazard[f'{rp_name}_area_above_zero_pct'] = area_above_zero_pcts[-1]
+
+        print(f"  {rp_name} mean statistics: {min(means_above_zero):.2f} - {max(means_above_zero):.2f}")
+        print(f"  {rp_name} affected area %: {min(area_percentages):.2f}% - {max(area_percentages):.2f}%")
+        rp_stats.append((means_above_zero, area_percentages))
+
+    print("\nCalculating Hazard Scores...")
+    n_units = len(adm_hazard)
+    hazard_scores = np.broadcast_to(
+        calculate_hazard_score_raster(value_threshold, area_threshold_pct, *rp_stats), n_units
+    ).astype(int)
+    if not_affected:
+        has_sufficient_area = np.any(np.reshape(area_above_zero_pcts, (-1, n_units)) >= area_threshold_pct, axis=0)
+        hazard_scores = np.where(has_sufficient_area, hazard_scores, -1)
+    adm_hazard['Hazard_score'] = hazard_scores
+
+
+@register_reducer('raster_rp_thresholds')
+def reduce_rp_thresholds(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
+    """
+    Area percentage above an RP-specific threshold per RP (e.g. earthquake, cyclone).
+
+    Score = number of RPs meeting the area threshold minus 1 (0-3), -1 if no RP meets it.
+    """
+    rp_names, layer_stats = rp_layer_stats(adm_hazard, config, lambda rp_name: rp_thresholds[rp_name], pool=pool)
+
+    rp_count = np.zeros(len(adm_hazard), dtype=int)
+    for rp_name, stats in zip(rp_names, layer_stats):
+        # Mean and percentage of the area above the RP-specific threshold
+        means = ratio_or_zero(stats['sum'], stats['area'])
+        area_percentages = ratio_or_zero(stats['area_above'], stats['area']) * 100
+        adm_hazard[f'{rp_name}_mean'] = means
+        adm_hazard[f'{rp_name}_area_pct'] = area_percentages
+
+        print(f"  {rp_name} mean: {min(means):.1f} - {max(means):.1f} {config['unit']}")
+        print(f"  {rp_name} area >{rp_thresholds[rp_name]}: {min(area_percentages):.1f}% - {max(area_percentages):.1f}%")
+        rp_count += area_percentages >= area_threshold_pct
+
+    # Convert RP count to score: 0 RPs = -1, 1 RP = 0, 2 RPs = 1, 3 RPs = 2, 4 RPs = 3
+    print("\nCalculating Hazard Scores...")
+    adm_hazard['Hazard_score'] = np.where(rp_count == 0, -1, rp_count - 1)
+
+
+@register_reducer('raster_heat')
+def reduce_heat(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
+    """
+    Area percentage above an RP-specific threshold per RP, scored by the most frequent RP meeting it
+    (e.g. extreme heat: RP5 = High (3), RP20 = Medium (2), RP100 = Low (1), none = 0).
+    """
+    rp_names, layer_stats = rp_layer_stats(adm_hazard, config, lambda rp_name: rp_thresholds[rp_name], pool=pool)
+    levels = {rp_name: len(config['rp_names']) - position for position, rp_name in enumerate(config['rp_names'])}
+
+    hazard_scores = np.zeros(len(adm_hazard), dtype=int)
+    for rp_name, stats in zip(rp_names, layer_stats):
+        # Mean and percentage of the area above the RP-specific threshold
+        means = ratio_or_zero(stats['sum'], stats['area'])
+        area_percentages = ratio_or_zero(stats['area_above'], stats['area']) * 100
+        adm_hazard[f'{rp_name}_mean'] = means
+        adm_hazard[f'{rp_name}_area_pct'] = area_percentages
+
+        print(f"  {rp_name} mean: {min(means):.1f} - {max(means):.1f} {config['unit']}")
+        print(f"  {rp_name} area >{rp_thresholds[rp_name]}: {min(area_percentages):.1f}% - {max(area_percentages):.1f}%")
+
+        # RP >threshold with area >= area_threshold_pct, the highest level applies
+        meets = (area_percentages > 0) & (area_percentages >= area_threshold_pct)
+        hazard_scores = np.where(meets, np.maximum(hazard_scores, levels[rp_name]), hazard_scores)
+
+    print("\nCalculating Hazard Scores...")
+    adm_hazard['Hazard_score'] = hazard_scores
+
+
+@register_reducer('raster_tsunami')
+def reduce_majority(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
+    """
+    Majority (most common) positive value per RP, by bins of config['majority_step'] (e.g. tsunami depth).
+
+    Score = number of RPs whose majority meets the RP-specific threshold and whose area percentage above it
+    meets the area threshold (0-3), -1 for units without any positive value.
+    """
+    rp_names, layer_stats = rp_layer_stats(adm_hazard, config, lambda rp_name: rp_thresholds[rp_name], pool=pool,
+                                           majority_step=config['majority_step'])
+
+    has_data = np.zeros(len(adm_hazard), dtype=bool)
+    rp_count = np.zeros(len(adm_hazard), dtype=int)
+    for rp_name, stats in zip(rp_names, layer_stats):
+        majority_values = stats['majority']
+        area_percentages = ratio_or_zero(stats['area_above'], stats['area']) * 100
+        adm_hazard[f'{rp_name}_majority'] = majority_values
+        adm_hazard[f'{rp_name}_area_pct'] = area_percentages
+
+        print(f"  {rp_name} majority: {min(majority_values):.1f} - {max(majority_values):.1f} {config['unit']}")
+        print(f"  {rp_name} area >{rp_thresholds[rp_name]}: {min(area_percentages):.1f}% - {max(area_percentages):.1f}%")
+
+        has_data |= majority_values > 0
+        rp_count += (majority_values >= rp_thresholds[rp_name]) & (area_percentages >= area_threshold_pct)
+
+    print("\nCalculating Hazard Scores...")
+    adm_hazard['Hazard_score'] = np.where(has_data, rp_count, -1)
+
+
+@register_reducer('raster_remap')
+def reduce_class_remap(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
+    """
+    Area percentage of each class of a categorical raster, scored by config['remap'] of the highest class
+    meeting the area threshold (e.g. landslide index 1-5). Units without valid pixels score 0.
+    """
+    layers = hazard_layers(config)
+    if not layers:
+        return
+    raster_path = layers[0][1]
+    prefix = config.get('prefix', config['name'])
+    n_classes = max(config['remap'])
+
+    # Area percentage of each class over the valid area of each unit
+    class_areas = zonal_class_areas(adm_hazard, raster_path, n_classes, pool=pool)
+    total_area = class_areas.sum(axis=1)
+    class_pcts = ratio_or_zero(class_areas[:, 1:], total_area[:, None]) * 100
+
+    # Highest class that meets the area threshold, class 1 if none; 0 without valid pixels
+    meets = class_pcts >= area_threshold_pct
+    max_class = np.where(meets.any(axis=1), n_classes - np.argmax(meets[:, ::-1], axis=1), 1)
+    max_class = np.where(total_area > 0, max_class, 0)
+
+    remap = np.zeros(n_classes + 1, dtype=int)
+    for value, score in config['remap'].items():
+        remap[value] = score
+
+    adm_hazard[f'{prefix}_Index_max'] = max_class
+    adm_hazard['Hazard_score'] = np.where(total_area > 0, remap[max_class], 0)
+    for value in range(1, n_classes + 1):
+        adm_hazard[f'{prefix}_Index{value}_area_pct'] = class_pcts[:, value - 1]
+
+
+@register_reducer('vector_intersect')
+def reduce_vector_intersect(adm_hazard, config, value_threshold, area_threshold_pct, rp_thresholds=None, pool=None):
+    """
+    Max value of config['field'] among the hazard polygons intersecting at least area_threshold_pct of a unit,
+    remapped to a score by config['remap']['ranges'] (e.g. volcano VEI buffers); -1 if none.
+    """
+    vector_path = Path(common.DATA_DIR) / config['folder'] / config['files'][0]
+    if not vector_path.exists():
+        print(f"Error: Vector file not found: {vector_path}")
+        return
+
+    print(f"\nLoading {config['name'].lower()} exposure data...")
+    hazard_gdf = gpd.read_file(vector_path)
+    if hazard_gdf.crs != adm_hazard.crs:
+        hazard_gdf = hazard_gdf.to_crs(adm_hazard.crs)
+
+    print(f"Processing {config['field']} intersections...")
+
+    # Both layers projected once to an equal-area CRS, so that intersection and unit areas are comparable
+    units = adm_hazard[['geometry']]
+    if adm_hazard.crs is not None and adm_hazard.crs.is_geographic:
+        units = units.to_crs(EQUAL_AREA_CRS)
+        hazard_gdf = hazard_gdf.to_crs(EQUAL_AREA_CRS)
+    unit_geoms = units.geometry.values
+    unit_areas = unit_geoms.area
+
+    # All (unit, hazard polygon) intersecting pairs from the spatial index (STRtree), intersected at once
+    unit_idx, hazard_idx = hazard_gdf.sindex.query(unit_geoms, predicate='intersects')
+    intersection_areas = unit_geoms[unit_idx].intersection(hazard_gdf.geometry.values[hazard_idx]).area
+    with np.errstate(invalid='ignore', divide='ignore'):
+        area_pcts = intersection_areas / unit_areas[unit_idx] * 100
+
+    # Max value per unit among the intersections meeting the area threshold (0 if none)
+    values = hazard_gdf[config['field']].values[hazard_idx]
+    qualifying = area_pcts >= area_threshold_pct
+    max_values = pd.Series(values[qualifying]).groupby(unit_idx[qualifying]).max()
+    unit_values = np.zeros(len(adm_hazard), dtype=hazard_gdf[config['field']].dtype)
+    unit_values[max_values.index.values] = np.fmax(max_values.values, 0)
+
+    # Remap to hazard score, the first matching range applies (no hazard range gives 0)
+    hazard_scores = np.zeros(len(adm_hazard), dtype=int)
+    for min_val, max_val, hazard_score in reversed(config['remap']['ranges']):
+        in_range = (unit_values >= min_val) & (unit_values < max_val)
+        hazard_scores = np.where(in_range, max(hazard_score, 0), hazard_scores)
+
+    # No intersection, or no value meeting the area threshold = not affected
+    adm_hazard[f"{config['field']}_max"] = unit_values
+    adm_hazard['Hazard_score'] = np.where(unit_values == 0, -1, hazard_scores)
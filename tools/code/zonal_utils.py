@@ -0,0 +1,512 @@
+# Zone-label raster engine for fast zonal statistics
+#
+# Instead of asking rasterstats to rasterize every ADM polygon again for each raster and each
+# statistic, the boundaries are burnt once onto the analysis grid as a label raster
+# (0 = outside any unit, 1..n = unit position) and every per-zone statistic becomes a single
+# np.bincount over those labels. Label rasters are cached on disk, keyed by a hash of the
+# boundaries plus the target grid, so repeated runs on the same country/grid skip rasterization.
+# Coarse grids (e.g. 0.25° climate indices), where units may cover only a few cells, use a sparse
+# zones x cells matrix of exact coverage weights instead, and reduce each layer as a mat-vec.
+# A label raster gives each pixel to a single unit; where every unit must count all the pixels it touches
+# (like rasterstats with all_touched), the pixels it shares with another unit are listed apart.
+# The zones cache is bounded in size like the hazard cache: the least recently used files are removed first.
+import os
+import json
+import hashlib
+import tempfile
+from functools import lru_cache
+import numpy as np
+import shapely
+from scipy import sparse
+from rasterio import features, windows
+from rasterio.windows import Window
+
+import common
+
+ZONES_CACHE_DIR = os.path.join(common.CACHE_DIR, "zones")
+
+# Maximum size of the zones cache, in bytes
+ZONES_CACHE_MAX_BYTES = int(float(common.config.get("ZONES_CACHE_MAX_GB") or 20) * 1024 ** 3)
+
+# Name prefixes of the cached files (temporary files being written are never pruned)
+ZONES_CACHE_PREFIXES = ("zones_", "shared_", "coverage_", "nested_multiparts_")
+
+# Number of grid rows rasterized at once when building a label raster
+LABEL_BAND_ROWS = 512
+
+# Coverage weight matrices kept in memory, by boundary hash and grid
+COVERAGE_CACHE = {}
+
+# WGS84 ellipsoid: semi-major axis (m) and first eccentricity, for the area of geographic pixels
+WGS84_A = 6378137.0
+WGS84_E = np.sqrt(2 / 298.257223563 - (1 / 298.257223563) ** 2)
+
+
+def boundary_hash(geometries):
+    """Return a stable hash (hex string) of a sequence of geometries, sensitive to their order."""
+    geoms = np.asarray(geometries, dtype=object)
+    h = hashlib.sha1()
+    h.update(str(len(geoms)).encode())
+    for wkb in shapely.to_wkb(geoms, hex=False):
+        h.update(b'' if wkb is None else wkb)
+    return h.hexdigest()
+
+
+def zone_labels_key(geometries, transform, shape, all_touched=False):
+    """Cache key of a label raster: boundary hash plus target grid (transform and shape)."""
+    grid = f"{tuple(transform)[:6]}|{tuple(shape)}|{bool(all_touched)}"
+    return hashlib.sha1(f"{boundary_hash(geometries)}|{grid}".encode()).hexdigest()
+
+
+def get_zone_labels(geometries, transform, shape, all_touched=False, cache_dir=None, band_rows=LABEL_BAND_ROWS):
+    """
+    Rasterize the geometries once onto the given grid and return the path of the cached label raster.
+
+    Labels are int32: 0 for pixels outside every geometry, i+1 for the i-th geometry.
+    Geometries are burnt from the largest to the smallest, so that enclaves nested in a larger unit keep
+    their own label. The label raster is stored as .npy, to be opened with np.load(path, mmap_mode='r').
+    It is written to disk in bands of band_rows rows, so memory use does not grow with the grid size.
+
+    Parameters
+    ----------
+    geometries : sequence of shapely geometries (e.g. GeoDataFrame.geometry), in the CRS of the grid
+    transform : affine transform of the target grid
+    shape : (height, width) of the target grid
+    all_touched : burn all pixels touched by the geometries, or only those whose center is within
+    cache_dir : folder of the label cache, defaults to CACHE_DIR/zones
+    band_rows : number of grid rows rasterized at once
+    """
+    cache_dir = ZONES_CACHE_DIR if cache_dir is None else cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    key = zone_labels_key(geometries, transform, shape, all_touched)
+    labels_path = os.path.join(cache_dir, f"zones_{key}.npy")
+
+    if os.path.exists(labels_path):
+        os.utime(labels_path)
+        return labels_path
+
+    prune_zones_cache(cache_dir=cache_dir)
+    geoms = np.asarray(geometries, dtype=object)
+    geoms = np.where(shapely.is_missing(geoms) | shapely.is_empty(geoms), None, geoms)
+    rank = np.empty(len(geoms), dtype='int64')
+    rank[np.argsort(-shapely.area(geoms), kind='stable')] = np.arange(len(geoms))
+    tree = shapely.STRtree(geoms)
+
+    # Write to a temporary file first, so that concurrent runs never read a partial label raster
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.npy', delete=False) as tmp:
+        tmp_path = tmp.name
+    height, width = shape
+    labels = np.lib.format.open_memmap(tmp_path, mode='w+', dtype='int32', shape=(height, width))
+
+    for row_off in range(0, height, band_rows):
+        band = Window(0, row_off, width, min(band_rows, height - row_off))
+        # Only the geometries overlapping this band, still burnt from the largest to the smallest
+        idx = tree.query(shapely.box(*windows.bounds(band, transform)))
+        if len(idx) == 0:
+            continue
+        idx = idx[np.argsort(rank[idx])]
+        labels[band.toslices()] = features.rasterize(
+            [(geoms[i], int(i) + 1) for i in idx], out_shape=(band.height, band.width),
+            transform=windows.transform(band, transform), all_touched=all_touched, dtype='int32'
+        )
+
+    labels.flush()
+    del labels
+    os.replace(tmp_path, labels_path)
+
+    return labels_path
+
+
+def get_shared_pixels(geometries, transform, shape, cache_dir=None, band_rows=LABEL_BAND_ROWS):
+    """
+    Return the pixels touched by a geometry but labelled with another one in the all_touched label raster
+    of the grid (see get_zone_labels), as arrays (zones, rows, cols) with 0-based geometry positions.
+
+    Together with the label raster, they give each geometry every pixel it touches, like rasterstats with
+    all_touched: border pixels shared by neighbouring units, overlapping units, and units smaller than a
+    pixel that lost all their pixels to a larger neighbour. Each geometry is rasterized over its own window,
+    in bands of band_rows rows; the pixels are cached on disk as .npz, keyed like the label raster.
+
+    Parameters
+    ----------
+    geometries : sequence of shapely geometries (e.g. GeoDataFrame.geometry), in the CRS of the grid
+    transform : affine transform of the grid
+    shape : (height, width) of the grid
+    cache_dir : folder of the cache, defaults to CACHE_DIR/zones
+    band_rows : number of grid rows rasterized at once
+    """
+    cache_dir = ZONES_CACHE_DIR if cache_dir is None else cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"shared_{zone_labels_key(geometries, transform, shape, True)}.npz")
+
+    if os.path.exists(cache_path):
+        os.utime(cache_path)
+        with np.load(cache_path) as cached:
+            return cached['zones'], cached['rows'], cached['cols']
+
+    labels = np.load(get_zone_labels(geometries, transform, shape, all_touched=True, cache_dir=cache_dir,
+                                     band_rows=band_rows), mmap_mode='r')
+    zones, rows, cols = [], [], []
+    for i, geom in enumerate(geometries):
+        if geom is None or geom.is_empty:
+            continue
+        window = bounds_window(geom.bounds, transform, shape)
+        if window is None:
+            continue
+        row_stop = window.row_off + window.height
+        for row_off in range(window.row_off, row_stop, band_rows):
+            band = Window(window.col_off, row_off, window.width, min(band_rows, row_stop - row_off))
+            touched = features.rasterize([(geom, 1)], out_shape=(band.height, band.width),
+                                         transform=windows.transform(band, transform), all_touched=True,
+                                         dtype='uint8')
+            r, c = np.nonzero((touched > 0) & (labels[band.toslices()] != i + 1))
+            zones.append(np.full(len(r), i, dtype='int64'))
+            rows.append(r + band.row_off)
+            cols.append(c + band.col_off)
+
+    zones, rows, cols = (np.concatenate(a).astype('int64') if a else np.empty(0, 'int64') for a in (zones, rows, cols))
+    prune_zones_cache(cache_dir=cache_dir)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.npz', delete=False) as tmp:
+        tmp_path = tmp.name
+    np.savez(tmp_path, zones=zones, rows=rows, cols=cols)
+    os.replace(tmp_path, cache_path)
+    return zones, rows, cols
+
+
+def prune_zones_cache(max_bytes=ZONES_CACHE_MAX_BYTES, cache_dir=None):
+    """
+    Remove the least recently used label rasters, coverage matrices and checks until the zones cache fits
+    in max_bytes. Every cache hit refreshes the modification time of its file, which is used as its last use.
+
+    Returns the list of removed files.
+    """
+    cache_dir = ZONES_CACHE_DIR if cache_dir is None else cache_dir
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for file in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, file)
+        if file.startswith(ZONES_CACHE_PREFIXES) and os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed.append(path)
+
+    return removed
+
+
+def has_nested_multiparts(geometries, cache_dir=None):
+    """
+    Check if any part of a multipart geometry lies within another geometry (e.g. an enclave or exclave
+    of one unit surrounded by another), based on the centroid of each part.
+
+    All part centroids are tested at once against a spatial index of the geometries. The result is
+    memoized on disk per boundary dataset (see boundary_hash), so repeated runs skip the check.
+
+    Parameters
+    ----------
+    geometries : sequence of shapely geometries (e.g. GeoDataFrame.geometry)
+    cache_dir : folder of the cache, defaults to CACHE_DIR/zones
+    """
+    cache_dir = ZONES_CACHE_DIR if cache_dir is None else cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"nested_multiparts_{boundary_hash(geometries)}.json")
+
+    if os.path.exists(cache_path):
+        os.utime(cache_path)
+        with open(cache_path) as f:
+            return json.load(f)["nested"]
+
+    geoms = np.asarray(geometries, dtype=object)
+    is_multi = (shapely.get_type_id(geoms) == shapely.GeometryType.MULTIPOLYGON) & (shapely.get_num_geometries(geoms) > 1)
+    nested = False
+    if is_multi.any():
+        multi_idx = np.flatnonzero(is_multi)
+        parts, part_idx = shapely.get_parts(geoms[multi_idx], return_index=True)
+        # Pairs (part, geometry) where the part centroid falls within a geometry, other than its own
+        centroid_idx, geom_idx = shapely.STRtree(geoms).query(shapely.centroid(parts), predicate='within')
+        nested = bool(np.any(geom_idx != multi_idx[part_idx[centroid_idx]]))
+
+    with open(cache_path, 'w') as f:
+        json.dump({"nested": nested}, f)
+
+    return nested
+
+
+def block_windows(height, width, block_size):
+    """Yield the windows tiling a height x width grid in blocks of (at most) block_size x block_size pixels."""
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            yield Window(col_off, row_off, min(block_size, width - col_off), min(block_size, height - row_off))
+
+
+def bounds_window(bounds, transform, shape):
+    """
+    Return the window of a grid covering the given bounds, rounded outwards to whole pixels and clipped
+    to the grid, or None if the bounds do not overlap the grid.
+
+    Parameters
+    ----------
+    bounds : (left, bottom, right, top) in the CRS of the grid
+    transform : affine transform of the grid
+    shape : (height, width) of the grid
+    """
+    height, width = shape
+    window = windows.from_bounds(*bounds, transform=transform)
+    row_start = max(int(np.floor(window.row_off)), 0)
+    col_start = max(int(np.floor(window.col_off)), 0)
+    row_stop = min(int(np.ceil(window.row_off + window.height)), height)
+    col_stop = min(int(np.ceil(window.col_off + window.width)), width)
+    if row_stop <= row_start or col_stop <= col_start:
+        return None
+    return Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+
+
+def authalic_q(lat):
+    """
+    Authalic function q of the WGS84 ellipsoid at latitude lat (degrees): the area between the equator and lat,
+    per radian of longitude, is WGS84_A² * q / 2.
+    """
+    e = WGS84_E
+    sin_lat = np.sin(np.radians(np.clip(lat, -90, 90)))
+    return (1 - e ** 2) * (sin_lat / (1 - (e * sin_lat) ** 2)
+                           - np.log((1 - e * sin_lat) / (1 + e * sin_lat)) / (2 * e))
+
+
+@lru_cache(maxsize=32)
+def pixel_row_areas(transform, height, geographic=True):
+    """
+    Area in m² of the pixels of each row of a north-up grid, as a read-only float64 array of length height.
+
+    On a geographic grid (degrees), the area of a pixel only depends on its latitude, so one value per row is
+    enough to weight every pixel by its true area on the WGS84 ellipsoid. On a projected grid, all pixels have
+    the same area, in the squared units of the CRS. Lookups are cached per grid.
+
+    Parameters
+    ----------
+    transform : affine transform of the grid
+    height : number of rows of the grid
+    geographic : whether the grid is in degrees of longitude/latitude
+    """
+    if not geographic:
+        areas = np.full(height, abs(transform.a * transform.e))
+    else:
+        edges = transform.f + transform.e * np.arange(height + 1)
+        areas = WGS84_A ** 2 * np.abs(np.diff(authalic_q(edges))) / 2 * np.radians(abs(transform.a))
+    areas.flags.writeable = False
+    return areas
+
+
+def cell_edges(centers):
+    """Edges (length n + 1) of the cells of a regular axis given their centers, in the order of the centers."""
+    centers = np.asarray(centers, dtype='float64')
+    if len(centers) == 1:
+        return np.array([centers[0] - 0.5, centers[0] + 0.5])
+    step = np.median(np.diff(centers))
+    return np.append(centers - step / 2, centers[-1] + step / 2)
+
+
+def coverage_weights(geometries, lats, lons, cache_dir=None):
+    """
+    Sparse (n_zones, n_lats * n_lons) matrix of the area in m² of each cell of a lat/lon grid covered by each
+    geometry, for cells in row-major (lat, lon) order.
+
+    Cells fully within a geometry get their whole area (on the WGS84 ellipsoid), cells on its border the covered
+    fraction of it, so even units smaller than a cell get exact weights. The matrix is computed once per boundary
+    set and grid: it is kept in memory and cached on disk as .npz, keyed like the label rasters.
+
+    Parameters
+    ----------
+    geometries : sequence of shapely geometries in EPSG:4326 (e.g. GeoDataFrame.geometry)
+    lats : latitudes of the cell centers (regular, ascending or descending)
+    lons : longitudes of the cell centers (regular steps, in -180-180 or 0-360)
+    cache_dir : folder of the cache, defaults to CACHE_DIR/zones
+    """
+    lats = np.asarray(lats, dtype='float64')
+    lons = np.asarray(lons, dtype='float64')
+    grid = hashlib.sha1(lats.tobytes() + lons.tobytes()).hexdigest()
+    key = hashlib.sha1(f"{boundary_hash(geometries)}|{grid}".encode()).hexdigest()
+    if key in COVERAGE_CACHE:
+        return COVERAGE_CACHE[key]
+
+    cache_dir = ZONES_CACHE_DIR if cache_dir is None else cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"coverage_{key}.npz")
+    if os.path.exists(cache_path):
+        os.utime(cache_path)
+        weights = sparse.load_npz(cache_path).tocsr()
+        COVERAGE_CACHE[key] = weights
+        return weights
+
+    # Cell boxes in -180-180 longitudes, like the geometries; the lon step is constant even across the seam
+    lat_edges = cell_edges(lats)
+    lon_step = np.median(np.abs((np.diff(lons) + 180) % 360 - 180)) if len(lons) > 1 else 1.0
+    lon_west = (lons - lon_step / 2 + 180) % 360 - 180
+    south = np.minimum(lat_edges[:-1], lat_edges[1:])
+    north = np.maximum(lat_edges[:-1], lat_edges[1:])
+    row_areas = WGS84_A ** 2 * np.abs(np.diff(authalic_q(lat_edges))) / 2 * np.radians(lon_step)
+    cell_deg2 = (north - south) * lon_step
+
+    geoms = np.asarray(geometries, dtype=object)
+    rows, cols, data = [], [], []
+    for zone, geom in enumerate(geoms):
+        if geom is None or geom.is_empty:
+            continue
+        shapely.prepare(geom)
+        minx, miny, maxx, maxy = geom.bounds
+        lat_idx = np.flatnonzero((north > miny) & (south < maxy))
+        lon_idx = np.flatnonzero((lon_west + lon_step > minx) & (lon_west < maxx))
+        if len(lat_idx) == 0 or len(lon_idx) == 0:
+            continue
+        i, j = (a.ravel() for a in np.meshgrid(lat_idx, lon_idx, indexing='ij'))
+        cells = shapely.box(lon_west[j], south[i], lon_west[j] + lon_step, north[i])
+        # Only cells on the border of the geometry need an intersection
+        fraction = shapely.contains(geom, cells).astype('float64')
+        border = np.flatnonzero((fraction == 0) & shapely.intersects(geom, cells))
+        if len(border):
+            fraction[border] = shapely.area(shapely.intersection(cells[border], geom)) / cell_deg2[i[border]]
+        keep = fraction > 0
+        rows.append(np.full(keep.sum(), zone))
+        cols.append(i[keep] * len(lons) + j[keep])
+        data.append(np.minimum(fraction[keep], 1) * row_areas[i[keep]])
+
+    weights = sparse.csr_matrix(
+        (np.concatenate(data or [np.empty(0)]),
+         (np.concatenate(rows or [np.empty(0, 'int64')]), np.concatenate(cols or [np.empty(0, 'int64')]))),
+        shape=(len(geoms), len(lats) * len(lons))
+    )
+
+    prune_zones_cache(cache_dir=cache_dir)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.npz', delete=False) as tmp:
+        tmp_path = tmp.name
+    sparse.save_npz(tmp_path, weights)
+    os.replace(tmp_path, cache_path)
+    COVERAGE_CACHE[key] = weights
+    return weights
+
+
+def coverage_reduce(weights, values, stat='mean'):
+    """
+    Reduce a grid of values per zone with a coverage weight matrix (see coverage_weights).
+
+    Parameters
+    ----------
+    weights : sparse (n_zones, n_cells) coverage weight matrix
+    values : grid of values with n_cells cells in the same order, or an array of shape (n_cells, n_layers)
+        to reduce several layers (years, seasons, scenarios...) at once; NaN values are ignored
+    stat : 'mean' (weighted by the covered area), 'sum' (area integral: sum of values times covered m², not a sum
+        of cell values), 'max', 'min' or 'coverage' (covered valid area in m²)
+
+    Returns
+    -------
+    float64 array of shape (n_zones,) for a single grid, or (n_zones, n_layers) for several layers.
+    Zones without any valid cell get NaN, except for 'coverage' (0).
+    """
+    values = np.asarray(values, dtype='float64')
+    layers = values.reshape(weights.shape[1], -1)
+    valid = np.isfinite(layers)
+    filled = np.where(valid, layers, 0)
+
+    if stat in ('mean', 'sum', 'coverage'):
+        covered = np.asarray(weights @ valid.astype('float64'))
+        if stat == 'coverage':
+            out = covered
+        else:
+            sums = np.asarray(weights @ filled)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out = sums / covered if stat == 'mean' else np.where(covered > 0, sums, np.nan)
+    elif stat in ('max', 'min'):
+        coo = weights.tocoo()
+        out = np.full((weights.shape[0], layers.shape[1]), np.nan)
+        (np.fmax if stat == 'max' else np.fmin).at(out, coo.row, layers[coo.col])
+    else:
+        raise ValueError(f"Unknown zonal statistic: {stat}")
+
+    return out[:, 0] if values.ndim == 1 or values.size == weights.shape[1] else out
+
+
+def zonal_reduce(labels, values, n_zones, stat='sum', classes=None, n_classes=1):
+    """
+    Reduce values per zone, and optionally per class, in a single pass over the label raster.
+
+    Parameters
+    ----------
+    labels : zone-label raster (see get_zone_labels)
+    values : raster of values on the same grid, NaN values are ignored
+    n_zones : number of zones (geometries) of the label raster
+    stat : 'sum', 'count', 'mean', 'max' or 'min'
+    classes : optional raster of class indices on the same grid, values outside [0, n_classes) are ignored
+    n_classes : number of classes
+
+    Returns
+    -------
+    float64 array of shape (n_zones,), or (n_zones, n_classes) if classes are given.
+    Zones (or classes) without any valid pixel get 0 for 'sum' and 'count', NaN otherwise.
+    """
+    labels = np.asarray(labels).ravel()
+    values = np.asarray(values).ravel()
+    valid = (labels > 0) & (labels <= n_zones) & np.isfinite(values)
+    if classes is None:
+        n_bins = 1
+    else:
+        classes = np.asarray(classes).ravel()
+        valid &= (classes >= 0) & (classes < n_classes)
+        n_bins = n_classes
+
+    # Flat (zone, class) index, so that the whole matrix is filled by one bincount
+    index = (labels[valid].astype('int64') - 1) * n_bins
+    if classes is not None:
+        index += classes[valid]
+    values = values[valid]
+    size = n_zones * n_bins
+
+    if stat == 'sum':
+        out = np.bincount(index, weights=values, minlength=size)
+    elif stat == 'count':
+        out = np.bincount(index, minlength=size).astype('float64')
+    elif stat == 'mean':
+        counts = np.bincount(index, minlength=size)
+        sums = np.bincount(index, weights=values, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = sums / counts
+    elif stat in ('max', 'min'):
+        out = np.full(size, np.nan)
+        (np.fmax if stat == 'max' else np.fmin).at(out, index, values)
+    else:
+        raise ValueError(f"Unknown zonal statistic: {stat}")
+
+    return out if classes is None else out.reshape(n_zones, n_bins)
+
+
+def zonal_sum(labels, values, n_zones):
+    """
+    Sum of values per zone, ignoring NaN values, as a float64 array of length n_zones.
+
+    Zones without any valid pixel get 0.
+    """
+    return zonal_reduce(labels, values, n_zones, stat='sum')
+
+
+def zonal_majority(histogram):
+    """
+    Majority (most common) class of each zone from a (n_zones, n_classes) histogram of pixel counts,
+    e.g. zonal_reduce(labels, values, n_zones, 'count', classes, n_classes).
+
+    Ties go to the smallest class; zones without any pixel get -1.
+    """
+    histogram = np.asarray(histogram)
+    if histogram.shape[1] == 0:
+        return np.full(histogram.shape[0], -1, dtype='int64')
+    majority = np.argmax(histogram, axis=1)
+    return np.where(histogram.max(axis=1) > 0, majority, -1)
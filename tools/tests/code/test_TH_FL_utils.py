@@ -0,0 +1,22 @@
+import os
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from tools.code.TH_FL_utils import flood_nodata
+
+
+def test_flood_nodata(tmp_path):
+
+    def write_raster(name, nodata):
+        path = os.path.join(tmp_path, name)
+        with rasterio.open(path, 'w', driver='GTiff', height=2, width=2, count=1, dtype='int16',
+                           crs='EPSG:4326', transform=from_origin(0, 2, 1, 1), nodata=nodata) as dst:
+            dst.write(np.zeros((2, 2), dtype='int16'), 1)
+        return path
+
+    # Case 1: Nodata value of the raster metadata
+    assert flood_nodata(write_raster("a.tif", -9999)) == -9999
+
+    # Case 2: Missing or 0 nodata value, replaced with the Fathom default so that dry land stays valid
+    assert flood_nodata(write_raster("b.tif", None)) == -32767
+    assert flood_nodata(write_raster("c.tif", 0)) == -32767
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import rasterio
+import geopandas as gpd
+from rasterio.transform import from_origin
+from shapely.geometry import Point, box
+from tools.code import TH_HZD_utils
+from tools.code.TH_HZD_utils import HAZARD_CONFIG, process_volcano_hazard
+
+
+def test_process_volcano_hazard(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(TH_HZD_utils.common, "DATA_DIR", str(tmp_path))
+    config = HAZARD_CONFIG['volcano']
+    os.makedirs(tmp_path / config['folder'])
+    # VEI 4 buffer covering about a third of the first unit, VEI 6 buffer barely touching the second one
+    volcanoes = gpd.GeoDataFrame({'VEI': [4, 6]}, geometry=[Point(0, 0.5).buffer(0.6), Point(2.5, 0.5).buffer(0.51)],
+                                 crs='EPSG:4326')
+    volcanoes.to_file(tmp_path / config['folder'] / config['files'][0])
+    adm_units = gpd.GeoDataFrame(geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1), box(5, 5, 6, 6)], crs='EPSG:4326')
+
+    # Case 1: Max VEI among buffers meeting the area threshold, remapped to score; -1 when not affected
+    result = process_volcano_hazard(adm_units, 'volcano', 2, 1.0)
+    assert list(result['VEI_max']) == [4, 0, 0]
+    assert list(result['Hazard_score']) == [2, -1, -1]
+
+    # Case 2: Without area threshold, touching buffers count
+    result = process_volcano_hazard(adm_units, 'volcano', 2, 0.0)
+    assert list(result['VEI_max']) == [4, 6, 0]
+    assert list(result['Hazard_score']) == [2, 3, -1]
+
+
+def test_process_multi_hazard(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(TH_HZD_utils.common, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(TH_HZD_utils.threshold_engine.zonal_utils, "ZONES_CACHE_DIR", str(tmp_path / "zones"))
+    config = HAZARD_CONFIG['volcano']
+    os.makedirs(tmp_path / config['folder'])
+    volcanoes = gpd.GeoDataFrame({'VEI': [4]}, geometry=[Point(0, 0.5).buffer(0.6)], crs='EPSG:4326')
+    volcanoes.to_file(tmp_path / config['folder'] / config['files'][0])
+    # Fire weather index of 60 on the first unit only, for every RP
+    config = HAZARD_CONFIG['wildfire']
+    os.makedirs(tmp_path / config['folder'])
+    fwi = np.zeros((2, 4))
+    fwi[:, :2] = 60
+    for filename in config['files']:
+        with rasterio.open(tmp_path / config['folder'] / filename, 'w', driver='GTiff', height=2, width=4, count=1,
+                           dtype='float32', crs='EPSG:4326', transform=from_origin(0, 1, 0.5, 0.5)) as dst:
+            dst.write(fwi.astype('float32'), 1)
+    adm_units = gpd.GeoDataFrame({'ADM_NAME': ['A', 'B']}, geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1)], crs='EPSG:4326')
+
+    # Case 1: One Hazard_score column per hazard, for the same units
+    result = TH_HZD_utils.process_multi_hazard(adm_units, ['volcano', 'wildfire'], cores=1)
+    assert list(result['ADM_NAME']) == ['A', 'B']
+    assert list(result['volcano_Hazard_score']) == [2, -1]
+    assert list(result['wildfire_Hazard_score']) == [3, -1]
+    assert 'unit_area_m2' in result.columns
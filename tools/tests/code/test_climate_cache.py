@@ -0,0 +1,35 @@
+import numpy as np
+from shapely.geometry import box
+from tools.code.climate_cache import cube_path, get_layers, layer_key, read_layers
+
+
+def test_get_layers(tmp_path):
+
+    geoms = [box(0, 0, 1, 1), box(1, 0, 2, 1)]
+    keys = [layer_key('tas', 'historical', '1995-2014', 'historical'), layer_key('tas', 'ssp245', '2040-2059', 'change_none')]
+    calls = []
+
+    def compute(missing):
+        calls.append(missing)
+        return {key: np.full(2, float(len(calls) * 10 + i)) for i, key in enumerate(missing)}
+
+    # Case 1: Empty cache, every layer is computed
+    values = get_layers(geoms, keys, compute, cache_dir=tmp_path)
+    assert calls == [keys]
+    np.testing.assert_array_equal(values[1], [11, 11])
+
+    # Case 2: Every layer served from the cache
+    values = get_layers(geoms, keys, compute, cache_dir=tmp_path)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(values[0], [10, 10])
+
+    # Case 3: Incremental fill, only the missing layer is computed and added to the cube
+    new_key = layer_key('tas', 'ssp245', '2040-2059', 'change_epsilon')
+    values = get_layers(geoms, [keys[0], new_key], compute, cache_dir=tmp_path)
+    assert calls[-1] == [new_key]
+    np.testing.assert_array_equal(values[1], [20, 20])
+    assert sorted(read_layers(geoms, keys + [new_key], cache_dir=tmp_path)) == sorted(keys + [new_key])
+
+    # Case 4: One cube per boundary set
+    assert cube_path(geoms, tmp_path) != cube_path(geoms[:1], tmp_path)
+    assert read_layers(geoms[:1], keys, cache_dir=tmp_path) == {}
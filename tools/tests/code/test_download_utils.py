@@ -0,0 +1,92 @@
+import pytest
+import os
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tools.code.download_utils import download, download_many, parse_checksum
+
+CONTENT = bytes(range(256)) * 1000
+
+
+@pytest.fixture
+def file_server():
+    """Local HTTP server serving CONTENT at any path, with support for Range requests."""
+    ranges = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = 0
+            if 'Range' in self.headers:
+                start = int(self.headers['Range'].split('=')[1].split('-')[0])
+                ranges.append(start)
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}")
+            else:
+                self.send_response(200)
+            self.send_header('Content-Length', str(len(CONTENT) - start))
+            self.end_headers()
+            self.wfile.write(CONTENT[start:])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", ranges
+    server.shutdown()
+
+
+def test_parse_checksum():
+
+    digest = hashlib.sha256(b'').hexdigest()
+
+    # Case 1: Algorithm prefix
+    assert parse_checksum(f"SHA256:{digest}") == ('sha256', digest)
+
+    # Case 2: STAC SHA-256 multihash
+    assert parse_checksum(f"1220{digest}") == ('sha256', digest)
+
+    # Case 3: Unsupported or missing
+    assert parse_checksum("abc") is None
+    assert parse_checksum(None) is None
+
+
+def test_download(tmp_path, file_server):
+
+    url, ranges = file_server
+    checksum = f"sha256:{hashlib.sha256(CONTENT).hexdigest()}"
+
+    # Case 1: Complete download, verified and renamed
+    dest_path = os.path.join(tmp_path, "a.tif")
+    assert download(f"{url}/a.tif", dest_path, size=len(CONTENT), checksum=checksum) == dest_path
+    assert open(dest_path, 'rb').read() == CONTENT
+    assert not os.path.exists(f"{dest_path}.part")
+
+    # Case 2: A partial download is resumed from where it stopped
+    dest_path = os.path.join(tmp_path, "b.tif")
+    with open(f"{dest_path}.part", 'wb') as f:
+        f.write(CONTENT[:1000])
+    download(f"{url}/b.tif", dest_path, checksum=checksum)
+    assert ranges == [1000]
+    assert open(dest_path, 'rb').read() == CONTENT
+
+    # Case 3: Checksum mismatch
+    with pytest.raises(IOError):
+        download(f"{url}/c.tif", os.path.join(tmp_path, "c.tif"), checksum=f"sha256:{'0' * 64}")
+    assert not os.path.exists(os.path.join(tmp_path, "c.tif"))
+
+
+def test_download_many(tmp_path, file_server):
+
+    url, _ = file_server
+    jobs = [{'url': f"{url}/{i}.tif", 'dest_path': os.path.join(tmp_path, f"{i}.tif"), 'size': len(CONTENT)}
+            for i in range(5)]
+
+    # Case 1: Concurrent downloads, paths returned in the order of the jobs
+    paths = download_many(jobs, max_workers=3)
+    assert paths == [job['dest_path'] for job in jobs]
+    assert all(os.path.getsize(path) == len(CONTENT) for path in paths)
+
+    # Case 2: Each file is post-processed as soon as it is downloaded
+    jobs = [{'url': f"{url}/p{i}.tif", 'dest_path': os.path.join(tmp_path, f"p{i}.tif")} for i in range(3)]
+    assert download_many(jobs, postprocess=os.path.getsize) == [len(CONTENT)] * 3
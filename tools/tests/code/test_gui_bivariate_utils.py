@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from tools.code.gui_bivariate_utils import classify_data, quantile_classes
+
+
+def test_quantile_classes():
+
+    # Case 1: Continuous values, same classes as pd.qcut
+    values = np.arange(9) * 1.5 + 0.1
+    np.testing.assert_array_equal(quantile_classes(values, 3, 'hazard'),
+                                  pd.qcut(values, 3, labels=False, duplicates='drop'))
+
+    # Case 2: Tied values, the top class is not reached by pd.qcut and percentile breaks are used instead
+    np.testing.assert_array_equal(quantile_classes(np.array([0, 0, 0, 0, 0, 0, 0, 1, 2, 3.]), 3, 'hazard'),
+                                  [1, 1, 1, 1, 1, 1, 1, 2, 2, 2])
+
+    # Case 3: NaN values get class 0, after the percentile breaks as well, and are left out of the breaks
+    np.testing.assert_array_equal(quantile_classes(np.array([1, 2, 3, 4, 5, 6, np.nan]), 3, 'hazard'),
+                                  [0, 0, 1, 1, 2, 2, 0])
+    np.testing.assert_array_equal(quantile_classes(np.array([0, 0, 0, 0, 0, 0, 0, 1, 2, np.nan]), 3, 'hazard'),
+                                  [2, 2, 2, 2, 2, 2, 2, 2, 2, 0])
+    np.testing.assert_array_equal(quantile_classes(np.array([0, 0, 0, 0, 0, 0, 1, 2, 3, 4, np.nan]), 3, 'hazard'),
+                                  [1, 1, 1, 1, 1, 1, 1, 2, 2, 2, 0])
+
+    # Case 4: Constant values
+    np.testing.assert_array_equal(quantile_classes(np.array([1., 1, 1]), 3, 'hazard'), [0, 0, 0])
+
+
+def test_classify_data():
+
+    # Case 1: Continuous wealth and tied hazard values
+    gdf = pd.DataFrame({'rwi': np.arange(10) + 0.5, 'hazard': [0, 0, 0, 0, 0, 0, 0, 1, 2, 3.]})
+    result = classify_data(gdf, 'rwi', 'hazard', 3)
+    assert list(result['wealth_quantile']) == [0, 0, 0, 0, 1, 1, 1, 2, 2, 2]
+    assert list(result['hazard_quantile']) == [1, 1, 1, 1, 1, 1, 1, 2, 2, 2]
+    assert list(result['bivariate_class']) == [1, 1, 1, 1, 4, 4, 4, 8, 8, 8]
+    assert 'bivariate_class' not in gdf.columns
+
+    # Case 2: Pre-binned wealth data, mapped linearly onto the classes
+    gdf = pd.DataFrame({'rwi': [1., 2, 3, 4, 5], 'hazard': [1.5, 2.5, 3.5, 4.5, 5.5]})
+    result = classify_data(gdf, 'rwi', 'hazard', 3)
+    assert list(result['wealth_quantile']) == [0, 0, 1, 2, 2]
+    assert list(result['bivariate_class']) == [0, 0, 4, 8, 8]
+
+    # Case 3: Constant hazard and missing hazard values
+    gdf = pd.DataFrame({'rwi': [0.5, 1.5, 2.5], 'hazard': [1., 1, 1]})
+    assert list(classify_data(gdf, 'rwi', 'hazard', 3)['bivariate_class']) == [0, 3, 6]
+    gdf = pd.DataFrame({'rwi': np.arange(7) + 0.5, 'hazard': [1, 2, 3, 4, 5, 6, np.nan]})
+    assert list(classify_data(gdf, 'rwi', 'hazard', 3)['bivariate_class']) == [0, 0, 1, 4, 5, 8, 6]
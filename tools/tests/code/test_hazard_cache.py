@@ -0,0 +1,51 @@
+import os
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from tools.code.hazard_cache import get_aligned_hazard, prune_hazard_cache
+
+
+def write_hazard(path, data):
+    with rasterio.open(path, 'w', driver='GTiff', height=data.shape[0], width=data.shape[1], count=1,
+                       dtype='float32', crs='EPSG:4326', transform=from_origin(0, 4, 1, 1), nodata=-9999) as dst:
+        dst.write(data, 1)
+
+
+def test_get_aligned_hazard(tmp_path):
+
+    hazard_file = os.path.join(tmp_path, "1in10.tif")
+    write_hazard(hazard_file, np.arange(16, dtype='float32').reshape(4, 4))
+    cache_dir = os.path.join(tmp_path, "cache")
+    transform = from_origin(0, 4, 0.5, 0.5)
+
+    # Case 1: Hazard aligned to a finer grid, stored as a COG keeping nodata
+    aligned = get_aligned_hazard(hazard_file, 'EPSG:4326', transform, (8, 8), cache_dir=cache_dir)
+    with rasterio.open(aligned) as src:
+        assert src.shape == (8, 8)
+        assert src.nodata == -9999
+        assert src.read(1)[3, 7] == 7
+
+    # Case 2: Same source and grid are served from the cache
+    assert get_aligned_hazard(hazard_file, 'EPSG:4326', transform, (8, 8), cache_dir=cache_dir) == aligned
+    assert len(os.listdir(cache_dir)) == 1
+
+    # Case 3: A modified source gives a new cached raster
+    os.utime(hazard_file, (0, 0))
+    assert get_aligned_hazard(hazard_file, 'EPSG:4326', transform, (8, 8), cache_dir=cache_dir) != aligned
+
+
+def test_prune_hazard_cache(tmp_path):
+
+    for i, name in enumerate(["old.tif", "mid.tif", "new.tif"]):
+        path = os.path.join(tmp_path, name)
+        with open(path, 'wb') as f:
+            f.write(b'0' * 100)
+        os.utime(path, (i, i))
+
+    # Case 1: Least recently used rasters are removed first
+    removed = prune_hazard_cache(max_bytes=150, cache_dir=tmp_path)
+    assert [os.path.basename(path) for path in removed] == ["old.tif", "mid.tif"]
+    assert os.listdir(tmp_path) == ["new.tif"]
+
+    # Case 2: Nothing to remove within the limit
+    assert prune_hazard_cache(max_bytes=150, cache_dir=tmp_path) == []
@@ -1,4 +1,10 @@
 import pytest
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import common
+from tools.code import input_utils
 from tools.code.input_utils import get_layer_id_for_adm, get_adm_data
 from tools.code.common import rest_api_url
 import requests
@@ -52,3 +58,70 @@ def test_get_adm_data():
     with pytest.raises(Exception) as exc_info:
         _ = get_adm_data(country='XYZ', adm_level=1)
     assert str(exc_info.value) == 'No features found for the specified query.'
+
+
+@pytest.fixture
+def local_adm_service(tmp_path, monkeypatch):
+    """Local stand-in for the boundaries REST service, serving two ADM1 units of country 'TST'."""
+    requests_log = []
+    features = [
+        {"type": "Feature", "properties": {"ISO_A3": "TST", "NAM_1": name},
+         "geometry": {"type": "Polygon", "coordinates": [[[x, 0], [x + 1, 0], [x + 1, 1], [x, 1], [x, 0]]]}}
+        for x, name in [(0, "North"), (1, "South")]
+    ]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            requests_log.append(url.path)
+            if url.path == "/layers":
+                body = {"layers": [{"id": 7, "name": "WB_GAD_ADM1"}]}
+            else:
+                query = parse_qs(url.query)
+                where = query["where"][0]
+                body = {"type": "FeatureCollection", "features": features if "'TST'" in where else []}
+                # Paging needs a stable order
+                if "resultOffset" in query and query.get("orderByFields") != ["OBJECTID ASC"]:
+                    body = {"error": {"code": 400, "message": "Pagination requires orderByFields"}}
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(common, "rest_api_url", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(input_utils, "ADM_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(input_utils, "ADM_MEMORY_CACHE", {})
+    yield requests_log
+    server.shutdown()
+
+
+def test_adm_store(local_adm_service):
+
+    # Case 1: First request fetches the layer list and the boundaries from the service
+    gdf = get_adm_data(country='TST', adm_level=1)
+    assert list(gdf['NAM_1']) == ['North', 'South']
+    assert gdf.crs == 'EPSG:4326'
+    assert local_adm_service == ['/layers', '/7/query']
+
+    # Case 2: Later requests are served from the local store, without querying the service
+    input_utils.ADM_MEMORY_CACHE.clear()
+    stored = get_adm_data(country='TST', adm_level=1)
+    assert list(stored['NAM_1']) == ['North', 'South']
+    assert list(stored.columns) == list(gdf.columns) == ['ISO_A3', 'NAM_1', 'geometry']
+    assert get_layer_id_for_adm(adm_level=1) == 7
+    assert len(local_adm_service) == 2
+
+    # Case 3: Offline mode only uses the store
+    assert len(get_adm_data(country='TST', adm_level=1, offline=True)) == 2
+    with pytest.raises(ValueError):
+        _ = get_adm_data(country='XYZ', adm_level=1, offline=True)
+    assert len(local_adm_service) == 2
+
+    # Case 4: Unknown country
+    with pytest.raises(Exception) as exc_info:
+        _ = get_adm_data(country='XYZ', adm_level=1)
+    assert str(exc_info.value) == 'No features found for the specified query.'
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+from tools.code.netcdf_utils import align_grids, clip_to_bounds, open_netcdf, year_index_map
+
+
+def make_dataset(lons):
+    """Small global dataset on a 1° grid with 24 monthly time steps."""
+    lats = np.arange(-89.5, 90, 1.0)
+    time = pd.date_range("2000-01-01", periods=24, freq="MS")
+    data = np.random.rand(len(time), len(lats), len(lons)).astype('float32')
+    return xr.Dataset({'tas': (('time', 'lat', 'lon'), data)}, coords={'time': time, 'lat': lats, 'lon': lons})
+
+
+def test_clip_to_bounds():
+
+    ds = make_dataset(np.arange(-179.5, 180, 1.0))
+
+    # Case 1: Window around the bounds, with the default buffer of 1°
+    clipped = clip_to_bounds(ds, (10, 40, 20, 45))
+    assert clipped['lat'].values.min() >= 39 and clipped['lat'].values.max() <= 46
+    assert clipped['lon'].values.min() >= 9 and clipped['lon'].values.max() <= 21
+
+    # Case 2: Window across the antimeridian
+    clipped = clip_to_bounds(ds, (178, -20, 179.9, -15))
+    assert set(clipped['lon'].values) >= {177.5, 179.5, -179.5}
+    assert -178.5 not in clipped['lon'].values
+
+    # Case 3: Grid in 0-360 longitudes, bounds in -180-180
+    ds = make_dataset(np.arange(0.5, 360, 1.0))
+    clipped = clip_to_bounds(ds, (-5, 0, 5, 10))
+    assert set(clipped['lon'].values) >= {355.5, 359.5, 0.5, 5.5}
+    assert clipped['lon'].values.max() <= 360 and len(clipped['lon']) < 20
+
+
+def test_align_grids():
+
+    lats, lons = np.arange(0.5, 3, 1.0), np.arange(10.5, 14, 1.0)
+    hist = xr.DataArray(np.ones((1, 3, 4)), dims=('time', 'lat', 'lon'),
+                        coords={'time': pd.to_datetime(["1995-01-01"]), 'lat': lats, 'lon': lons})
+    anom = xr.DataArray(np.full((1, 3, 4), 2.0), dims=('time', 'lat', 'lon'),
+                        coords={'time': pd.to_datetime(["2050-01-01"]), 'lat': lats, 'lon': lons})
+
+    # Case 1: Different time stamps, arithmetic is cell by cell instead of an empty label join
+    assert (hist + anom).sizes['time'] == 0
+    hist_data, anom_data = align_grids(hist, anom)
+    future = hist_data + anom_data
+    assert future.dims == ('lat', 'lon')
+    np.testing.assert_array_equal(future.values, np.full((3, 4), 3.0))
+    np.testing.assert_array_equal((100 * anom_data / (hist_data + 5.0)).values, np.full((3, 4), 100 / 3))
+
+    # Case 2: Different grids, data interpolated onto the reference grid
+    anom = anom.assign_coords(lat=lats + 0.25)
+    hist_data, anom_data = align_grids(hist, anom)
+    np.testing.assert_array_equal(anom_data.lat.values, lats)
+    np.testing.assert_allclose((hist_data + anom_data).values, np.full((3, 4), 3.0))
+
+
+def test_open_netcdf(tmp_path):
+
+    file_path = str(tmp_path / "tas.nc")
+    make_dataset(np.arange(-179.5, 180, 1.0)).to_netcdf(file_path)
+
+    # Case 1: Lazy dataset clipped to the bounds
+    ds = open_netcdf(file_path, 'tas', bounds=(10, 40, 20, 45))
+    assert ds['tas'].chunks is not None
+    assert ds.sizes['lat'] < 180 and ds.sizes['lon'] < 360
+
+    # Case 2: Years of the time steps
+    year_map = year_index_map(ds)
+    assert list(year_map) == [2000, 2001]
+    assert list(year_map[2001]) == list(range(12, 24))
+    ds.close()
+
+    # Case 3: Missing variable
+    assert open_netcdf(file_path, 'pr') is None
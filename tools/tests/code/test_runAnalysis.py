@@ -1,6 +1,13 @@
+import os
 import pytest
+import numpy as np
 import pandas as pd
-from tools.code.runAnalysis import chunks, result_df_reorder_columns
+import rasterio
+from rasterio.transform import from_origin
+from shapely.geometry import box
+from tools.code import runAnalysis
+from tools.code.runAnalysis import calc_EAEI, calc_imp_RPs, chunks, result_df_reorder_columns, share_exposure
+from tools.code.zonal_utils import get_zone_labels
 
 
 def test_chunks():
@@ -67,3 +74,81 @@ def test_result_df_reorder_columns():
             adm_level=1, all_adm_codes=['ADM1_code'], all_adm_names=['ADM1_name']
         )
     assert str(exc_inf.value) == '"[\'RP20_Category1_exp\'] not in index"'
+
+
+def test_share_exposure(tmp_path):
+
+    exp_ras = os.path.join(tmp_path, "exp.tif")
+    data = np.arange(15, dtype='float32').reshape(5, 3)
+    data[0, 0] = -9999
+    data[4, 2] = -1
+    with rasterio.open(exp_ras, 'w', driver='GTiff', height=5, width=3, count=1, dtype='float32',
+                       crs='EPSG:4326', transform=from_origin(0, 5, 1, 1), nodata=-9999) as dst:
+        dst.write(data, 1)
+
+    # Case 1: Nodata as NaN and negative values as 0, written band by band
+    exp_path = share_exposure(exp_ras, block_size=2)
+    expected = data.copy()
+    expected[0, 0] = np.nan
+    expected[4, 2] = 0
+    np.testing.assert_array_equal(np.load(exp_path, mmap_mode='r'), expected)
+    os.remove(exp_path)
+
+
+def test_calc_imp_RPs(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(runAnalysis.hazard_cache, "HAZARD_CACHE_DIR", str(tmp_path / "hazards"))
+    monkeypatch.setattr(runAnalysis.zonal_utils, "ZONES_CACHE_DIR", str(tmp_path / "zones"))
+
+    profile = {'driver': 'GTiff', 'height': 2, 'width': 2, 'count': 1, 'dtype': 'float32',
+               'crs': 'EPSG:4326', 'transform': from_origin(0, 2, 1, 1)}
+    with rasterio.open(os.path.join(tmp_path, "1in10.tif"), 'w', **profile) as dst:
+        dst.write(np.array([[0, 1], [2, 3]], dtype='float32'), 1)
+    exposures = []
+    for exp_cat, scale in [('POP', 1), ('BU', 10)]:
+        exp_ras = os.path.join(tmp_path, f"{exp_cat}.tif")
+        with rasterio.open(exp_ras, 'w', **profile) as dst:
+            dst.write(np.ones((2, 2), dtype='float32') * scale, 1)
+        exposures.append({"exp_cat": exp_cat, "exp_ras": exp_ras, "exp_path": None, "damage_factor": None})
+    zones_path = get_zone_labels([box(0, 0, 1, 2), box(1, 0, 2, 2)], profile['transform'], (2, 2),
+                                 cache_dir=tmp_path)
+
+    # Case 1: One hazard read applied to every exposure category, per ADM unit and cumulated over classes
+    result = calc_imp_RPs([10], str(tmp_path), 'Classes', 'TST', 'FL', '2020', '', exposures, 0, False,
+                          [2, np.inf], 2, zones_path, 2, None, block_size=1)
+    assert list(result) == ['POP', 'BU']
+    np.testing.assert_allclose(result['POP']["RP10_POP_C0_exp"], [1, 2])
+    np.testing.assert_allclose(result['POP']["RP10_POP_C1_exp"], [1, 1])
+    np.testing.assert_allclose(result['BU']["RP10_BU_C0_exp"], [10, 20])
+
+
+def test_calc_EAEI():
+
+    prob_RPs_df = pd.DataFrame({'RPs': [10, 100], 'prob_RPs': [0.1, 0.01], 'prob_RPs_LB': [0.09, 0.01],
+                                'prob_RPs_UB': [0., 0.09], 'prob_RPs_Mean': [0.045, 0.05]})
+    df = pd.DataFrame({
+        "ADM1_POP": [100., 0.],
+        "RP10_POP_exp": [10., 20.],
+        "RP10_POP_imp": [10., 20.],
+        "RP100_POP_exp": [50., 60.],
+        "RP100_POP_imp": [50., 60.],
+    })
+
+    # Case 1: All methods at once, same columns as one call per method
+    result = calc_EAEI(df, [10, 100], prob_RPs_df, ['LB', 'UB'], 'Function', 'POP', 1, None, True)
+    expected = calc_EAEI(calc_EAEI(df, [10, 100], prob_RPs_df, 'LB', 'Function', 'POP', 1, None, True),
+                         [10, 100], prob_RPs_df, 'UB', 'Function', 'POP', 1, None, True)
+    pd.testing.assert_frame_equal(result, expected)
+    assert list(result.columns[-4:]) == ["POP_EAI_LB", "POP_EAI%_LB", "POP_EAI_UB", "POP_EAI%_UB"]
+    np.testing.assert_allclose(result["POP_EAI_LB"], [1.4, 2.4])
+    np.testing.assert_allclose(result["POP_EAI%_LB"], [1.4, np.inf])
+
+    # Case 2: Classes, from the highest class down
+    df_classes = pd.DataFrame({"ADM1_POP": [100.], "RP10_POP_C1_exp": [10.], "RP10_POP_C0_exp": [20.],
+                               "RP100_POP_C1_exp": [30.], "RP100_POP_C0_exp": [40.]})
+    result = calc_EAEI(df_classes, [10, 100], prob_RPs_df, 'Mean', 'Classes', 'POP', 1, 2, True)
+    assert list(result.columns[-4:]) == ["POP_C1_EAE_Mean", "POP_C0_EAE_Mean", "POP_C1_EAE%_Mean", "POP_C0_EAE%_Mean"]
+    np.testing.assert_allclose(result["POP_C0_EAE_Mean"], [2.9])
+
+    # Case 3: Nothing to compute with a single return period
+    pd.testing.assert_frame_equal(calc_EAEI(df, [10], prob_RPs_df, 'LB', 'Function', 'POP', 1, None, False), df)
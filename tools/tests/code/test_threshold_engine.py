@@ -0,0 +1,184 @@
+import os
+import pytest
+import numpy as np
+import rasterio
+import geopandas as gpd
+from rasterio.transform import from_origin
+from shapely.geometry import Polygon, box
+from rasterstats import zonal_stats
+from tools.code import threshold_engine
+from tools.code.threshold_engine import (
+    add_histograms, add_to_histogram, calculate_hazard_score, calculate_mean_above_threshold,
+    partition_class_areas, run_threshold_analysis, zonal_rp_stats
+)
+
+
+def write_raster(path, data, nodata=-9999, crs='EPSG:3857'):
+    # Projected grid by default, with pixels of 1 m², so that pixel areas equal pixel counts
+    with rasterio.open(path, 'w', driver='GTiff', height=data.shape[0], width=data.shape[1], count=1,
+                       dtype='float32', crs=crs, transform=from_origin(0, 4, 1, 1), nodata=nodata) as dst:
+        dst.write(data.astype('float32'), 1)
+
+
+def test_calculate_mean_above_threshold():
+
+    # Case 1: Only values above the threshold are averaged, None values are ignored
+    assert calculate_mean_above_threshold([0, 2, None, 4], threshold=0) == 3
+
+    # Case 2: No value above the threshold
+    assert calculate_mean_above_threshold([0, -1], threshold=0) == 0
+    assert calculate_mean_above_threshold([], threshold=0) == 0
+
+
+def test_calculate_hazard_score():
+
+    # Case 1: Scalar statistics of one unit
+    assert calculate_hazard_score(10, 5, (20, 10), (5, 10), (20, 1)) == 1
+
+    # Case 2: Arrays of statistics, one score per unit
+    scores = calculate_hazard_score(10, 5, (np.array([20, 5, 20]), np.array([10, 10, 1])),
+                                    (np.array([20, 20, 0]), np.array([5, 50, 0])))
+    np.testing.assert_array_equal(scores, [2, 1, 0])
+
+
+def test_add_to_histogram():
+
+    histogram = np.zeros((3, 0), dtype='int64')
+
+    # Case 1: Histogram widened to the largest bin
+    histogram = add_to_histogram(histogram, np.array([0, 0, 2]), np.array([1, 3, 1]))
+    np.testing.assert_array_equal(histogram, [[0, 1, 0, 1], [0, 0, 0, 0], [0, 1, 0, 0]])
+
+    # Case 2: Adding histograms of different widths
+    np.testing.assert_array_equal(add_histograms(histogram, np.ones((3, 2), dtype='int64')),
+                                  [[1, 2, 0, 1], [1, 1, 0, 0], [1, 2, 0, 0]])
+
+
+def test_zonal_rp_stats(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(threshold_engine.zonal_utils, "ZONES_CACHE_DIR", str(tmp_path))
+    rp1 = np.array([
+        [0, 1, 3, -9999, 0, 0],
+        [2, 0, 3, 0, 0, 7],
+        [np.nan, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0],
+    ])
+    paths = [os.path.join(tmp_path, "RP1.tif"), os.path.join(tmp_path, "RP2.tif")]
+    write_raster(paths[0], rp1)
+    write_raster(paths[1], rp1 * 2)
+    # Left unit covers columns 0-2 of the top three rows, right unit covers columns 4-5 of the top two rows
+    geoms = [box(0.1, 1.1, 2.9, 3.9), box(4.1, 2.1, 5.9, 3.9)]
+
+    # Case 1: All RPs in one traversal, in one window or several windows split among workers
+    for block_size, cores in [(2048, 1), (2, 2)]:
+        stats = zonal_rp_stats(paths, geoms, [2, 2], majority_step=0.5, block_size=block_size, cores=cores)
+        np.testing.assert_array_equal(stats[0]['area'], [8, 4])
+        np.testing.assert_array_equal(stats[0]['sum'], [9, 7])
+        np.testing.assert_array_equal(stats[0]['area_positive'], [4, 1])
+        np.testing.assert_array_equal(stats[0]['area_above'], [2, 1])
+        np.testing.assert_array_equal(stats[0]['majority'], [3, 7])
+        np.testing.assert_array_equal(stats[1]['sum_positive'], [18, 14])
+        np.testing.assert_array_equal(stats[1]['area_above'], [3, 1])
+
+    # Case 2: Nodata value of each raster and minimum valid value
+    stats = zonal_rp_stats(paths, geoms, [2, 2], nodata=[None, 0], min_value=1)
+    np.testing.assert_array_equal(stats[0]['area'], [4, 1])
+    np.testing.assert_array_equal(stats[1]['area'], [4, 1])
+
+    # Case 3: Geographic grid, pixels weighted by their area on the ellipsoid, smaller towards the poles
+    write_raster(paths[0], np.ones((4, 6)), crs='EPSG:4326')
+    stats = zonal_rp_stats(paths[:1], [box(0.1, 2.1, 0.9, 3.9)], [0])
+    row_areas = threshold_engine.zonal_utils.pixel_row_areas(from_origin(0, 4, 1, 1), 4)
+    np.testing.assert_allclose(stats[0]['area'], [row_areas[0] + row_areas[1]])
+    assert row_areas[0] < row_areas[1]
+
+
+
+def test_zonal_rp_stats_shared_pixels(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(threshold_engine.zonal_utils, "ZONES_CACHE_DIR", str(tmp_path))
+    values = np.arange(24, dtype='float64').reshape(4, 6)
+    values[1, 1] = -9999
+    raster_path = os.path.join(tmp_path, "RP1.tif")
+    write_raster(raster_path, values)
+    with rasterio.open(raster_path) as src:
+        transform = src.transform
+
+    # Case 1: Two units covering half of one pixel each both count it, like rasterstats with all_touched
+    halves = [box(2.1, 2.1, 2.5, 2.9), box(2.5, 2.1, 2.9, 2.9)]
+    stats = zonal_rp_stats([raster_path], halves, [0], cores=1)
+    np.testing.assert_array_equal(stats[0]['area'], [1, 1])
+    np.testing.assert_array_equal(stats[0]['sum'], [8, 8])
+
+    # Case 2: Neighbours sharing border pixels, an overlapping unit and a sub-pixel unit, in several windows
+    geoms = [Polygon([(0, 0), (3.5, 0), (3.5, 4), (0.2, 2.6)]), Polygon([(3.5, 0), (6, 0), (6, 4), (3.5, 4)]),
+             box(1.5, 0.5, 4.5, 3.5), box(5.2, 0.2, 5.4, 0.4)]
+    expected = zonal_stats(geoms, values, affine=transform, nodata=-9999, all_touched=True, stats=['count', 'sum'])
+    for block_size, cores in [(2048, 1), (2, 2)]:
+        stats = zonal_rp_stats([raster_path], geoms, [0], block_size=block_size, cores=cores)
+        np.testing.assert_array_equal(stats[0]['area'], [unit['count'] for unit in expected])
+        np.testing.assert_array_equal(stats[0]['sum'], [unit['sum'] for unit in expected])
+
+def test_partition_class_areas(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(threshold_engine.zonal_utils, "ZONES_CACHE_DIR", str(tmp_path))
+    index = np.array([
+        [1, 2, 5, 0, 3, 3],
+        [5, 5, 2, 0, 4, 1],
+        [0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0],
+    ])
+    raster_path = os.path.join(tmp_path, "LS.tif")
+    write_raster(raster_path, index)
+    # First unit covers columns 0-2 of the top two rows, second unit columns 4-5, third unit is off the raster
+    geoms = np.array([box(0.1, 2.1, 2.9, 3.9), box(4.1, 2.1, 5.9, 3.9), box(10, 10, 11, 11)], dtype=object)
+
+    # Case 1: Area per class (1 m² pixels), for the units of the partition only
+    for block_size in (2048, 2):
+        indices, areas = partition_class_areas((np.array([4, 7, 9]), geoms, raster_path), block_size=block_size)
+        np.testing.assert_array_equal(indices, [4, 7, 9])
+        np.testing.assert_array_equal(areas, [[0, 1, 2, 0, 0, 3], [0, 1, 0, 2, 1, 0], [0, 0, 0, 0, 0, 0]])
+
+    # Case 2: Fewer classes, values above them counted as other valid values
+    _, areas = partition_class_areas((np.array([0]), geoms[:1], raster_path), n_classes=3)
+    np.testing.assert_array_equal(areas, [[3, 1, 2, 0]])
+
+    # Case 3: Units covering half of one pixel each both count it
+    _, areas = partition_class_areas((np.array([0, 1]), [box(2.1, 2.1, 2.5, 2.9), box(2.5, 2.1, 2.9, 2.9)],
+                                      raster_path))
+    np.testing.assert_array_equal(areas, [[0, 0, 1, 0, 0, 0], [0, 0, 1, 0, 0, 0]])
+
+
+def test_run_threshold_analysis(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(threshold_engine.zonal_utils, "ZONES_CACHE_DIR", str(tmp_path))
+    depth = np.array([
+        [0, 5, 50, -32767, 0, 0],
+        [120, 0, 30, 0, 0, 200],
+        [-32767, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0],
+    ])
+    raster_path = os.path.join(tmp_path, "1in10.tif")
+    write_raster(raster_path, depth, nodata=-32767)
+    adm_units = gpd.GeoDataFrame(geometry=[box(0.1, 1.1, 2.9, 3.9), box(4.1, 2.1, 5.9, 3.9), box(10, 10, 11, 11)],
+                                 crs='EPSG:3857')
+    config = {'name': 'FLUVIAL', 'type': 'raster_flood', 'paths': {'RP10': raster_path},
+              'nodata': {'RP10': -32767}, 'min_value': 0}
+
+    # Case 1: Mean of values > 0 and percentage of valid pixels above the value threshold, scored per unit
+    result = run_threshold_analysis(adm_units, config, value_threshold=20, area_threshold_pct=30)
+    np.testing.assert_allclose(result['RP10_mean'], [51.25, 200, 0])
+    np.testing.assert_allclose(result['RP10_affected_pct'], [37.5, 25, 0])
+    assert list(result['Hazard_score']) == [1, 0, 0]
+    assert 'Hazard_score' not in adm_units.columns
+
+    # Case 2: Units smaller than a pixel still get the flood depth of the pixels they touch
+    halves = gpd.GeoDataFrame(geometry=[box(2.1, 2.1, 2.5, 2.9), box(2.5, 2.1, 2.9, 2.9)], crs='EPSG:3857')
+    result = run_threshold_analysis(halves, config, value_threshold=20, area_threshold_pct=30)
+    np.testing.assert_allclose(result['RP10_mean'], [30, 30])
+    np.testing.assert_allclose(result['RP10_affected_pct'], [100, 100])
+    assert list(result['Hazard_score']) == [1, 1]
+
+    # Case 3: Hazard type without a registered reducer
+    with pytest.raises(ValueError):
+        run_threshold_analysis(adm_units, {'type': 'unknown'}, 20, 30)
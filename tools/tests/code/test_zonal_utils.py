@@ -0,0 +1,252 @@
+import pytest
+import numpy as np
+import os
+from affine import Affine
+from shapely.geometry import MultiPolygon, box
+from rasterstats import zonal_stats
+from tools.code.zonal_utils import (
+    boundary_hash, block_windows, bounds_window, coverage_reduce, coverage_weights, get_shared_pixels, get_zone_labels,
+    has_nested_multiparts, pixel_row_areas, prune_zones_cache, zonal_majority, zonal_reduce, zonal_sum
+)
+
+
+def test_boundary_hash():
+
+    geoms = [box(0, 0, 1, 1), box(1, 0, 2, 1)]
+
+    # Case 1: Same geometries, same hash
+    assert boundary_hash(geoms) == boundary_hash([box(0, 0, 1, 1), box(1, 0, 2, 1)])
+
+    # Case 2: Hash depends on the order of the geometries
+    assert boundary_hash(geoms) != boundary_hash(geoms[::-1])
+
+
+def test_get_zone_labels(tmp_path):
+
+    transform = Affine(0.5, 0, 0, 0, -0.5, 2)
+    geoms = [box(0, 0, 2, 2), box(0.5, 0.5, 1.5, 1.5)]
+
+    # Case 1: Smaller units are burnt last, so the nested one keeps its label
+    labels_path = get_zone_labels(geoms, transform, (4, 6), cache_dir=tmp_path)
+    labels = np.load(labels_path)
+    expected = np.array([
+        [1, 1, 1, 1, 0, 0],
+        [1, 2, 2, 1, 0, 0],
+        [1, 2, 2, 1, 0, 0],
+        [1, 1, 1, 1, 0, 0],
+    ])
+    np.testing.assert_array_equal(labels, expected)
+
+    # Case 2: Same boundaries and grid are served from the cache
+    assert get_zone_labels(geoms, transform, (4, 6), cache_dir=tmp_path) == labels_path
+    assert len(os.listdir(tmp_path)) == 1
+
+    # Case 3: A different grid gives a new label raster
+    assert get_zone_labels(geoms, transform, (4, 4), cache_dir=tmp_path) != labels_path
+
+    # Case 4: Rasterizing in bands of rows gives the same labels
+    banded_path = get_zone_labels(geoms, transform, (4, 6), cache_dir=tmp_path / "banded", band_rows=1)
+    np.testing.assert_array_equal(np.load(banded_path), expected)
+
+
+
+def test_get_shared_pixels(tmp_path):
+
+    transform = Affine(1, 0, 0, 0, -1, 2)
+    # A unit smaller than a pixel, in the middle of the pixel (1, 1) that its two neighbours also touch
+    geoms = [box(0, 0, 1.5, 2), box(1.5, 0, 3, 0.9), box(1.2, 0.2, 1.4, 0.8)]
+
+    # Case 1: The sub-pixel unit keeps the label, both neighbours get the pixel as a shared one
+    zones, rows, cols = get_shared_pixels(geoms, transform, (2, 3), cache_dir=tmp_path)
+    labels = np.load(get_zone_labels(geoms, transform, (2, 3), all_touched=True, cache_dir=tmp_path))
+    assert labels[1, 1] == 3
+    np.testing.assert_array_equal(zones, [0, 1])
+    np.testing.assert_array_equal(rows, [1, 1])
+    np.testing.assert_array_equal(cols, [1, 1])
+
+    # Case 2: Served from the cache, same pixels when rasterized in bands of rows
+    assert len(os.listdir(tmp_path)) == 2
+    np.testing.assert_array_equal(get_shared_pixels(geoms, transform, (2, 3), cache_dir=tmp_path)[0], zones)
+    banded = get_shared_pixels(geoms, transform, (2, 3), cache_dir=tmp_path / "banded", band_rows=1)
+    np.testing.assert_array_equal(np.stack(banded), np.stack([zones, rows, cols]))
+
+def test_has_nested_multiparts(tmp_path):
+
+    islands = MultiPolygon([box(0, 0, 1, 1), box(5, 5, 6, 6)])
+
+    # Case 1: Separate islands are not nested
+    assert not has_nested_multiparts([islands, box(2, 0, 4, 4)], cache_dir=tmp_path)
+
+    # Case 2: A part lying within another unit is nested
+    assert has_nested_multiparts([islands, box(4, 4, 8, 8)], cache_dir=tmp_path)
+
+    # Case 3: Results are memoized per boundary dataset
+    assert len(os.listdir(tmp_path)) == 2
+    assert has_nested_multiparts([islands, box(4, 4, 8, 8)], cache_dir=tmp_path)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_prune_zones_cache(tmp_path):
+
+    for i, name in enumerate(["zones_old.npy", "coverage_mid.npz", "zones_new.npy"]):
+        path = os.path.join(tmp_path, name)
+        with open(path, 'wb') as f:
+            f.write(b'0' * 100)
+        os.utime(path, (i, i))
+    with open(os.path.join(tmp_path, "tmp_partial.npy"), 'wb') as f:
+        f.write(b'0' * 100)
+
+    # Case 1: Least recently used files are removed first, files being written are kept
+    removed = prune_zones_cache(max_bytes=150, cache_dir=tmp_path)
+    assert [os.path.basename(path) for path in removed] == ["zones_old.npy", "coverage_mid.npz"]
+    assert sorted(os.listdir(tmp_path)) == ["tmp_partial.npy", "zones_new.npy"]
+
+    # Case 2: Nothing to remove within the limit
+    assert prune_zones_cache(max_bytes=150, cache_dir=tmp_path) == []
+
+    # Case 3: A cache hit refreshes the last use of the label raster
+    labels_path = get_zone_labels([box(0, 0, 2, 2)], Affine(1, 0, 0, 0, -1, 2), (2, 2), cache_dir=tmp_path)
+    os.utime(labels_path, (0, 0))
+    get_zone_labels([box(0, 0, 2, 2)], Affine(1, 0, 0, 0, -1, 2), (2, 2), cache_dir=tmp_path)
+    assert os.path.getmtime(labels_path) > 0
+
+
+def test_block_windows():
+
+    windows = list(block_windows(5, 3, 2))
+    assert len(windows) == 6
+    assert sum(w.height * w.width for w in windows) == 15
+    assert (windows[-1].row_off, windows[-1].col_off, windows[-1].height, windows[-1].width) == (4, 2, 1, 1)
+
+
+def test_zonal_sum(tmp_path):
+
+    transform = Affine(1, 0, 0, 0, -1, 4)
+    geoms = [box(0, 0, 2, 4), box(2, 0, 4, 4), box(10, 10, 11, 11)]
+    values = np.arange(16, dtype='float32').reshape(4, 4)
+    values[0, 0] = np.nan
+
+    labels = np.load(get_zone_labels(geoms, transform, values.shape, cache_dir=tmp_path))
+    result = zonal_sum(labels, values, len(geoms))
+
+    # Case 1: Same sums as rasterstats, NaN ignored, zones without pixels are 0
+    expected = [x['sum'] or 0 for x in zonal_stats(geoms, values, affine=transform, stats='sum', nodata=np.nan)]
+    np.testing.assert_allclose(result, expected)
+    np.testing.assert_allclose(result, [52, 68, 0])
+
+
+def test_pixel_row_areas():
+
+    # Case 1: Geographic grid, rows of 1 degree pixels: about 12,309 km² at the equator, the whole ellipsoid in total
+    areas = pixel_row_areas(Affine(1, 0, 0, 0, -1, 1), 1)
+    assert areas[0] == pytest.approx(1.2308e10, rel=1e-3)
+    assert pixel_row_areas(Affine(360, 0, -180, 0, -1, 90), 180).sum() == pytest.approx(5.10066e14, rel=1e-5)
+
+    # Case 2: Area decreasing towards the poles, symmetric between hemispheres
+    areas = pixel_row_areas(Affine(1, 0, 0, 0, -30, 90), 6)
+    assert np.all(np.diff(areas[:3]) > 0)
+    np.testing.assert_allclose(areas, areas[::-1])
+
+    # Case 3: Projected grid, same area for all pixels
+    np.testing.assert_array_equal(pixel_row_areas(Affine(100, 0, 0, 0, -100, 0), 3, geographic=False), [1e4] * 3)
+
+
+def test_zonal_reduce():
+
+    labels = np.array([[1, 1, 2], [1, 2, 0]])
+    values = np.array([[1., 2., 3.], [4., np.nan, 5.]])
+    classes = np.array([[0, 1, 1], [1, 0, 1]])
+
+    # Case 1: Statistics per zone
+    np.testing.assert_allclose(zonal_reduce(labels, values, 3, stat='count'), [3, 1, 0])
+    np.testing.assert_allclose(zonal_reduce(labels, values, 3, stat='mean'), [7 / 3, 3, np.nan])
+    np.testing.assert_allclose(zonal_reduce(labels, values, 3, stat='max'), [4, 3, np.nan])
+
+    # Case 2: Statistics per zone and class in a single pass
+    expected = np.array([[1, 6], [0, 3], [0, 0]])
+    np.testing.assert_allclose(zonal_reduce(labels, values, 3, classes=classes, n_classes=2), expected)
+
+    # Case 3: Classes outside the range are ignored
+    result = zonal_reduce(labels, values, 3, classes=classes, n_classes=1)
+    np.testing.assert_allclose(result, [[1], [0], [0]])
+
+    # Case 4: Unknown statistic
+    with pytest.raises(ValueError):
+        zonal_reduce(labels, values, 3, stat='median')
+
+
+def test_bounds_window():
+
+    transform = Affine(0.5, 0, 0, 0, -0.5, 2)
+
+    # Case 1: Bounds rounded outwards to whole pixels
+    window = bounds_window((0.6, 0.4, 1.1, 1.4), transform, (4, 6))
+    assert (window.col_off, window.row_off, window.width, window.height) == (1, 1, 2, 3)
+
+    # Case 2: Bounds clipped to the grid
+    window = bounds_window((-5, -5, 1, 5), transform, (4, 6))
+    assert (window.col_off, window.row_off, window.width, window.height) == (0, 0, 2, 4)
+
+    # Case 3: No overlap
+    assert bounds_window((10, 10, 11, 11), transform, (4, 6)) is None
+
+
+def test_zonal_majority():
+
+    histogram = np.array([[0, 2, 1], [0, 0, 0], [3, 1, 3]])
+
+    # Case 1: Most common class per zone, ties going to the smallest class, -1 without pixels
+    np.testing.assert_array_equal(zonal_majority(histogram), [1, -1, 0])
+
+    # Case 2: Empty histogram
+    np.testing.assert_array_equal(zonal_majority(np.zeros((2, 0))), [-1, -1])
+
+
+def test_coverage_weights(tmp_path):
+
+    lats = np.array([0.5, 1.5])
+    lons = np.array([0.5, 1.5, 2.5])
+    geoms = [box(0, 0, 2, 1), box(2.25, 1.25, 2.75, 1.75), box(10, 10, 11, 11)]
+    weights = coverage_weights(geoms, lats, lons, cache_dir=tmp_path)
+    cell_area = pixel_row_areas(Affine(1, 0, 0, 0, -1, 2), 2)
+
+    # Case 1: Full cells get their area, a unit smaller than a cell the covered part of it
+    np.testing.assert_allclose(weights.toarray()[0], [cell_area[1], cell_area[1], 0, 0, 0, 0])
+    np.testing.assert_allclose(weights.toarray()[1], [0, 0, 0, 0, 0, cell_area[0] / 4], rtol=1e-3)
+
+    # Case 2: Unit outside the grid
+    assert weights[2].nnz == 0
+
+    # Case 3: Same boundaries and grid are served from the cache, including after a restart
+    assert coverage_weights(geoms, lats, lons, cache_dir=tmp_path) is weights
+    assert len([f for f in os.listdir(tmp_path) if f.startswith('coverage_')]) == 1
+
+    # Case 4: Grid in 0-360 longitudes across the 0 meridian
+    weights = coverage_weights([box(-1, 0, 1, 1)], np.array([0.5]), np.array([359.5, 0.5]), cache_dir=tmp_path)
+    np.testing.assert_allclose(weights.toarray()[0], [cell_area[1], cell_area[1]])
+
+
+def test_coverage_reduce(tmp_path):
+
+    lats = np.array([1.5, 0.5])
+    lons = np.array([0.5, 1.5])
+    weights = coverage_weights([box(0, 0, 2, 2), box(0, 0, 1.5, 1), box(5, 5, 6, 6)], lats, lons, cache_dir=tmp_path)
+    values = np.array([[1.0, 2.0], [3.0, np.nan]])
+
+    # Case 1: Mean weighted by the covered area, NaN ignored
+    mean = coverage_reduce(weights, values, 'mean')
+    assert mean[1] == 3
+    assert 1 < mean[0] < 3
+    assert np.isnan(mean[2])
+
+    # Case 2: Max and min of the covered cells
+    np.testing.assert_array_equal(coverage_reduce(weights, values, 'max'), [3, 3, np.nan])
+    np.testing.assert_array_equal(coverage_reduce(weights, values, 'min'), [1, 3, np.nan])
+
+    # Case 3: Several layers at once
+    layers = np.stack([values.ravel(), 2 * values.ravel()], axis=1)
+    np.testing.assert_allclose(coverage_reduce(weights, layers, 'mean')[:2], np.stack([mean, 2 * mean], axis=1)[:2])
+
+    # Case 4: Unknown statistic
+    with pytest.raises(ValueError):
+        coverage_reduce(weights, values, 'median')